@@ -0,0 +1,90 @@
+''' Speed of Configurable parameter access on a large configuration.
+
+    A made-up scope configuration of about 2000 parameters, in groups and subgroups
+    like a Tektronix ``SET?`` response, with some commands that are also groups
+    (the ``&`` token). The instrument does nothing, so the times are all in the
+    bookkeeping of :py:class:`~lightlab.equipment.abstract_drivers.TekConfig`.
+
+    Usage::
+
+        python benchmarks/bench_config.py
+        python benchmarks/bench_config.py --repeat 20000
+'''
+import argparse
+import time
+
+from lightlab.equipment.abstract_drivers import Configurable, TekConfig
+
+
+def scope_config():
+    ''' Returns:
+            (dict): nested configuration of about 2000 parameters
+    '''
+    config = dict()
+    for ch in range(1, 9):
+        channel = {'&': 1}
+        for i in range(220):
+            channel['PARAM{}'.format(i)] = i * 0.5
+        channel['PROBE'] = {'GAIN': 1, 'UNITS': 'V', 'ID': {'TYPE': 'NONE', 'SERNUMBER': 'N/A'}}
+        config['CH{}'.format(ch)] = channel
+    config['MEASUREMENT'] = {'MEAS{}'.format(m): {'TYPE': 'MEAN', 'SOURCE1': 'CH1', 'STATE': 0,
+                                                  'UNITS': 'V', 'COUNT': 0}
+                             for m in range(1, 9)}
+    config['TRIGGER'] = {'A': {'MODE': 'AUTO', 'LEVEL': {'CH{}'.format(ch): 0.0 for ch in range(1, 9)},
+                               'EDGE': {'SOURCE': 'CH1', 'SLOPE': 'RISE', 'COUPLING': 'DC'}}}
+    config['HORIZONTAL'] = {'PARAM{}'.format(i): i for i in range(148)}
+    return config
+
+
+class IdleScope(Configurable):
+    ''' Accepts every command and answers every query with 0 '''
+
+    def __init__(self, **kwargs):
+        super().__init__(headerIsOptional=False, **kwargs)
+
+    def write(self, string):
+        pass
+
+    def query(self, string):
+        return '0'
+
+
+def timed(func, repeat):
+    tick = time.perf_counter()
+    for i in range(repeat):
+        func(i)
+    return (time.perf_counter() - tick) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    nested = scope_config()
+    full = TekConfig(nested)
+    print('{} parameters'.format(len(full.getList())))
+
+    scope = IdleScope()
+    scope.loadConfig(full)
+    rows = [
+        ('setConfigParam, same value', lambda i: scope.setConfigParam('CH3:PARAM7', 3.5)),
+        ('setConfigParam, new value', lambda i: scope.setConfigParam('CH3:PARAM7', i)),
+        ('getConfigParam', lambda i: scope.getConfigParam('TRIGGER:A:EDGE:SLOPE')),
+        ('transfer, one group', lambda i: TekConfig().transfer(full, subgroup='CH2')),
+    ]
+    results = []
+    print('{:<28} {:>12}'.format('operation', 'us per call'))
+    for name, func in rows:
+        repeat = args.repeat if not name.startswith('transfer') else max(args.repeat // 100, 5)
+        seconds = timed(func, repeat)
+        results.append((name, seconds))
+        print('{:<28} {:>12.2f}'.format(name, 1e6 * seconds))
+    seconds = timed(lambda i: TekConfig().transfer(full), 5)
+    results.append(('transfer, everything', seconds))
+    print('{:<28} {:>12.2f}'.format('transfer, everything', 1e6 * seconds))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+''' Per-call overhead of attribute delegation from drivers and instruments to sessions.
+
+    Drivers call ``self.query``/``self.write``, which :py:class:`InstrumentSession`
+    finds on its session object. Instruments feed their methods through to the driver.
+    This times those lookups with the delegation caches on and off.
+
+    Usage::
+
+        python benchmarks/bench_delegation.py
+'''
+import timeit
+
+from lightlab.equipment.visa_bases.visa_driver import InstrumentSession, VISAInstrumentDriver
+from lightlab.laboratory.instruments import Instrument
+
+
+class BenchInstrument(Instrument):
+    essentialMethods = Instrument.essentialMethods + ['setVoltage']
+
+
+class BenchDriver(VISAInstrumentDriver):
+    instrument_category = BenchInstrument
+
+    def setVoltage(self, volts):
+        pass
+
+
+def per_call(stmt, number):
+    ''' Returns:
+            (float): nanoseconds per execution of ``stmt``, best of 5
+    '''
+    return 1e9 * min(timeit.repeat(stmt, number=number, repeat=5)) / number
+
+
+def main(number=200000):
+    instr = BenchDriver(name='bench', address='GPIB0::1::INSTR')
+    driver = instr.driver
+    session = driver._session_object
+
+    def uncached_driver():
+        driver._clear_delegates()
+        return driver.query
+
+    def uncached_instrument():
+        instr._clearDelegates()
+        return instr.setVoltage
+
+    InstrumentSession.cacheDelegates = False
+    rows = [('session.query (no delegation)', per_call(lambda: session.query, number)),
+            ('driver.query, not cached', per_call(uncached_driver, number))]
+    InstrumentSession.cacheDelegates = True
+    driver.query  # pylint: disable=pointless-statement
+    rows.append(('driver.query, cached', per_call(lambda: driver.query, number)))
+    rows.append(('instrument.setVoltage, not cached', per_call(uncached_instrument, number)))
+    instr.setVoltage  # pylint: disable=pointless-statement
+    rows.append(('instrument.setVoltage, cached', per_call(lambda: instr.setVoltage, number)))
+
+    for name, ns in rows:
+        print('{:<36} {:>8.0f} ns'.format(name, ns))
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+''' Import time of lightlab drivers.
+
+    Each measurement is a fresh interpreter, so nothing is already imported.
+    Compares importing one driver with importing all of them, which is what
+    ``import lightlab.equipment.lab_instruments`` used to do.
+
+    Usage::
+
+        python benchmarks/bench_import.py
+        python benchmarks/bench_import.py --repeat 20
+        python -X importtime -c "from lightlab.equipment.lab_instruments import Keithley_2400_SM"
+'''
+import argparse
+import statistics
+import subprocess
+import sys
+
+CASES = [
+    ('lightlab', 'import lightlab'),
+    ('one driver', 'from lightlab.equipment.lab_instruments import Keithley_2400_SM'),
+    ('all drivers', 'import inspect\n'
+                    'from lightlab.equipment import lab_instruments\n'
+                    'inspect.getmembers(lab_instruments)'),
+]
+
+_timer = '''
+import sys, time
+tick = time.perf_counter()
+exec({code!r})
+print(time.perf_counter() - tick, len(sys.modules))
+'''
+
+
+def time_import(code):
+    ''' Returns:
+            (tuple): seconds taken by ``code`` in a new interpreter, and the number of modules then loaded
+    '''
+    out = subprocess.check_output([sys.executable, '-c', _timer.format(code=code)],
+                                  universal_newlines=True)
+    seconds, nModules = out.split()
+    return float(seconds), int(nModules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    rows = []
+    print('{:<14} {:>10} {:>10} {:>9}'.format('case', 'p50 ms', 'min ms', 'modules'))
+    for name, code in CASES:
+        time_import(code)  # warm up the file system cache
+        results = [time_import(code) for _ in range(args.repeat)]
+        times = [r[0] for r in results]
+        rows.append((name, times, results[-1][1]))
+        print('{:<14} {:>10.1f} {:>10.1f} {:>9}'.format(
+            name, 1e3 * statistics.median(times), 1e3 * min(times), results[-1][1]))
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+''' Sweep speed with temporary, leased and persistent sessions.
+
+    A sweep sets a value and reads it back at every point, on an RVISA stand-in
+    where opening and closing a resource takes ``--open-latency`` seconds.
+
+        * temporary: ``tempSess=True``, opened and closed around every command
+        * leased: ``tempSess=True`` with ``leaseTime``, closed once idle
+        * persistent: ``tempSess=False``, open until closed
+
+    Usage::
+
+        python benchmarks/bench_lease.py
+        python benchmarks/bench_lease.py --points 200 --latency 0.001 --open-latency 0.01
+'''
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # the stand-ins are in tests/
+from tests.rvisa_standin import StandInServer
+
+MODES = [
+    ('temporary', dict(tempSess=True)),
+    ('leased', dict(tempSess=True, leaseTime=5)),
+    ('persistent', dict(tempSess=False)),
+]
+
+
+def sweep(session, points):
+    for k in range(points):
+        session.write(':VOLT {}'.format(k))
+        session.query(':VOLT?')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--points', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds added to every transfer')
+    parser.add_argument('--open-latency', type=float, default=0.005,
+                        help='seconds added to opening and closing a resource')
+    args = parser.parse_args(argv)
+
+    rows = []
+    rvisa_pool.clear_pools()
+    with StandInServer(latency=args.latency, open_latency=args.open_latency) as server:
+        server.attach()
+        print('{:<12} {:>10} {:>8} {:>8}'.format('session', 'sweep s', 'opens', 'speedup'))
+        for name, kwargs in MODES:
+            session = RVISAObject('GPIB0::7::INSTR', url=server.url, **kwargs)
+            server.reset_counts()
+            tick = time.perf_counter()
+            sweep(session, args.points)
+            elapsed = time.perf_counter() - tick
+            session.close()
+            rows.append((name, elapsed, server.requests.get('/open', 0)))
+            print('{:<12} {:>10.3f} {:>8} {:>7.1f}x'.format(name, elapsed, rows[-1][2], rows[0][1] / elapsed))
+    rvisa_pool.clear_pools()
+    return rows
+
+
+if __name__ == '__main__':
+    main()
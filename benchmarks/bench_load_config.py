@@ -0,0 +1,121 @@
+''' Bus transactions and time to restore a full configuration with Configurable.loadConfig.
+
+    The made-up scope configuration of ``bench_config.py`` (about 2000 parameters)
+    is loaded into a stand-in instrument, once with every parameter in its own write
+    and once with the writes joined into compound messages (``coalesceWrites``).
+    The RVISA backend counts HTTP requests; the VISA backend counts messages
+    received by the socket stand-in, and needs ``pyvisa-py``.
+
+    Usage::
+
+        python benchmarks/bench_load_config.py
+        python benchmarks/bench_load_config.py --latency 0.001 --backends rvisa
+'''
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from bench_config import scope_config
+from lightlab.equipment.abstract_drivers import Configurable, TekConfig
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.rvisa_driver import RVISAInstrumentDriver
+from lightlab.equipment.visa_bases.visa_driver import VISAInstrumentDriver
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # the stand-ins are in tests/
+from tests.rvisa_standin import StandInServer, SCPIPersonality
+from tests.socket_standin import SocketStandInServer
+
+BACKENDS = ('visa', 'rvisa')
+
+
+class RVISAScope(RVISAInstrumentDriver, Configurable):
+    def __init__(self, name='stand-in scope', address=None, **kwargs):
+        RVISAInstrumentDriver.__init__(self, name=name, address=address, **kwargs)
+        Configurable.__init__(self, headerIsOptional=False)
+
+
+class VISAScope(VISAInstrumentDriver, Configurable):
+    def __init__(self, name='stand-in scope', address=None, **kwargs):
+        VISAInstrumentDriver.__init__(self, name=name, address=address, **kwargs)
+        Configurable.__init__(self, headerIsOptional=False)
+
+
+class CountingPersonality(SCPIPersonality):
+    ''' Counts the messages it receives '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = 0
+
+    def handle(self, message):
+        self.messages += 1
+        return super().handle(message)
+
+
+def load_both_ways(scope, config, count):
+    ''' Returns:
+            (list(tuple)): ``(mode, transactions, seconds)``
+    '''
+    rows = []
+    for coalesce in (False, True):
+        scope.coalesceWrites = coalesce
+        before = count()
+        tick = time.perf_counter()
+        scope.loadConfig(config)
+        seconds = time.perf_counter() - tick
+        rows.append(('compound' if coalesce else 'one by one', count() - before, seconds))
+    return rows
+
+
+def bench_rvisa(args, config):
+    rvisa_pool.clear_pools()
+    with StandInServer(latency=args.latency) as server:
+        server.attach()
+        scope = RVISAScope(address='TCPIP0::scope::INSTR', url=server.url, tempSess=False)
+        try:
+            return load_both_ways(scope, config, lambda: server.transfers)
+        finally:
+            scope.close()
+            rvisa_pool.clear_pools()
+
+
+def bench_visa(args, config):
+    try:
+        import pyvisa
+        resMan = pyvisa.ResourceManager('@py')
+    except (ImportError, ValueError, OSError) as err:
+        print('Skipping the VISA backend: {}'.format(err), file=sys.stderr)
+        return []
+    with SocketStandInServer(CountingPersonality, latency=args.latency) as server:
+        scope = VISAScope(address='TCPIP0::{}::{}::SOCKET'.format(server.host, server.port),
+                          tempSess=False)
+        scope.resMan = resMan
+        scope.termination = '\n'
+        scope.open()
+        try:
+            return load_both_ways(scope, config, lambda: server.personality.messages)
+        finally:
+            scope.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='seconds added by the stand-in to every transaction')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args(argv)
+
+    config = TekConfig(scope_config())
+    print('{} parameters'.format(len(config.getList())))
+    results = []
+    print('{:<8} {:<12} {:>14} {:>10}'.format('backend', 'writes', 'transactions', 'ms'))
+    for backend in args.backends:
+        for mode, transactions, seconds in globals()['bench_' + backend](args, config):
+            results.append((backend, mode, transactions, seconds))
+            print('{:<8} {:<12} {:>14} {:>10.1f}'.format(backend, mode, transactions, 1e3 * seconds))
+    return results
+
+
+if __name__ == '__main__':
+    main()
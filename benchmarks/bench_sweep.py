@@ -0,0 +1,68 @@
+''' Per-point overhead of NdSweeper.gather.
+
+    A virtual sweep, with no hardware and functions that return right away,
+    so the time is all in the sweeper: actuating, storing, parsing and progress.
+    One scalar measurement and one ``--npts`` point vector measurement per point.
+
+    Usage::
+
+        python benchmarks/bench_sweep.py
+        python benchmarks/bench_sweep.py --points 100000 --npts 256
+'''
+import argparse
+import shutil
+import time
+
+import numpy as np
+
+from lightlab.util.io import monitorDir
+from lightlab.util.sweep import NdSweeper
+
+
+def make_sweep(points, npts):
+    nMinor = 100
+    nMajor = max(points // nMinor, 1)
+    state = dict(a=0., b=0.)
+    vector = np.linspace(0, 1, npts)
+
+    def setA(a):
+        state['a'] = a
+
+    def setB(b):
+        state['b'] = b
+
+    swp = NdSweeper()
+    swp.setMonitorOptions(stdoutPrint=False)
+    swp.addActuation('a', setA, np.linspace(0, 1, nMajor))
+    swp.addActuation('b', setB, np.linspace(0, 1, nMinor))
+    swp.addMeasurement('scalar', lambda: state['a'] + state['b'])
+    swp.addMeasurement('vector', lambda: vector)
+    swp.addParser('sum', lambda d: d['scalar'] + d['b'])
+    return swp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--npts', type=int, default=64, help='length of the vector measurement')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    monitorExisted = monitorDir.exists()
+    times = []
+    for _ in range(args.repeat):
+        swp = make_sweep(args.points, args.npts)
+        tick = time.perf_counter()
+        swp.gather()
+        times.append(time.perf_counter() - tick)
+    if not monitorExisted:
+        shutil.rmtree(str(monitorDir), ignore_errors=True)
+    nPoints = np.prod(swp.swpShape)
+    best = min(times)
+    print('{} points: {:.2f} s, {:.1f} us per point'.format(nPoints, best, 1e6 * best / nPoints))
+    print('vector data: {} {}'.format(swp.data['vector'].dtype, swp.data['vector'].shape))
+    return best / nPoints
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+''' Transport benchmarks for the VISA, RVISA, Prologix and TCP session backends.
+
+    Every backend talks to a local stand-in instrument
+    (:py:mod:`tests.rvisa_standin` and
+    :py:mod:`tests.socket_standin`), so no hardware is needed.
+    Three things are measured:
+
+        * round trip: one ``*IDN?`` query after another
+        * batch: many settings and queries sent with ``execute``, in commands per second
+        * block: a ``CURV?`` waveform of ``--npts`` 16 bit points, binary encoded
+
+    Usage::
+
+        python benchmarks/bench_transports.py
+        python benchmarks/bench_transports.py --latency 0.002 --jitter 0.001 --backends rvisa tcp
+        python benchmarks/bench_transports.py --quick
+
+    Latency is added by the stand-ins to every transfer, to make the numbers look more
+    like a real lab. With no latency, the numbers are the software overhead of each backend.
+    The VISA backend needs ``pyvisa-py`` and is skipped without it.
+'''
+from pathlib import Path
+import argparse
+import statistics
+import sys
+import time
+
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.command_batch import compound_messages, split_responses
+from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection
+from lightlab.equipment.visa_bases.prologix_gpib import PrologixGPIBObject
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.equipment.visa_bases.visa_object import VISAObject
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # the stand-ins are in tests/
+from tests.rvisa_standin import StandInServer, ScopePersonality
+from tests.socket_standin import SocketStandInServer, PrologixStandInServer
+
+BACKENDS = ('visa', 'rvisa', 'prologix', 'tcp')
+
+
+class TCPSession(object):
+    ''' The few session methods the benchmarks need, on a bare TCPSocketConnection '''
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write(self, writeStr):
+        self.connection.send(writeStr)
+
+    def query(self, queryStr):
+        with self.connection.connected():
+            self.connection.send(queryStr)
+            return self.connection.readline().rstrip()
+
+    def execute(self, commands):
+        results = []
+        with self.connection.connected():
+            for message, nQueries in compound_messages(commands):
+                if nQueries == 0:
+                    self.connection.send(message)
+                else:
+                    results.extend(split_responses(self.query(message), nQueries))
+        return results
+
+    def query_binary_values(self, message, datatype, is_big_endian):
+        return self.connection.query_binary_values(message, datatype, is_big_endian)
+
+
+def timed(func, repeat):
+    ''' Returns:
+            (list): seconds taken by each call
+    '''
+    times = []
+    for _ in range(repeat):
+        tick = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - tick)
+    return times
+
+
+def run_benchmarks(name, session, args):
+    rows = []
+    session.query('*IDN?')  # warm up connections
+
+    times = timed(lambda: session.query('*IDN?'), args.repeat)
+    rows.append((name, 'round trip', times, None))
+
+    commands = []
+    for i in range(args.batch):
+        commands.append(':CH{}:SCALE {}'.format(i % 4 + 1, 0.1 * i))
+        commands.append(':CH{}:SCALE?'.format(i % 4 + 1))
+    times = timed(lambda: session.execute(commands), max(args.repeat // 10, 1))
+    rows.append((name, 'batch ({} cmds)'.format(len(commands)), times, len(commands)))
+
+    session.write('DATA:ENCDG RIBINARY')
+    session.write('DATA:WIDTH 2')
+    session.query_binary_values('CURV?', 'h', True)  # the stand-in makes the waveform once
+    times = timed(lambda: session.query_binary_values('CURV?', 'h', True), max(args.repeat // 10, 1))
+    rows.append((name, 'block ({} pts)'.format(args.npts), times, 2 * args.npts))
+    return rows
+
+
+def bench_rvisa(args):
+    rvisa_pool.clear_pools()
+    with StandInServer(lambda address: ScopePersonality(npts=args.npts),
+                       latency=args.latency, jitter=args.jitter, seed=0) as server:
+        server.attach()
+        session = RVISAObject('TCPIP0::scope::INSTR', url=server.url)
+        session.open()
+        try:
+            return run_benchmarks('rvisa', session, args)
+        finally:
+            session.close()
+            rvisa_pool.clear_pools()
+
+
+def bench_tcp(args):
+    with SocketStandInServer(lambda: ScopePersonality(npts=args.npts),
+                             latency=args.latency, jitter=args.jitter, seed=0) as server:
+        connection = TCPSocketConnection(server.host, server.port, timeout=10)
+        connection.connect()
+        try:
+            return run_benchmarks('tcp', TCPSession(connection), args)
+        finally:
+            connection.disconnect()
+
+
+def bench_prologix(args):
+    server = PrologixStandInServer(lambda gpib_address: ScopePersonality(npts=args.npts),
+                                   latency=args.latency, jitter=args.jitter, seed=0)
+    with server, server.patched():
+        session = PrologixGPIBObject('prologix://{}/7'.format(server.host))
+        session.timeout = 10
+        session.open()
+        return run_benchmarks('prologix', session, args)
+
+
+def bench_visa(args):
+    try:
+        import pyvisa
+        resMan = pyvisa.ResourceManager('@py')
+    except (ImportError, ValueError, OSError) as err:
+        print('Skipping the VISA backend: {}'.format(err), file=sys.stderr)
+        return []
+    with SocketStandInServer(lambda: ScopePersonality(npts=args.npts),
+                             latency=args.latency, jitter=args.jitter, seed=0) as server:
+        session = VISAObject('TCPIP0::{}::{}::SOCKET'.format(server.host, server.port))
+        session.resMan = resMan
+        session.termination = '\n'
+        session.open()
+        session.mbSession.read_termination = '\n'
+        try:
+            return run_benchmarks('visa', session, args)
+        finally:
+            session.close()
+
+
+def report(rows):
+    print('{:<10} {:<22} {:>6} {:>10} {:>10} {:>10} {:>12}'.format(
+        'backend', 'benchmark', 'runs', 'mean ms', 'p50 ms', 'p95 ms', 'throughput'))
+    for backend, name, times, size in rows:
+        ordered = sorted(times)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        mean = statistics.mean(times)
+        if size is None:
+            throughput = '{:.0f} /s'.format(1 / mean)
+        elif name.startswith('batch'):
+            throughput = '{:.0f} cmd/s'.format(size / mean)
+        else:
+            throughput = '{:.2f} MB/s'.format(size / mean / 1e6)
+        print('{:<10} {:<22} {:>6} {:>10.3f} {:>10.3f} {:>10.3f} {:>12}'.format(
+            backend, name, len(times), 1e3 * mean, 1e3 * statistics.median(times), 1e3 * p95, throughput))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every transfer')
+    parser.add_argument('--jitter', type=float, default=0, help='up to this many random seconds more')
+    parser.add_argument('--repeat', type=int, default=200, help='round trips; other benchmarks do a tenth')
+    parser.add_argument('--batch', type=int, default=50, help='setting/query pairs per batch')
+    parser.add_argument('--npts', type=int, default=100000, help='points in the waveform')
+    parser.add_argument('--quick', action='store_true', help='small sizes, to check that it all works')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.repeat, args.batch, args.npts = 10, 5, 1000
+
+    rows = []
+    for backend in args.backends:
+        rows.extend(globals()['bench_' + backend](args))
+    report(rows)
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -35,3 +35,11 @@ log_to_screen(INFO)
 log_visa_to_screen(WARNING)
 
 import lightlab.util.config as config  # noqa
+
+
+def stats(address=None):
+    ''' Latency and throughput of instrument sessions, when instrumentation is enabled.
+        See :py:mod:`lightlab.equipment.visa_bases.instrumentation`.
+    '''
+    from lightlab.equipment.visa_bases import instrumentation
+    return instrumentation.stats(address)
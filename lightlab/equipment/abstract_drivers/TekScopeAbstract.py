@@ -1,3 +1,5 @@
+from collections import namedtuple
+from fnmatch import fnmatchcase
 import numpy as np
 
 from lightlab import logger
@@ -6,6 +8,10 @@ from lightlab.util.data import Waveform, FunctionBundle
 from .configurable import Configurable
 from . import AbstractDriver
 
+#: How to scale the raw data of one channel: ``(raw - yOff) * yScale + yZero``.
+#: ``xIncr`` is the time between samples, if known.
+WaveformPreamble = namedtuple('WaveformPreamble', ['yOff', 'yScale', 'yZero', 'yUnit', 'xIncr'])
+
 
 # pylint: disable=no-member
 class TekScopeAbstract(Configurable, AbstractDriver):
@@ -38,6 +44,23 @@ class TekScopeAbstract(Configurable, AbstractDriver):
     _runModeParam = None
     _runModeSingleShot = None
     _yScaleParam = None
+    #: type code of the signed, big-endian (RIBINARY) integers transferred by ``CURV?``.
+    #: None means it is transferred as ASCII.
+    _curveDatatype = 'h'
+    coalesceWrites = True  #: it takes compound messages
+    #: The waveform preamble describes the data of ``DATA:SOURCE``, as it is acquired now.
+    #: The scope also rounds the timebase and the number of averages that it is sent,
+    #: and derives the record length and sample rate from them, so those are read back.
+    cacheInvalidation = {'DATA:*': ['WFMOUTPRE:*'],
+                         'CH?:*': ['WFMOUTPRE:*'],
+                         'ACQUIRE:MODE': ['WFMOUTPRE:*'],
+                         'ACQUIRE:NUMAVG': ['ACQUIRE:NUMAVG'],
+                         'HORIZONTAL:*': ['WFMOUTPRE:*', 'HORIZONTAL:*']}
+    #: Settings that change the preamble of every channel, see :py:meth:`_preamble`
+    _preambleSettings = ('HORIZONTAL:*', 'DATA:ENCDG', 'DATA:WIDTH', 'ACQUIRE:MODE')
+    #: Settings that change the preamble of one channel
+    _preambleChannelSettings = 'CH{}:*'
+    _preambles = None  # channel -> WaveformPreamble
 
     def startup(self):
         # Make sure sampling and data transferring are in a consistent state
@@ -68,10 +91,10 @@ class TekScopeAbstract(Configurable, AbstractDriver):
             self.setConfigParam('DATA:STOP', nPts)
 
         presentSettings = dict()
-        presentSettings['avgCnt'] = self.getConfigParam('ACQUIRE:NUMAVG', forceHardware=True)
-        presentSettings['duration'] = self.getConfigParam('HORIZONTAL:MAIN:SCALE', forceHardware=True)
-        presentSettings['position'] = self.getConfigParam('HORIZONTAL:MAIN:POSITION', forceHardware=True)
-        presentSettings['nPts'] = self.getConfigParam(self._recLenParam, forceHardware=True)
+        presentSettings['avgCnt'], presentSettings['duration'], \
+            presentSettings['position'], presentSettings['nPts'] = self.getConfigParams(
+                ['ACQUIRE:NUMAVG', 'HORIZONTAL:MAIN:SCALE', 'HORIZONTAL:MAIN:POSITION',
+                 self._recLenParam])
         return presentSettings
 
     def acquire(self, chans=None, timeout=None, **kwargs):
@@ -115,10 +138,10 @@ class TekScopeAbstract(Configurable, AbstractDriver):
         wfms = [None] * len(chans)
         for i, c in enumerate(chans):
             vRaw = self.__transferData(c)
-            t, v = self.__scaleData(vRaw)
+            preamble = self._preamble(c)
+            t, v = self.__scaleData(vRaw, preamble)
             # Optical modules might produce 'W' instead of 'V'
-            unit = self.__getUnit()
-            wfms[i] = Waveform(t, v, unit=unit)
+            wfms[i] = Waveform(t, v, unit=preamble.yUnit)
 
         return wfms
 
@@ -172,25 +195,73 @@ class TekScopeAbstract(Configurable, AbstractDriver):
 
             Returns:
                 :mod:`data.Waveform`: a time, voltage paired signal
-
-            Todo:
-                Make this binary transfer to go even faster
         '''
         chStr = 'CH' + str(chan)
-        self.setConfigParam('DATA:ENCDG', 'ASCII')
+        if self._curveDatatype is None:
+            self.setConfigParam('DATA:ENCDG', 'ASCII')
+            self.setConfigParam('DATA:SOURCE', chStr)
+            return self.query_ascii_values('CURV?', container=np.array)
+
+        self.setConfigParam('DATA:ENCDG', 'RIBINARY')
+        self.setConfigParam('DATA:WIDTH', np.dtype(self._curveDatatype).itemsize)
         self.setConfigParam('DATA:SOURCE', chStr)
 
-        voltRaw = self.query_ascii_values('CURV?')
+        voltRaw = self.query_binary_values('CURV?', datatype=self._curveDatatype,
+                                           is_big_endian=True)
         return voltRaw
 
-    def __scaleData(self, voltRaw):
-        ''' Scale to second and voltage units.
+    def _preamble(self, chan):
+        ''' How to scale the data of a channel. Queried the first time it is needed,
+            after which it is reused until a setting that changes it is set with
+            :meth:`setConfigParam`, or the scope is handed over with :meth:`run`.
+
+            Args:
+                chan (int): channel, which must be the one transferred last
+
+            Returns:
+                (WaveformPreamble)
+        '''
+        if self._preambles is None:
+            self._preambles = dict()
+        try:
+            return self._preambles[chan]
+        except KeyError:
+            preamble = self._queryPreamble(chan)
+            self._preambles[chan] = preamble
+            return preamble
+
+    def _queryPreamble(self, chan):
+        ''' Queries the waveform preamble of the ``DATA:SOURCE`` in one message.
 
             DSA and DPO are very annoying about treating ymult and yscale differently.
             TDS uses ymult not yscale
 
+            Returns:
+                (WaveformPreamble)
+        '''
+        yOff, yScale, yZero, yUnit = self.getConfigParams(
+            ['WFMOUTPRE:' + param for param in ('YOFF', self._yScaleParam, 'YZERO', 'YUNIT')],
+            forceHardware=True)
+        return WaveformPreamble(float(yOff), float(yScale), float(yZero),
+                                str(yUnit).replace('"', ''), None)
+
+    def _synced(self, paths, written=False):
+        super()._synced(paths, written)
+        if written and self._preambles:
+            for path in paths:
+                if any(fnmatchcase(path, pattern) for pattern in self._preambleSettings):
+                    self._preambles.clear()
+                    return
+                for chan in list(self._preambles):
+                    if fnmatchcase(path, self._preambleChannelSettings.format(chan)):
+                        del self._preambles[chan]
+
+    def __scaleData(self, voltRaw, preamble):
+        ''' Scale to second and voltage units.
+
             Args:
                 voltRaw (ndarray): what is returned from ``__transferData``
+                preamble (WaveformPreamble): from :meth:`_preamble`
 
             Returns:
                 (ndarray): time in seconds, centered at t=0 regardless of timebase position
@@ -202,25 +273,13 @@ class TekScopeAbstract(Configurable, AbstractDriver):
                 YZERO, the reference voltage, YOFF, the offset position, and
                 YSCALE, the conversion factor between position and voltage.
         '''
-        get = lambda param: float(self.getConfigParam('WFMOUTPRE:' + param, forceHardware=True))
-        voltage = (np.array(voltRaw) - get('YOFF')) \
-            * get(self._yScaleParam) \
-            + get('YZERO')
+        voltage = (np.array(voltRaw) - preamble.yOff) * preamble.yScale + preamble.yZero
 
-        timeDivision = float(self.getConfigParam('HORIZONTAL:MAIN:SCALE', forceHardware=True))
+        timeDivision = float(self.getConfigParam('HORIZONTAL:MAIN:SCALE'))
         time = np.linspace(-1, 1, len(voltage)) / 2 * timeDivision * 10
 
         return time, voltage
 
-    def __getUnit(self):
-        ''' Gets the unit of the waveform as a string.
-
-            Normally, this will be '"V"', which can be converted to 'V'
-        '''
-
-        yunit_query = self.getConfigParam('WFMOUTPRE:YUNIT', forceHardware=True)
-        return yunit_query.replace('"', '')
-
     def wfmDb(self, chan, nWfms, untriggered=False):
         ''' Transfers a bundle of waveforms representing a signal database. Sample mode only.
 
@@ -251,6 +310,9 @@ class TekScopeAbstract(Configurable, AbstractDriver):
         self.setConfigParam(self._runModeParam,
                             'RUNSTOP' if continuousRun else self._runModeSingleShot,
                             forceHardware=True)
+        if continuousRun:  # people in lab can change these now
+            self.invalidateConfig('ACQUIRE:*', 'HORIZONTAL:*', 'WFMOUTPRE:*')
+            self._preambles = None
         if continuousRun:
             self.setConfigParam('ACQUIRE:STATE', 1, forceHardware=True)
 
@@ -8,4 +8,4 @@ from .configurable import Configurable, TekConfig, AccessException  # noqa
 from .multimodule_configurable import ConfigModule, MultiModuleConfigurable  # noqa
 from .electrical_sources import MultiChannelSource, MultiModalSource  # noqa
 from .power_meters import PowerMeterAbstract  # noqa
-from .TekScopeAbstract import TekScopeAbstract  # noqa
+from .TekScopeAbstract import TekScopeAbstract, WaveformPreamble  # noqa
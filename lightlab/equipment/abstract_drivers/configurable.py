@@ -1,10 +1,11 @@
 from lightlab import visalogger as logger
 from pyvisa import VisaIOError
 from contextlib import contextmanager
-import dpath.util
+from fnmatch import fnmatchcase
 import json
 from numpy import floor
 from pathlib import Path
+import time
 
 from lightlab.util.io import lightlabDevelopmentDir
 defaultFileDir = lightlabDevelopmentDir / 'savedConfigDefaults/'
@@ -17,23 +18,108 @@ class AccessException(Exception):
 
 
 class TekConfig(object):
-    ''' Wraps a dictionary attribute. Uses dpath for operations.
+    ''' Configuration of an instrument, as command paths and their values.
 
         Commands are defined as tuples (cStr, val). For example (':PATH:TO:CMD', 4).
             Use these by doing scope.write(' '.join(TekConfig.get('PATH:TO:CMD')))
             The val is always a string.
 
+        Values are kept in a flat dict from path (without the leading separator) to value,
+        next to an index of the members of every group, in the order they were added.
+        A path can be a command and a group at the same time, like ``TRIGGER`` and ``TRIGGER:MODE``.
+        In the nested dicts of files and ``dico``, the value of the command is the ``&`` member of the group.
+
         Todo:
-            :transferring subgroup from one instance to another.
-            :returning a dictionary representing a subgroup (actually this might currently be happening in error)
             :transferring subgroup values to a different subgroup in the same instance (for example, CH1 to CH2)
     '''
     separator = ':'
+    token = '&'  #: member of a group that holds the value of the command with the same path
 
     def __init__(self, initDict=None):
-        if initDict is None:
-            initDict = dict()
-        self.dico = initDict.copy()
+        self._values = dict()  # path -> value
+        self._members = {'': dict()}  # group path -> {member path: None}, ordered
+        if initDict is not None:
+            self._update(initDict, '')
+
+    def _update(self, nested, group):
+        ''' Sets everything in nested dicts, under ``group`` '''
+        for name, val in nested.items():
+            if name == self.token:
+                self._store(group, val)
+            elif type(val) is dict:
+                self._update(val, group + self.separator + name if group else name)
+            else:
+                self._store(group + self.separator + name if group else name, val)
+
+    @property
+    def dico(self):
+        ''' The configuration as nested dicts '''
+        return self._nested('')
+
+    def _nested(self, group):
+        ret = dict()
+        for member in self._members[group]:
+            name = member.rpartition(self.separator)[2]
+            if name == self.token:
+                ret[name] = self._values[group]
+            elif member in self._members:
+                ret[name] = self._nested(member)
+            else:
+                ret[name] = self._values[member]
+        return ret
+
+    def _path(self, cStr):
+        ''' Path of a command string or subgroup, without separators around it or the ``&`` token '''
+        path = cStr.strip(self.separator)
+        if path.endswith(self.separator + self.token):
+            path = path[:-len(self.token) - 1]
+        elif path == self.token:
+            path = ''
+        return path
+
+    def _store(self, path, val):
+        if path not in self._values:
+            # Add it to the index of its group, and so on up
+            sep = self.separator
+            members = self._members.get(path)
+            if members is not None:  # already a group, the command goes at its end
+                members[path + sep + self.token] = None
+            member = path
+            while member:
+                group = member.rpartition(sep)[0]
+                members = self._members.get(group)
+                if members is None:
+                    members = self._members[group] = dict()
+                    if group in self._values:  # a command that now is also a group
+                        members[group + sep + self.token] = None
+                elif member in members:
+                    break
+                members[member] = None
+                member = group
+        self._values[path] = val
+
+    def _leaves(self, group):
+        ''' Yields ``(path, value, isToken)`` for every command in a group, in order '''
+        for member in self._members[group]:
+            if member in self._members:
+                yield from self._leaves(member)
+            elif member in self._values:
+                yield member, self._values[member], False
+            else:  # the token
+                yield group, self._values[group], True
+
+    def _subgroupLeaves(self, subgroup):
+        path = self._path(subgroup)
+        if subgroup.endswith(self.token):  # only the command of the group
+            if path in self._members and path in self._values:
+                return iter([(path, self._values[path], True)])
+            return iter([])
+        elif path in self._members:
+            return self._leaves(path)
+        elif path in self._values and not subgroup.endswith(self.separator):
+            return iter([(path, self._values[path], False)])
+        else:
+            return iter([])
 
     def __str__(self):
         return json.dumps(self.dico, indent=2, sort_keys=True)
@@ -54,12 +140,13 @@ class TekConfig(object):
             Args:
                 asCmd (bool): if true, returns a tuple representing a command. Otherwise returns just the value
         '''
+        path = self._path(cStr)
         try:
-            val = dpath.util.get(self.dico, cStr, separator=self.separator)
+            val = self._values[path]
         except KeyError:
-            raise KeyError(cStr + ' is not present in this TekConfig instance')
-        if type(val) is dict and '&' in val.keys():
-            val = val['&']
+            if not path or path not in self._members:
+                raise KeyError(cStr + ' is not present in this TekConfig instance')
+            val = self._nested(path)
         if not asCmd:
             return val
         else:
@@ -67,35 +154,14 @@ class TekConfig(object):
 
     def set(self, cStr, val):
         ''' Takes the value only, not a dictionary '''
-        # First check that it does not exist as a subdir
-        try:
-            ex = dpath.util.get(self.dico, cStr, separator=self.separator)
-        except KeyError:
-            # doesn't exist, we are good to go
-            pass
+        path = self._path(cStr)
+        if type(val) is dict:
+            self._update(val, path)
         else:
-            if type(ex) is dict:
-                # we don't want to overwrite this subdirectory, so put a tag on cmd
-                cStr = cStr + self.separator + '&'
-
-        cmd = (cStr, val)
-        success = dpath.util.set(self.dico, *cmd, separator=self.separator)
-        if success != 1:  # it doesn't exist yet
-            try:
-                dpath.util.new(self.dico, *cmd, separator=self.separator)
-            except ValueError:
-                # We probably have an integer leaf where we would also like to have a directory
-                parent = self.separator.join(cmd[0].split(self.separator)[:-1])
-                try:
-                    oldV = self.get(parent, asCmd=False)
-                except KeyError:
-                    print('dpath did not take ' + str(cmd))
-                    raise
-                dpath.util.set(self.dico, parent, {'&': oldV}, separator=self.separator)
-                dpath.util.new(self.dico, *cmd, separator=self.separator)
+            self._store(path, val)
 
     def getList(self, subgroup='', asCmd=True):
-        ''' Deep crawler that goes in and generates a command for every leaf.
+        ''' Generates a command for every leaf.
 
             Args:
                 subgroup (str): subgroup must be a subdirectory. If '', it is root directory. It can also be a command string, in which case, the returned list has length 1
@@ -104,27 +170,12 @@ class TekConfig(object):
             Returns:
                 list: list of valid commands (cstr, val) on the subgroup subdirectory
         '''
-        cList = []
-        children = dpath.util.search(self.dico, subgroup + '*',
-                                     yielded=True, separator=self.separator)
-        for cmd in children:
-            s, v = cmd
-            if type(v) is not dict:
-                if s[0] != self.separator:
-                    s = self.separator + s
-                cList += [(s, v)]
-            else:
-                cList += self.getList(subgroup=cmd[0] + self.separator)
+        sep = self.separator
         if asCmd:
-            return cList
+            return [(sep + path + sep + self.token if isToken else sep + path, val)
+                    for path, val, isToken in self._subgroupLeaves(subgroup)]
         else:
-            writeList = [None] * len(cList)
-            for i, cmd in enumerate(cList):
-                cStr, val = cmd
-                if cStr[-1] == '&':  # check for tokens
-                    cStr = cStr[:-2]
-                writeList[i] = cStr + ' ' + str(val)
-            return writeList
+            return [sep + path + ' ' + str(val) for path, val, _ in self._subgroupLeaves(subgroup)]
 
     def setList(self, cmdList):
         ''' The inverse of getList '''
@@ -147,8 +198,8 @@ class TekConfig(object):
             sCon = source
         else:
             raise Exception('Invalid source for transfer. Got ' + str(type(source)))
-        commands = sCon.getList(subgroup=subgroup)
-        self.setList(commands)
+        for path, val, _ in list(sCon._subgroupLeaves(subgroup)):
+            self._store(path, val)
         return self
 
     @classmethod
@@ -235,9 +286,31 @@ class Configurable(AbstractDriver):
 
         This clas uses query/write methods that are not directly inherited,
         so the subclass or its parents must implement those functions
+
+        Cached values never go stale, unless the driver says otherwise,
+        once for the whole class, with ``cacheTTL`` and ``cacheInvalidation``.
+        Keys and values there are command names or patterns like ``'WFMOUTPRE:*'``.
+
+        .. code-block:: python
+
+            cacheTTL = {'OUTP:STATE': 1}  # trips on its own, so trust it for a second
+            cacheInvalidation = {'HORIZONTAL:*': ['WFMOUTPRE:*']}  # changes the waveform preamble
+
+        Stale values are queried again by :meth:`getConfigParam`,
+        and written even if they look unchanged by :meth:`setConfigParam`.
+        Drivers can also mark values stale with :meth:`invalidateConfig`.
     '''
 
     config = None  #: Dictionary of :class:`TekConfig` objects.
+    cacheTTL = dict()  #: seconds that a cached value can be trusted, by command pattern
+    cacheInvalidation = dict()  #: command pattern -> patterns of cached values that go stale when it is set
+    #: send the writes of :py:meth:`loadConfig` together in compound messages.
+    #: Only for instruments known to take them. Turned off if the instrument reports an error
+    coalesceWrites = False
+    #: queried after compound writes. Its standard event status bits (:py:meth:`_compoundWriteFailed`)
+    #: say whether the instrument rejected them
+    writeErrorQuery = '*ESR?'
+    compoundQueries = True  #: query :py:meth:`getConfigParams` together. Turned off if the instrument fails at it
 
     def __init__(self, headerIsOptional=True, verboseIsOptional=False, precedingColon=True, interveningSpace=True, **kwargs):
 
@@ -255,6 +328,8 @@ class Configurable(AbstractDriver):
         self.config['init'] = TekConfig()
         self.config['live'] = TekConfig()
         self.separator = self.config['live'].separator
+        self._staleParams = set()
+        self._syncTimes = dict()  # path -> when it was last written or queried, for cacheTTL
 
         super().__init__(**kwargs)
 
@@ -293,7 +368,7 @@ class Configurable(AbstractDriver):
             prevVal = None
             refresh = True
         else:
-            refresh = (str(val) != str(prevVal))
+            refresh = (str(val) != str(prevVal)) or self._isStale(cStr)
         if refresh or forceHardware:
             self.config['live'].set(cStr, val)
             if prevVal is None:
@@ -325,12 +400,89 @@ class Configurable(AbstractDriver):
             prevVal = self.config['live'].get(cStr, asCmd=False)
         except KeyError:
             prevVal = None
-        if prevVal is None or forceHardware:  # Try getting from hardware
+        if prevVal is None or forceHardware or self._isStale(cStr):  # Try getting from hardware
             self._getHardwareConfig(cStr)
         if prevVal is None:  # This is the first time getting, so it goes in 'init'
             self.config['init'].transfer(self.config['live'], cStr)
         return self.config['live'].get(cStr, asCmd=False)
 
+    def getConfigParams(self, cStrList, forceHardware=False):
+        ''' Gets several parameters, like :meth:`getConfigParam`.
+            Those that have to come from hardware are queried together
+            in one compound query (``A?;B?;C?``).
+
+            .. code-block:: python
+
+                scale, position = scope.getConfigParams(['HORIZONTAL:MAIN:SCALE',
+                                                         'HORIZONTAL:MAIN:POSITION'])
+
+            Args:
+                cStrList (list(str)): names of the commands
+                forceHardware (bool): will always query from hardware
+
+            Returns:
+                (list): command values, in the same order
+        '''
+        live = self.config['live']
+        fresh = []
+        queried = []
+        for cStr in cStrList:
+            try:
+                prevVal = live.get(cStr, asCmd=False)
+            except KeyError:
+                prevVal = None
+            if prevVal is None:
+                fresh.append(cStr)
+            if (prevVal is None or forceHardware or self._isStale(cStr)) and cStr not in queried:
+                queried.append(cStr)
+        if len(queried) > 0:
+            self._getHardwareConfig(queried)
+        for cStr in fresh:  # This is the first time getting, so it goes in 'init'
+            self.config['init'].transfer(live, cStr)
+        return [live.get(cStr, asCmd=False) for cStr in cStrList]
+
+    def invalidateConfig(self, *cStrs):
+        ''' Marks cached values as stale, so that they come from hardware the next time.
+            For when the driver changes the instrument without :meth:`setConfigParam`,
+            or hands it over to people in lab.
+
+            Args:
+                cStrs (str): command names, or patterns like ``'WFMOUTPRE:*'``
+        '''
+        live = self.config['live']
+        for cStr in cStrs:
+            path = live._path(cStr)
+            if any(char in path for char in '*?['):
+                self._staleParams.update(p for p in live._values if fnmatchcase(p, path))
+            else:
+                self._staleParams.add(path)
+
+    def _isStale(self, cStr):
+        ''' Whether a cached value should not be trusted, according to the cache policies '''
+        if not self._staleParams and not self.cacheTTL:
+            return False
+        path = self.config['live']._path(cStr)
+        if path in self._staleParams:
+            return True
+        for pattern, ttl in self.cacheTTL.items():
+            if fnmatchcase(path, pattern):
+                return time.monotonic() - self._syncTimes.get(path, -ttl - 1) > ttl
+        return False
+
+    def _synced(self, paths, written=False):
+        ''' The cached values of these paths are now the same as in hardware.
+            If they were written, cached values that depend on them go stale.
+        '''
+        if self.cacheTTL:
+            now = time.monotonic()
+            for path in paths:
+                self._syncTimes[path] = now
+        self._staleParams.difference_update(paths)
+        if written:
+            for pattern, dependents in self.cacheInvalidation.items():
+                if any(fnmatchcase(path, pattern) for path in paths):
+                    self.invalidateConfig(*dependents)
+
     @contextmanager
     def tempConfig(self, cStr, tempVal, forceHardware=False):
         ''' Changes a parameter within the context of a "with" block.
@@ -433,6 +585,10 @@ class Configurable(AbstractDriver):
     def _getHardwareConfig(self, cStrList):
         ''' Queries all or a subgroup of commands using the state of the 'live' config.
 
+            Several commands are queried in one compound query, unless :py:meth:`_coalescing`
+            says otherwise. If that fails, they are queried one by one, and if that works,
+            ``compoundQueries`` is turned off for this instrument.
+
             This does not return, but it puts it in the config['live'] attribute
 
             Args:
@@ -441,48 +597,127 @@ class Configurable(AbstractDriver):
         self.initHardware()
         if type(cStrList) is not list and type(cStrList) is str:
             cStrList = [cStrList]
-        for cStr in cStrList:
-            if cStr[-1] == '&':  # handle the sibling subdir token
-                cStr = cStr[:-2]
+        cStrList = [cStr[:-2] if cStr[-1] == '&' else cStr  # handle the sibling subdir token
+                    for cStr in cStrList]
+        if len(cStrList) > 1 and self.compoundQueries and self._coalescing():
+            try:
+                with self.batch() as batch:
+                    results = [batch.query(cStr + '?') for cStr in cStrList[:-1]]
+                    lastRet = batch.query_now(cStrList[-1] + '?')
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning('Compound query of %s parameters failed (%s). '
+                               'Querying them one by one.', len(cStrList), err)
+            else:
+                rets = [result.value for result in results] + [lastRet]
+                for cStr, ret in zip(cStrList, rets):
+                    self.__storeResponse(cStr, ret)
+                return
+            self.__querySerially(cStrList)
+            self.compoundQueries = False
+        else:
+            self.__querySerially(cStrList)
 
+    def __querySerially(self, cStrList):
+        for cStr in cStrList:
             try:
                 ret = self.query(cStr + '?')
             except VisaIOError:
                 logger.error('Problematic parameter was %s.\n'
                              'Likely it does not exist in this instrument command structure.', cStr)
                 raise
-            logger.debug('Queried %s, got %s', cStr, ret)
+            self.__storeResponse(cStr, ret)
 
-            if self.header:
-                val = ret.split(' ')[-1]
-            else:
-                val = ret
-            # Type detection
-            try:
-                val = float(val)
-            except ValueError:
-                pass
-            else:
-                if val == floor(val):
-                    val = int(val)
-            self.config['live'].set(cStr, val)
+    def __storeResponse(self, cStr, ret):
+        logger.debug('Queried %s, got %s', cStr, ret)
+        if self.header:
+            val = ret.split(' ')[-1]
+        else:
+            val = ret
+        # Type detection
+        try:
+            val = float(val)
+        except ValueError:
+            pass
+        else:
+            if val == floor(val):
+                val = int(val)
+        self.config['live'].set(cStr, val)
+        self._synced([self.config['live']._path(cStr)])
 
     def _setHardwareConfig(self, subgroup=''):
         ''' Writes all or a subgroup of commands using the state of the 'live' config.
 
+            When there are several, they are queued in a :py:meth:`batch` and go out in
+            ``;``-separated compound messages of up to ``maxMessageLength`` characters,
+            if ``coalesceWrites`` is on and :py:meth:`_coalescing` agrees.
+            If the instrument then reports an error, they are written again one by one,
+            and ``coalesceWrites`` is turned off for this instrument.
+
             Args:
                 subgroup (str): a subgroup of commands. If '', we write everything
         '''
         self.initHardware()
-        live = self.config['live'].getList(subgroup, asCmd=False)
-        for cmd in live:
+        live = self.config['live']
+        cmds = []
+        for cmd in live.getList(subgroup, asCmd=False):
             if not self.colon and cmd[0] == self.separator:
                 cmd = cmd[1:]
             if not self.space:
-                ''.join(cmd.split(' '))
+                cmd = ''.join(cmd.split(' '))
+            cmds.append(cmd)
+        if len(cmds) > 1 and self.coalesceWrites and self._coalescing():
+            try:
+                with self.batch():
+                    self.__writeEach(cmds)
+                failed = self._compoundWriteFailed()
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning('Compound write failed (%s).', err)
+                failed = True
+            if failed:
+                logger.warning('Writing %s parameters one by one, '
+                               'and no longer in compound messages.', len(cmds))
+                self.coalesceWrites = False
+                self.__writeEach(cmds)
+        else:
+            self.__writeEach(cmds)
+        self._synced([path for path, _, _ in live._subgroupLeaves(subgroup)], written=True)
+
+    def __writeEach(self, cmds):
+        for cmd in cmds:
             logger.debug('Sending %s to configurable hardware', cmd)
             self.write(cmd)
 
+    def _compoundWriteFailed(self):
+        ''' Whether the instrument rejected the compound writes that were just sent.
+            Asks ``writeErrorQuery`` for the standard event status register, and looks at
+            its query, device-dependent, execution and command error bits.
+            Drivers of instruments that report errors differently can override this.
+
+            Returns:
+                (bool): True if there was an error, or if the instrument could not say
+        '''
+        if self.writeErrorQuery is None:
+            return False
+        try:
+            return bool(int(float(self.query(self.writeErrorQuery))) & 0b111100)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.warning('Could not check for errors with %s (%s).', self.writeErrorQuery, err)
+            return True
+
+    def _coalescing(self):
+        ''' Whether commands can be joined into compound messages. Not if
+
+                * commands are sent without a preceding colon, because compound messages add it, or
+                * this class has its own ``write`` or ``query``, which the compound messages would go around.
+
+            Drivers can also set ``maxMessageLength`` on their session to limit the length,
+            or to 0 for one command per message.
+        '''
+        return (self.colon
+                and getattr(type(self), 'write', None) is None
+                and getattr(type(self), 'query', None) is None
+                and hasattr(self, 'batch'))
+
     def generateDefaults(self, filename=None, overwrite=False):
         ''' Attempts to read every configuration parameter.
             Handles several cases where certain parameters do not make sense and must be skipped
@@ -5,8 +5,6 @@ from lightlab.laboratory.instruments import NetworkAnalyzer
 import numpy as np
 import time
 from lightlab.util.data import Spectrum, FunctionBundle
-import matplotlib.pyplot as plt
-from IPython import display
 
 
 class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
@@ -28,6 +26,14 @@ class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
             or else the CW freq becomes the start frequency. Why? See hack in sweepSetup.
     '''
     instrument_category = NetworkAnalyzer
+    coalesceWrites = True  #: it takes compound messages
+    #: Switching to CW moves the start frequency. The sweep time follows the sweep settings.
+    cacheInvalidation = {'SENS:SWE:TYPE': ['SENS:FREQ:STAR', 'SENS:FREQ:STOP'],
+                         'SENS:FREQ:CW': ['SENS:FREQ:STAR', 'SENS:FREQ:STOP'],
+                         'SENS:FREQ:*': ['SENS:SWE:TIME'],
+                         'SENS:SWE:POIN': ['SENS:SWE:TIME'],
+                         'SENS:SWE:DWEL': ['SENS:SWE:TIME'],
+                         'SENS:IF:FREQ': ['SENS:SWE:TIME']}
 
     def __init__(self, name='The network analyzer', address=None, **kwargs):
         VISAInstrumentDriver.__init__(self, name=name, address=address, **kwargs)
@@ -122,7 +128,7 @@ class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
         if ifBandwidth is not None:
             self.setConfigParam('SENS:IF:FREQ', ifBandwidth)
 
-        self.getSwpDuration(forceHardware=True)
+        self.getSwpDuration()
 
     def sweepEnable(self, swpState=None):
         ''' Switches between sweeping (True) and CW (False) modes
@@ -136,8 +142,8 @@ class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
         if swpState is not None:
             self.setConfigParam('SENS:SWE:TYPE', 'LIN' if swpState else 'CW')
             if self.swpRange is not None:
-                self.setConfigParam('SENS:FREQ:STAR', self.swpRange[0], forceHardware=True)  # Hack
-                self.setConfigParam('SENS:FREQ:STOP', self.swpRange[1], forceHardware=True)  # Hack
+                self.setConfigParam('SENS:FREQ:STAR', self.swpRange[0])
+                self.setConfigParam('SENS:FREQ:STOP', self.swpRange[1])
         return self.getConfigParam('SENS:SWE:TYPE') == 'LIN'
 
     def normalize(self):
@@ -196,9 +202,11 @@ class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
         self.write('SENS:SWE:MODE SING')
         self.query('*OPC?')
 
-        self.setConfigParam('FORM', 'ASC')
+        self.setConfigParam('FORM', 'REAL,32')
+        self.setConfigParam('FORM:BORD', 'NORM')
         self.open()
-        dbm = self.query_ascii_values('CALC{}:DATA? FDATA'.format(self.chanNum))
+        dbm = self.query_binary_values('CALC{}:DATA? FDATA'.format(self.chanNum),
+                                       datatype='f', is_big_endian=True)
         self.close()
 
         fStart = float(self.getConfigParam('SENS:FREQ:STAR'))
@@ -209,6 +217,8 @@ class Agilent_N5222A_NA(VISAInstrumentDriver, Configurable):
 
     # fixme: get this out of here.
     def multiSpectra(self, nSpect=1, livePlot=False):
+        import matplotlib.pyplot as plt
+        from IPython import display
         bund = FunctionBundle()
         for iSpect in range(nSpect):
             s = self.spectrum()
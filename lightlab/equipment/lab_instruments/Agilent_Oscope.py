@@ -1,8 +1,8 @@
 from . import VISAInstrumentDriver, RVISAInstrumentDriver
-from lightlab.equipment.abstract_drivers import TekScopeAbstract
-from . import VISAInstrumentDriver, RVISAInstrumentDriver
-from lightlab.equipment.abstract_drivers import TekScopeAbstract
+from lightlab.equipment.abstract_drivers import TekScopeAbstract, WaveformPreamble
 from lightlab.laboratory.instruments import Oscilloscope
+from lightlab.util.data import Waveform
+from lightlab import logger
 import numpy as np
 
 class Remote_Agilent_Oscope(RVISAInstrumentDriver, TekScopeAbstract):
@@ -22,6 +22,8 @@ class Remote_Agilent_Oscope(RVISAInstrumentDriver, TekScopeAbstract):
     _runModeParam = None
     _runModeSingleShot = None
     _yScaleParam = 'WAVEFORM:YINCREMENT'
+    _preambleSettings = ('TIMEBASE:*', 'WAVEFORM:FORMAT', 'WAVEFORM:UNSIGNED', 'ACQUIRE:*')
+    _preambleChannelSettings = 'CHANNEL{}:*'
 
     def __init__(self, name='The Agilent scope', address=None, url=None, **kwargs):
         RVISAInstrumentDriver.__init__(self, name=name, address=address, url=url, **kwargs)
@@ -100,10 +102,9 @@ class Remote_Agilent_Oscope(RVISAInstrumentDriver, TekScopeAbstract):
         wfms = [None] * len(chans)
         for i, c in enumerate(chans):
             vRaw = self.__transferData(c)
-            t, v = self.__scaleData(vRaw, chans)
-            # Optical modules might produce 'W' instead of 'V'
-            unit = self.__getUnit()
-            wfms[i] = Waveform(t, v, unit=unit)
+            preamble = self._preamble(c)
+            t, v = self.__scaleData(vRaw, preamble)
+            wfms[i] = Waveform(t, v, unit=preamble.yUnit)
 
         return wfms
 
@@ -139,59 +140,48 @@ class Remote_Agilent_Oscope(RVISAInstrumentDriver, TekScopeAbstract):
 
             Returns:
                 :mod:`data.Waveform`: a time, voltage paired signal
-
-            Todo:
-                Make this binary transfer to go even faster
         '''
-        chStr = 'CH' + str(chan)
-        self.setConfigParam('WAVEFORM:FORMAT', 'ASCII')
-        self.setConfigParam('WAVEFORM:SOURCE CHANNEL', chStr)
-        
-        self.write('WAVEFORM:DATA?')
-        self._session_object.mbSession.read_bytes(10)
-        voltRaw = self._session_object.mbSession.read_ascii_values('f')
+        self.setConfigParam('WAVEFORM:FORMAT', 'WORD')
+        self.setConfigParam('WAVEFORM:BYTEORDER', 'MSBFIRST')
+        self.setConfigParam('WAVEFORM:UNSIGNED', 1)
+        self.setConfigParam('WAVEFORM:SOURCE', 'CHANNEL' + str(chan))
+
+        voltRaw = self.query_binary_values('WAVEFORM:DATA?', datatype='H', is_big_endian=True)
         return voltRaw
 
-    def __scaleData(self, voltRaw, ch):
+    def _queryPreamble(self, chan):
+        ''' Queries ``WAVEFORM:PREAMBLE`` and the channel units in one message.
+            The preamble is ``format, type, points, count, xincrement, xorigin,
+            xreference, yincrement, yorigin, yreference``.
+        '''
+        preamble, units = self.getConfigParams(['WAVEFORM:PREAMBLE', 'CHANNEL{}:UNITS'.format(chan)],
+                                               forceHardware=True)
+        fields = [float(f) for f in str(preamble).split(',')]
+        units = str(units).strip('"')
+        return WaveformPreamble(yOff=fields[9], yScale=fields[7], yZero=fields[8],
+                                yUnit={'VOLT': 'V', 'AMP': 'A'}.get(units, units), xIncr=fields[4])
+
+    def __scaleData(self, voltRaw, preamble):
         ''' Scale to second and voltage units.
 
-            DSA and DPO are very annoying about treating ymult and yscale differently.
-            TDS uses ymult not yscale
-
             Args:
                 voltRaw (ndarray): what is returned from ``__transferData``
+                preamble (WaveformPreamble): from :meth:`_preamble`
 
             Returns:
                 (ndarray): time in seconds, centered at t=0 regardless of timebase position
                 (ndarray): voltage in volts
 
             Notes:
-                The formula for real voltage should be (Y - YOFF) * YSCALE + YZERO.
-                The Y represents the position of the sampled point on-screen,
-                YZERO, the reference voltage, YOFF, the offset position, and
-                YSCALE, the conversion factor between position and voltage.
+                The formula for real voltage is (Y - YREFERENCE) * YINCREMENT + YORIGIN.
         '''
-        get = lambda param: float(self.getConfigParam(f"CHANNEL{ch}:UNITS" + param, forceHardware=True))
-        voltage = (np.array(voltRaw) - get("WAVEFORM:YREFERENCE")) \
-            * get(self._yScaleParam(ch)) \
-            + get('WAVEFORM:YORIGIN')
+        voltage = (np.array(voltRaw) - preamble.yOff) * preamble.yScale + preamble.yZero
 
-        timeDivision = float(self.getConfigParam('HORIZONTAL:MAIN:SCALE', forceHardware=True))
-        time = np.linspace(-1, 1, len(voltage)) / 2 * timeDivision * 10
+        time = np.arange(len(voltage)) * preamble.xIncr
+        time -= np.mean(time)
 
         return time, voltage
 
-    def __getUnit(self, chStr):
-        ''' Gets the unit of the waveform as a string.
-            Args:
-                chStr (str): what channel you want to scale to
-                
-            Normally, this will be '"V"', which can be converted to 'V'
-        '''
-
-        yunit_query = self.getConfigParam(f"CHANNEL{chStr}:UNITS", forceHardware=True)
-        return yunit_query.replace('"', '')
-
     def wfmDb(self, chan, nWfms, untriggered=False):
         raise NotImplementedError()
 
@@ -4,7 +4,6 @@ from lightlab.laboratory.instruments import PulsePatternGenerator
 from lightlab.util.data.one_dim import prbs_pattern
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 class Anritsu_MP1763B_PPG(VISAInstrumentDriver, Configurable):
@@ -154,7 +153,7 @@ class Anritsu_MP1763B_PPG(VISAInstrumentDriver, Configurable):
         res: graphing parameter - how many sampling points per pattern bit
         Author: Mitchell A. Nahmias, Feb. 2018
         '''
-
+        import matplotlib.pyplot as plt
         delays = sorted(chpulses.keys())
         # timeWindow = min(np.diff(delays))
         ChNum = len(chpulses)
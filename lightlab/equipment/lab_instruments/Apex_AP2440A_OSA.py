@@ -1,10 +1,9 @@
 from . import VISAInstrumentDriver
-from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection
+from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection, parse_ascii_values
 from lightlab.laboratory.instruments import OpticalSpectrumAnalyzer
 
 import numpy as np
 from lightlab.util.data import Spectrum
-import rvisa as pyvisa
 import time
 from lightlab import visalogger as logger
 import socket
@@ -81,20 +80,7 @@ class Apex_AP2440A_OSA(VISAInstrumentDriver):
     def _query(self, queryStr):
         with self._tcpsocket.connected() as s:
             s.send(queryStr)
-
-            i = 0
-            old_timeout = s.timeout
-            s.timeout = self.MAGIC_TIMEOUT
-            received_msg = ''
-            while i < 1024:  # avoid infinite loop
-                recv_str = s.recv(1024)
-                received_msg += recv_str
-                if recv_str.endswith('\n'):
-                    break
-                s.timeout = 1
-                i += 1
-            s.timeout = old_timeout
-            return received_msg.rstrip()
+            return s.readline().rstrip()
 
     def query(self, queryStr, expected_talker=None):
         ret = self._query(queryStr)
@@ -183,20 +169,15 @@ class Apex_AP2440A_OSA(VISAInstrumentDriver):
         """
 
         retStr = self._query('SPDATAD0')
-        powerData = pyvisa.util.from_ascii_block(retStr,
-                                                 converter='f',
-                                                 separator=' ',
-                                                 container=list)
+        powerData = parse_ascii_values(retStr, separator=' ', container=np.array)
 
         dataLen = int(powerData[0])
-        powerData = np.array(powerData[1:])
+        powerData = powerData[1:]
         retStr = self._query('SPDATAWL0')
-        wavelengthData = pyvisa.util.from_ascii_block(retStr,
-                                                      converter='f',
-                                                      separator=' ',
-                                                      container=list)
+        wavelengthData = parse_ascii_values(retStr, separator=' ', container=np.array,
+                                            npts=dataLen + 1)
         assert dataLen == wavelengthData[0]
-        wavelengthData = np.array(wavelengthData[1:])
+        wavelengthData = wavelengthData[1:]
         # wavelengthData = np.linspace(self.wlRange[1], self.wlRange[0], dataLen)
 
         return wavelengthData[::-1], powerData[::-1]
@@ -75,20 +75,7 @@ class NI_PCI_6723(VISAInstrumentDriver, MultiModalSource, MultiChannelSource):
     def _query(self, queryStr):
         with self._tcpsocket.connected() as s:
             s.send(queryStr)
-
-            i = 0
-            old_timeout = s.timeout
-            s.timeout = self.MAGIC_TIMEOUT
-            received_msg = ''
-            while i < 1024:  # avoid infinite loop
-                recv_str = s.recv(1024)
-                received_msg += recv_str
-                if recv_str.endswith('\n'):
-                    break
-                s.timeout = 1
-                i += 1
-            s.timeout = old_timeout
-            return received_msg.rstrip()
+            return s.readline().rstrip()
 
     def query(self, queryStr, expected_talker=None):
         ret = self._query(queryStr)
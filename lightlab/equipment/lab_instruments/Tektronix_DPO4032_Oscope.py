@@ -33,21 +33,17 @@ class Tektronix_DPO4032_Oscope(Tektronix_DPO4034_Oscope):
             self.setConfigParam('DATA:STOP', int(duration * 2.5e9))
 
         presentSettings = dict()
-        presentSettings['avgCnt'] = self.getConfigParam('ACQUIRE:NUMAVG', forceHardware=True)
-        presentSettings['duration'] = self.getConfigParam(
-            'HORIZONTAL:MAIN:SCALE', forceHardware=True)
         # presentSettings['position'] = self.getConfigParam('HORIZONTAL:MAIN:POSITION', forceHardware=True)
-        presentSettings['nPts'] = self.getConfigParam(self._recLenParam, forceHardware=True)
+        presentSettings['avgCnt'], presentSettings['duration'], presentSettings['nPts'] = \
+            self.getConfigParams(['ACQUIRE:NUMAVG', 'HORIZONTAL:MAIN:SCALE', self._recLenParam])
         return presentSettings
 
-    def __scaleData(self, voltRaw):
+    def __scaleData(self, voltRaw, preamble):
         ''' Scale to second and voltage units.
 
-            DSA and DPO are very annoying about treating ymult and yscale differently.
-            TDS uses ymult not yscale
-
             Args:
                 voltRaw (ndarray): what is returned from ``__transferData``
+                preamble (WaveformPreamble): from :meth:`_preamble`
 
             Returns:
                 (ndarray): time in seconds, centered at t=0 regardless of timebase position
@@ -59,12 +55,10 @@ class Tektronix_DPO4032_Oscope(Tektronix_DPO4034_Oscope):
                 YZERO, the reference voltage, YOFF, the offset position, and
                 YSCALE, the conversion factor between position and voltage.
         '''
-        get = lambda param: float(self.getConfigParam('WFMOUTPRE:' + param, forceHardware=True))
-        voltage = (np.array(voltRaw) - get('YOFF')) \
-            * get(self._yScaleParam) \
-            + get('YZERO')
+        voltage = (np.array(voltRaw) - preamble.yOff) * preamble.yScale + preamble.yZero
 
-        sample_rate = float(self.getConfigParam('HORIZONTAL:MAIN:SAMPLERATE', forceHardware=True))
+        # read back after any HORIZONTAL write, because the scope adjusts it to the timebase
+        sample_rate = float(self.getConfigParam('HORIZONTAL:MAIN:SAMPLERATE'))
         # time = np.linspace(-1, 1, len(voltage)) / 2 * timeDivision * 10
         time = np.arange(len(voltage)) / sample_rate
         time -= np.mean(time)
@@ -112,22 +106,13 @@ class Tektronix_DPO4032_Oscope(Tektronix_DPO4034_Oscope):
         wfms = [None] * len(chans)
         for i, c in enumerate(chans):
             vRaw = self.__transferData(c)
-            t, v = self.__scaleData(vRaw)
+            preamble = self._preamble(c)
+            t, v = self.__scaleData(vRaw, preamble)
             # Optical modules might produce 'W' instead of 'V'
-            unit = self.__getUnit()
-            wfms[i] = Waveform(t, v, unit=unit)
+            wfms[i] = Waveform(t, v, unit=preamble.yUnit)
 
         return wfms
 
-    def __getUnit(self):
-        ''' Gets the unit of the waveform as a string.
-
-            Normally, this will be '"V"', which can be converted to 'V'
-        '''
-
-        yunit_query = self.getConfigParam('WFMOUTPRE:YUNIT', forceHardware=True)
-        return yunit_query.replace('"', '')
-
     def __transferData(self, chan):
         ''' Returns the raw data pulled from the scope as time (seconds) and voltage (Volts)
             Args:
@@ -135,18 +120,17 @@ class Tektronix_DPO4032_Oscope(Tektronix_DPO4034_Oscope):
 
             Returns:
                 :mod:`data.Waveform`: a time, voltage paired signal
-
-            Todo:
-                Make this binary transfer to go even faster
         '''
         chStr = 'CH' + str(chan)
-        self.setConfigParam('DATA:ENCDG', 'ASCII')
+        self.setConfigParam('DATA:ENCDG', 'RIBINARY')
+        self.setConfigParam('DATA:WIDTH', np.dtype(self._curveDatatype).itemsize)
         self.setConfigParam('DATA:SOURCE', chStr)
         self.open()
         try:
-            voltRaw = self.mbSession.query_ascii_values('CURV?')
+            voltRaw = self.query_binary_values('CURV?', datatype=self._curveDatatype,
+                                               is_big_endian=True)
         except pyvisa.VisaIOError as err:
-            logger.error('Problem during query_ascii_values(\'CURV?\')')
+            logger.error('Problem during query_binary_values(\'CURV?\')')
             try:
                 self.close()
             except pyvisa.VisaIOError:
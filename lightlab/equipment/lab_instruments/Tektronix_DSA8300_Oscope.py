@@ -23,6 +23,7 @@ class Tektronix_DSA8300_Oscope(VISAInstrumentDriver, TekScopeAbstract):
     _runModeParam = 'ACQUIRE:STOPAFTER:MODE'
     _runModeSingleShot = 'CONDITION'
     _yScaleParam = 'YSCALE'
+    _curveDatatype = None  # binary curves are 4-byte and formatted differently than DPO/TDS; stay with ASCII
 
     def __init__(self, name='The DSA scope', address=None, **kwargs):
         VISAInstrumentDriver.__init__(self, name=name, address=address, **kwargs)
@@ -1,10 +1,18 @@
+''' All of the instrument drivers in lightlab.
+
+    Drivers are imported when they are first used, not with this package,
+    so that importing one driver does not import the dependencies of all the others.
+    ``from lightlab.equipment.lab_instruments import Keithley_2400_SM`` works as usual.
+    ``dir()`` and ``inspect.getmembers`` see every driver, importing them all.
+
+    A new driver module must be added to ``_driverManifest``.
+'''
 from ..visa_bases import VISAInstrumentDriver
 from ..visa_bases import RVISAInstrumentDriver
 
-# This imports all of the modules in this folder
-# As well as all their member classes that are VISAInstrumentDriver
 import importlib
-import pkgutil
+import sys
+import types
 
 
 class BuggyHardware(Exception):
@@ -13,16 +21,68 @@ class BuggyHardware(Exception):
     '''
 
 
-for _, modname, _ in pkgutil.walk_packages(path=__path__,  # noqa
-                                           prefix=__name__ + '.'):
-    _temp = importlib.import_module(modname)
-    for k, v in _temp.__dict__.items():
-        if k[0] != '_' and type(v) is not type:
-            try:
-                mro = v.mro()
-            except AttributeError:
-                continue
-            if VISAInstrumentDriver in mro:
-                globals()[k] = v
-            if RVISAInstrumentDriver in mro:
-                globals()[k] = v
\ No newline at end of file
+#: driver class name -> name of the module in this package that defines it
+_driverManifest = {
+    'Advantest_Q8221_PM': 'Advantest_Q8221_PM',
+    'Agilent_33220_FG': 'Agilent_33220_FG',
+    'Agilent_83712B_clock': 'Agilent_83712B_clock',
+    'Agilent_N5183A_VG': 'Agilent_N5183A_VG',
+    'Agilent_N5222A_NA': 'Agilent_N5222A_NA',
+    'Remote_Agilent_Oscope': 'Agilent_Oscope',
+    'Anritsu_MP1763B_PPG': 'Anritsu_MP1763B_PPG',
+    'Apex_AP2440A_OSA': 'Apex_AP2440A_OSA',
+    'Arduino_Instrument': 'Arduino_Instrument',
+    'HP_8116A_FG': 'HP_8116A_FG',
+    'HP_8152A_PM': 'HP_8152A_PM',
+    'HP_8156A_VA': 'HP_8156A_VA',
+    'HP_8157A_VA': 'HP_8157A_VA',
+    'ILX_7900B_LS': 'ILX_7900B_LS',
+    'Keithley_2400_SM': 'Keithley_2400_SM',
+    'Keithley_2606B_SMU': 'Keithley_2606B_SMU',
+    'NI_PCI_6723': 'NI_PCI_6723',
+    'RandS_SMBV100A_VG': 'RandS_SMBV100A_VG',
+    'Tektronix_CSA8000_CAS': 'Tektronix_CSA8000_CAS',
+    'Tektronix_DPO4032_Oscope': 'Tektronix_DPO4032_Oscope',
+    'Tektronix_DPO4034_Oscope': 'Tektronix_DPO4034_Oscope',
+    'Remote_Tektronix_DPO4034_Oscope': 'Tektronix_DPO4034_Oscope',
+    'Tektronix_DSA8300_Oscope': 'Tektronix_DSA8300_Oscope',
+    'Tektronix_PPG3202': 'Tektronix_PPG3202',
+    'Tektronix_RSA6120B_RFSA': 'Tektronix_RSA6120B_RFSA',
+    'Tektronix_TDS6154C_Oscope': 'Tektronix_TDS6154C_Oscope',
+}
+
+
+def driverNames():
+    ''' Names of all of the drivers, without importing any of them '''
+    return sorted(_driverManifest.keys())
+
+
+class _DriverRegistry(types.ModuleType):
+    ''' Type of this package, which imports drivers when they are looked up.
+
+        Most drivers have the same name as their module. Importing the module
+        makes the import system bind the module to that name in the package,
+        which ``__setattr__`` replaces with the driver class.
+    '''
+
+    def __getattr__(self, name):
+        try:
+            modname = _driverManifest[name]
+        except KeyError:
+            raise AttributeError('module {} has no attribute {}'.format(self.__name__, name))
+        module = importlib.import_module(self.__name__ + '.' + modname)
+        driver = getattr(module, name)
+        self.__dict__[name] = driver
+        return driver
+
+    def __setattr__(self, name, value):
+        if isinstance(value, types.ModuleType) and _driverManifest.get(name) == name \
+                and value.__name__ == self.__name__ + '.' + name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(_driverManifest.keys()))
+
+
+sys.modules[__name__].__class__ = _DriverRegistry
@@ -0,0 +1,302 @@
+''' Asyncio front-end for instrument sessions.
+
+    Every class here has awaitable ``write``, ``query`` and ``query_ascii_values``,
+    so that a single event loop can keep many instruments busy at once:
+
+    .. code-block:: python
+
+        import asyncio
+        from lightlab.equipment.visa_bases.async_session import to_async
+
+        async def main():
+            scope = to_async(RVISAObject('TCPIP0::scope::INSTR', url=server))
+            smu = to_async(PrologixGPIBObject('prologix://prologix.lab/24'))
+            idn1, idn2 = await asyncio.gather(scope.query('*IDN?'), smu.query('*IDN?'))
+
+        asyncio.run(main())
+
+    * :py:class:`AsyncTCPSocketConnection` talks to its socket natively with asyncio streams.
+    * :py:class:`AsyncSessionAdapter` runs a blocking object (``RVISAObject``,
+      ``VISAObject``, or any driver) in a worker thread. Its calls are serialized, so
+      the blocking object is never used by two threads at the same time.
+      :py:class:`AsyncRVISAObject` and :py:class:`AsyncPrologixGPIBObject` are two of those.
+
+    Any number of coroutines can share one of these objects.
+    Each query holds the object's lock until its response comes back.
+'''
+import asyncio
+import functools
+from lightlab import visalogger as logger
+from .driver_base import TCPSocketConnection, LF, parse_ascii_values
+from .prologix_gpib import PrologixGPIBObject, PrologixResourceManager
+
+
+class AsyncInstrumentSession(object):
+    ''' Awaitable counterpart of :py:class:`InstrumentSessionBase` '''
+
+    _lock = None
+    _lockLoop = None
+
+    @property
+    def lock(self):
+        ''' Serializes access to the underlying session. Made anew for each event loop. '''
+        loop = asyncio.get_event_loop()
+        if self._lock is None or self._lockLoop is not loop:
+            self._lock = asyncio.Lock()
+            self._lockLoop = loop
+        return self._lock
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def write(self, writeStr):
+        raise NotImplementedError
+
+    async def query(self, queryStr, withTimeout=None):
+        raise NotImplementedError
+
+    async def query_ascii_values(self, message, converter='f', separator=',',
+                                 container=list, npts=None):
+        block = await self.query(message)
+        return parse_ascii_values(block, converter, separator, container, npts)
+
+    async def instrID(self):
+        r"""Returns the \*IDN? string"""
+        return await self.query('*IDN?')
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncTCPSocketConnection(AsyncInstrumentSession):
+    ''' Asyncio version of :py:class:`TCPSocketConnection`.
+        Responses are read up to ``read_termination``.
+    '''
+
+    def __init__(self, ip_address, port, timeout=2, termination=LF, read_termination=None):
+        '''
+            Args:
+                ip_address (str): hostname or ip address of the socket server
+                port (int): socket server's port number
+                timeout (float): seconds to wait for connection and for each response
+                termination (str): appended to every message sent
+                read_termination (str): end of every response. Defaults to ``termination``.
+        '''
+        self.ip_address = ip_address
+        self.port = port
+        self.timeout = timeout
+        self._termination = termination
+        self._read_termination = (read_termination if read_termination is not None
+                                  else termination).encode('ascii')
+        self._reader = None
+        self._writer = None
+        self._loop = None
+
+    @classmethod
+    def from_connection(cls, connection):
+        ''' Same server, port, timeout and termination as a blocking :py:class:`TCPSocketConnection` '''
+        return cls(connection.ip_address, connection.port,
+                   timeout=connection.timeout, termination=connection._termination)
+
+    @property
+    def is_connected(self):
+        return self._writer is not None and self._loop is asyncio.get_event_loop()
+
+    async def connect(self):
+        ''' Connects and leaves the connection open. If already connected, does nothing. '''
+        if self.is_connected:
+            return
+        self._writer = None  # a connection from a loop that is gone is useless
+        logger.debug('Attempting new asyncio connection to %s:%s', self.ip_address, self.port)
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip_address, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            logger.error('Cannot connect to resource.')
+            raise
+        self._loop = asyncio.get_event_loop()
+
+    async def disconnect(self):
+        if self._writer is not None:
+            writer, self._writer, self._reader = self._writer, None, None
+            if self._loop is asyncio.get_event_loop():
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except (OSError, AttributeError):
+                    pass
+
+    open = connect
+    close = disconnect
+
+    async def _send(self, value):
+        self._writer.write((('%s' % value) + self._termination).encode('ascii'))
+        await self._writer.drain()
+
+    async def _readline(self, timeout=None):
+        data = await asyncio.wait_for(self._reader.readuntil(self._read_termination),
+                                      self.timeout if timeout is None else timeout)
+        return data.decode('ascii')
+
+    async def send(self, value):
+        ''' Sends an ASCII string to the socket server. Auto-connects if necessary. '''
+        async with self.lock:
+            await self.connect()
+            await self._send(value)
+
+    write = send
+
+    async def readline(self):
+        ''' Receives one response, up to the read termination. Auto-connects if necessary. '''
+        async with self.lock:
+            await self.connect()
+            return await self._readline()
+
+    async def query(self, queryStr, withTimeout=None):
+        ''' Sends a message and waits for its one-line response, without letting
+            other coroutines talk in between.
+        '''
+        async with self.lock:
+            await self.connect()
+            await self._send(queryStr)
+            return (await self._readline(withTimeout)).rstrip()
+
+
+class AsyncSessionAdapter(AsyncInstrumentSession):
+    ''' Makes any blocking session or driver awaitable by running its methods in a
+        worker thread, one call at a time.
+
+        Methods are looked up on the wrapped object, so driver methods work too:
+
+        .. code-block:: python
+
+            keithley = AsyncSessionAdapter(lab.instruments['Keithley'])
+            await keithley.setCurrent(1e-3)
+            volts = await keithley.measVoltage()
+
+        Attributes that are not callable are returned directly, without awaiting.
+    '''
+
+    def __init__(self, session, executor=None):
+        '''
+            Args:
+                session (object): a blocking session, driver or instrument
+                executor (concurrent.futures.Executor): where blocking calls run.
+                    None means the loop's default executor.
+        '''
+        self.session = session
+        self.executor = executor
+
+    async def call(self, func, *args, **kwargs):
+        ''' Runs ``func(*args, **kwargs)`` in the executor, holding this adapter's lock '''
+        loop = asyncio.get_event_loop()
+        async with self.lock:
+            return await loop.run_in_executor(self.executor,
+                                              functools.partial(func, *args, **kwargs))
+
+    async def open(self):
+        await self.call(self.session.open)
+
+    async def close(self):
+        await self.call(self.session.close)
+
+    async def write(self, writeStr):
+        await self.call(self.session.write, writeStr)
+
+    async def query(self, queryStr, withTimeout=None):
+        if withTimeout is None:
+            return await self.call(self.session.query, queryStr)
+        return await self.call(self.session.query, queryStr, withTimeout)
+
+    async def query_ascii_values(self, message, converter='f', separator=',',
+                                 container=list, npts=None):
+        return await self.call(self.session.query_ascii_values, message,
+                               converter, separator, container, npts)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('session', 'executor'):
+            raise AttributeError(name)
+        attr = getattr(self.session, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await self.call(attr, *args, **kwargs)
+        return method
+
+
+class AsyncPrologixGPIBObject(AsyncSessionAdapter):
+    ''' Awaitable :py:class:`PrologixGPIBObject`.
+
+        Each call runs the blocking session in a worker thread, so it takes the same
+        locks as blocking sessions: the instrument's session lock is held from a query
+        until its response is read, even against blocking sessions at the same address.
+        They also share the controller's :py:class:`PrologixResourceManager`,
+        with its one socket and its memory of the addressed device.
+        While an instrument is busy answering a query, the controller
+        is free for other instruments on the same bus.
+    '''
+
+    def __init__(self, address, timeout=2, executor=None):
+        '''
+            Args:
+                address (str): like ``prologix://prologix_ip_address/gpib_primary_address[:gpib_secondary_address]``
+                timeout (float): seconds to wait for the instrument to have a response
+                executor (concurrent.futures.Executor): where blocking calls run.
+                    None means the loop's default executor.
+        '''
+        session = PrologixGPIBObject(address=address, tempSess=False)
+        session.timeout = timeout
+        super().__init__(session, executor=executor)
+
+    @property
+    def address(self):
+        return self.session.address
+
+    @property
+    def _prologix_rm(self):
+        return self.session._prologix_rm
+
+    async def close(self):
+        await self.call(self._prologix_rm.disconnect)
+
+    async def wait(self, bigMsTimeout=10000):
+        await self.query('*OPC?', withTimeout=bigMsTimeout)
+
+
+class AsyncRVISAObject(AsyncSessionAdapter):
+    ''' Awaitable :py:class:`RVISAObject`.
+
+        The RVISA client is blocking, so requests run in worker threads.
+        The session is kept open between calls; ``tempSess`` is not used.
+    '''
+
+    def __init__(self, address=None, url=None, timeout=None, executor=None):
+        from .rvisa_object import RVISAObject
+        super().__init__(RVISAObject(address=address, tempSess=False, url=url, timeout=timeout),
+                         executor=executor)
+
+    @property
+    def address(self):
+        return self.session.address
+
+
+def to_async(session, executor=None):
+    ''' Returns an awaitable version of a session, connection or driver.
+
+        Prologix sessions and raw TCP connections become native asyncio objects.
+        Anything else is wrapped in an :py:class:`AsyncSessionAdapter`.
+    '''
+    if isinstance(session, PrologixGPIBObject):
+        return AsyncPrologixGPIBObject(session.address, timeout=session.timeout, executor=executor)
+    if isinstance(session, TCPSocketConnection) and not isinstance(session, PrologixResourceManager):
+        return AsyncTCPSocketConnection.from_connection(session)
+    return AsyncSessionAdapter(session, executor=executor)
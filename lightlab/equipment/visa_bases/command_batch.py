@@ -0,0 +1,163 @@
+''' Queuing of commands so that they can be sent in as few transport calls as possible.
+
+    This is what is behind :py:meth:`InstrumentSessionBase.batch` and
+    :py:meth:`InstrumentSessionBase.execute`:
+
+    .. code-block:: python
+
+        with instr.batch() as b:
+            instr.write(':CH1:SCALE 0.1')  # queued
+            instr.write(':CH1:POSITION 0')  # queued
+            pos = b.query(':CH2:POSITION?')  # queued, value available after the block
+            idn = instr.query('*IDN?')  # sent right now, together with everything queued
+        print(pos.value)
+
+    SCPI instruments accept several commands in one message if they are separated
+    by ``;``. A query among them gets its answer in the same order, also ``;`` separated.
+'''
+from lightlab import visalogger as logger
+
+DEFAULT_MAX_MESSAGE_LENGTH = 1024  #: characters in one compound message
+
+
+def is_query(command):
+    ''' A command is a query if its header ends with ``?``, like ``*IDN?`` or ``MEAS:VOLT? (@1)`` '''
+    header = command.strip().split(None, 1)
+    return len(header) > 0 and header[0].endswith('?')
+
+
+def compound_messages(commands, maxLength=DEFAULT_MAX_MESSAGE_LENGTH):
+    ''' Joins commands into ``;``-separated compound messages, in order.
+
+        Commands other than common commands (``*...``) get a preceding colon, so that
+        the instrument does not interpret them relative to the previous command's path.
+
+        Args:
+            commands (list(str)): commands to send
+            maxLength (int): no message is longer than this, unless one command alone is.
+                0 means one command per message.
+
+        Returns:
+            (list(tuple)): ``(message, number of queries in it)``
+    '''
+    messages = []
+    parts = []
+    length = 0
+    nQueries = 0
+    for cmd in commands:
+        cmd = cmd.strip()
+        if not cmd:
+            continue
+        part = cmd if parts == [] or cmd[0] in ':*' else ':' + cmd
+        if parts and length + 1 + len(part) > maxLength:
+            messages.append((';'.join(parts), nQueries))
+            parts = []
+            length = 0
+            nQueries = 0
+            part = cmd
+        length += len(part) + (1 if parts else 0)
+        parts.append(part)
+        if is_query(cmd):
+            nQueries += 1
+    if parts:
+        messages.append((';'.join(parts), nQueries))
+    return messages
+
+
+def split_responses(response, nQueries):
+    ''' Splits the response to a compound message into one string per query.
+        Separators inside double quoted strings are ignored.
+
+        Returns:
+            (list(str)): the responses, or None if their number does not match
+    '''
+    if nQueries == 1:
+        return [response]
+    pieces = []
+    current = []
+    inQuotes = False
+    for char in response:
+        if char == '"':
+            inQuotes = not inQuotes
+        elif char == ';' and not inQuotes:
+            pieces.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    pieces.append(''.join(current).strip())
+    if len(pieces) != nQueries:
+        return None
+    return pieces
+
+
+class BatchResult(object):
+    ''' Placeholder for the response of a query queued in a :py:class:`CommandBatch`.
+        ``value`` is filled in when the batch is sent.
+    '''
+
+    def __init__(self, command):
+        self.command = command
+        self.value = None
+        self.done = False
+
+    def __repr__(self):
+        if self.done:
+            return '<BatchResult {!r} -> {!r}>'.format(self.command, self.value)
+        return '<BatchResult {!r} (pending)>'.format(self.command)
+
+
+class CommandBatch(object):
+    ''' Commands queued on a session. Usually created by
+        :py:meth:`InstrumentSessionBase.batch`, not directly.
+    '''
+
+    def __init__(self, session):
+        self.session = session
+        self.pending = []  # (command, BatchResult or None)
+        self.transfers = 0  #: number of times this batch was sent
+
+    def write(self, command):
+        ''' Queues a command. Nothing is returned. '''
+        self.pending.append((command, None))
+
+    def query(self, command):
+        ''' Queues a query.
+
+            Returns:
+                (BatchResult): its ``value`` is set when the batch is sent
+        '''
+        if not is_query(command):
+            raise ValueError('{!r} is not a query. It does not end in "?"'.format(command))
+        result = BatchResult(command)
+        self.pending.append((command, result))
+        return result
+
+    def query_now(self, command):
+        ''' Sends the queue with this query at the end and returns its response '''
+        result = self.query(command)
+        self.flush()
+        return result.value
+
+    def flush(self):
+        ''' Sends everything queued so far '''
+        pending, self.pending = self.pending, []
+        if len(pending) == 0:
+            return
+        session = self.session
+        outer, session._batch = session._batch, None  # so the session does not queue its own commands
+        try:
+            responses = session.execute([cmd for cmd, _ in pending])
+        finally:
+            session._batch = outer
+        self.transfers += 1
+        queries = [result for cmd, result in pending if is_query(cmd)]
+        for result, response in zip(queries, responses):
+            if result is not None:
+                result.value = response
+                result.done = True
+
+    def discard(self):
+        if self.pending:
+            logger.warning('Discarding %s queued commands for %s',
+                           len(self.pending), getattr(self.session, 'address', self.session))
+        self.pending = []
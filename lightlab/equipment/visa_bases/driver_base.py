@@ -2,14 +2,20 @@ from abc import ABC, abstractmethod
 from contextlib import contextmanager
 import socket
 import time
+import warnings
+import numpy as np
 from lightlab import visalogger as logger
 from rvisa.util import from_ascii_block
+from .command_batch import CommandBatch, is_query
+from . import locking
 
 
 class InstrumentSessionBase(ABC):
     ''' Base class for Instrument sessions, to be inherited and specialized
     by VISAObject and PrologixGPIBObject'''
 
+    _batch = None
+
     @abstractmethod
     def spoll(self):
         pass
@@ -51,16 +57,140 @@ class InstrumentSessionBase(ABC):
         pass
 
     def query_ascii_values(self, message, converter='f', separator=',',
-                           container=list):
-        ''' Taken from pvisa.'''
+                           container=list, npts=None):
+        ''' Taken from pvisa. Float data is parsed in one vectorized pass,
+            see :py:func:`parse_ascii_values`.
+
+            Args:
+                npts (int): number of values expected, if known
+        '''
 
         block = self.query(message)
-        return from_ascii_block(block, converter, separator, container)
+        return parse_ascii_values(block, converter, separator, container, npts)
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False,
+                            container=np.array):
+        ''' Queries for an IEEE 488.2 binary block (``#<n><length><data>``)
+            and parses it into numbers.
+
+            Args:
+                message (str): the query, like ``'CURV?'``
+                datatype (str): numpy/struct type code of one element, like ``'h'`` for int16
+                is_big_endian (bool): byte order of the data sent by the instrument
+                container (type): ``np.array`` (default), ``list``, or anything that takes an ndarray
+
+            Returns:
+                (ndarray): the data, in native byte order
+        '''
+        block = self.query_raw_binary(message)
+        return parse_binary_block(block, datatype, is_big_endian, container)
 
     def instrID(self):
         r"""Returns the \*IDN? string"""
         return self.query('*IDN?')
 
+    def _bus_key(self):
+        return locking.bus_key(self.address)
+
+    def _locks(self):
+        ''' The session and bus locks, looked up again only if the address changes '''
+        address = getattr(self, 'address', None)
+        cached = self.__dict__.get('_lockCache')
+        if cached is None or cached[0] != address:
+            cached = (address, locking.session_lock(address), locking.bus_lock(self._bus_key()))
+            self.__dict__['_lockCache'] = cached
+        return cached
+
+    @property
+    def session_lock(self):
+        ''' Reentrant lock of the instrument at this address, shared by all of its sessions.
+            See :py:mod:`~lightlab.equipment.visa_bases.locking`.
+        '''
+        return self._locks()[1]
+
+    @property
+    def bus_lock(self):
+        ''' Reentrant lock of the GPIB board, Prologix controller or link this instrument is on '''
+        return self._locks()[2]
+
+    @property
+    def _callBusLock(self):
+        ''' Bus lock held during each write or query. Sessions that lock the bus
+            for each transfer instead return ``locking.NO_LOCK``.
+        '''
+        return self._locks()[2]
+
+    @contextmanager
+    def locked(self):
+        ''' Context manager that holds this instrument and its bus,
+            so that a transaction of several commands is not interleaved
+            with commands from other threads.
+
+            .. code-block:: python
+
+                with smu.locked():
+                    smu.write(':SOUR:VOLT 1')
+                    current = smu.query(':MEAS:CURR?')
+
+            To hold several instruments, use :py:func:`locking.locked` instead of nesting blocks.
+        '''
+        with self.session_lock, self.bus_lock:
+            yield self
+
+    def execute(self, commands):
+        ''' Sends a sequence of commands in order and returns the responses of the queries.
+            Commands whose header ends with ``?`` are treated as queries.
+
+            This sends them one by one. Backends that can join them into fewer
+            transport calls override it.
+
+            Args:
+                commands (list(str)): writes and queries, mixed
+
+            Returns:
+                (list(str)): responses of the queries, in order
+        '''
+        results = []
+        for cmd in commands:
+            if is_query(cmd):
+                results.append(self.query(cmd))
+            else:
+                self.write(cmd)
+        return results
+
+    @contextmanager
+    def batch(self):
+        ''' Context manager that queues writes and sends them when the block exits,
+            or together with the next query, whichever comes first.
+            Nested blocks join the outer one.
+
+            Queries can also be deferred with the yielded :py:class:`CommandBatch`:
+
+            .. code-block:: python
+
+                with session.batch() as b:
+                    session.write(':CH1:SCALE 0.1')
+                    scale = b.query(':CH2:SCALE?')
+                print(scale.value)
+
+            If the block raises, queued commands are discarded.
+            Other threads cannot use the instrument until the block exits.
+        '''
+        with self.session_lock:
+            if self._batch is not None:
+                yield self._batch
+                return
+            batch = CommandBatch(self)
+            self._batch = batch
+            try:
+                yield batch
+            except BaseException:
+                self._batch = None
+                batch.discard()
+                raise
+            self._batch = None
+            batch.flush()
+
     @property
     @abstractmethod
     def timeout(self):
@@ -72,6 +202,114 @@ class InstrumentSessionBase(ABC):
         pass
 
 
+_FLOAT_CONVERTERS = ('f', 'e', 'g', float)
+
+
+def parse_ascii_values(block, converter='f', separator=',', container=list, npts=None):
+    ''' Parses separated ASCII numbers, like pyvisa's ``from_ascii_block``.
+
+        Floats going into a list or an ndarray are parsed by numpy straight from
+        the response string, with no intermediate Python objects. Anything else,
+        or anything numpy cannot read to the end, goes through ``from_ascii_block``.
+
+        Args:
+            block (str): the response
+            converter (str or callable): as in ``from_ascii_block``
+            separator (str or callable): as in ``from_ascii_block``
+            container (type): ``list`` (default), ``np.array``, or anything that takes a list
+            npts (int): number of values expected, if known.
+                The array is then allocated once, at that size.
+
+        Returns:
+            (list or ndarray): the values
+    '''
+    if converter in _FLOAT_CONVERTERS and isinstance(separator, str) and \
+            container in (list, np.array, np.ndarray):
+        values = _fast_ascii_floats(block, separator, npts)
+        if values is not None:
+            return values.tolist() if container is list else values
+    return from_ascii_block(block, converter, separator, container)
+
+
+def _fast_ascii_floats(block, separator, npts=None):
+    if isinstance(block, bytes):
+        block = block.decode('ascii')
+    block = block.strip()
+    if not block:
+        return None
+    count = -1
+    if npts is not None and separator.strip():
+        if block.count(separator) != npts - 1:
+            return None
+        count = npts
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            values = np.fromstring(block, dtype=float, sep=separator, count=count)
+        except (ValueError, DeprecationWarning):
+            return None
+    if npts is not None and len(values) != npts:
+        return None
+    return values
+
+
+def binary_block_end(data):
+    ''' Finds where the first definite length binary block in ``data`` ends.
+
+        Returns:
+            (int): index right after the block, or None if ``data`` does not hold all of it yet
+    '''
+    start = data.find(b'#')
+    if start < 0 or len(data) < start + 2:
+        return None
+    nDigits = int(data[start + 1:start + 2])
+    if nDigits == 0:
+        raise ValueError('Indefinite length binary blocks (#0) are not supported')
+    if len(data) < start + 2 + nDigits:
+        return None
+    length = int(data[start + 2:start + 2 + nDigits])
+    end = start + 2 + nDigits + length
+    return end if len(data) >= end else None
+
+
+def parse_binary_block(block, datatype='f', is_big_endian=False, container=np.array):
+    ''' Parses an IEEE 488.2 definite length block, ``#<n><length><data>``.
+        Anything before the ``#`` (like a header) and after the data (like a termination) is ignored.
+
+        Args:
+            block (bytes): raw response from the instrument
+            datatype (str): numpy/struct type code of one element
+            is_big_endian (bool): byte order of the data
+            container (type): ``np.array`` (default), ``list``, or anything that takes an ndarray
+
+        Returns:
+            (ndarray): the data, in native byte order
+    '''
+    if isinstance(block, str):
+        block = block.encode('latin-1')
+    end = binary_block_end(block)
+    if end is None:
+        raise ValueError('Incomplete binary block: got {} bytes starting with {!r}'.format(
+            len(block), bytes(block[:12])))
+    start = block.find(b'#')
+    dataStart = start + 2 + int(block[start + 1:start + 2])
+    dtype = np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+    if (end - dataStart) % dtype.itemsize != 0:
+        raise ValueError('Binary block of {} bytes is not a whole number of {!r} elements'.format(
+            end - dataStart, datatype))
+    values = np.frombuffer(block, dtype=dtype, count=(end - dataStart) // dtype.itemsize,
+                           offset=dataStart).astype(dtype.newbyteorder('='))
+    return _to_container(values, container)
+
+
+def _to_container(values, container):
+    if container in (np.array, np.ndarray):
+        return values
+    if container is list:
+        return values.tolist()
+    return container(values)
+
+
 CR = '\r'
 LF = '\n'
 
@@ -85,11 +323,19 @@ class TCPSocketConnection(object):
         s.send('command')  # sends the command through the socket
         r = s.recv(1000)  # receives a message of up to 1000 bytes
         s.disconnect()  # shuts down connection
+
+    Received data goes into an internal buffer, so responses can be read
+    by line (``readline``), up to a terminator (``read_until``), by size
+    (``read_exact``), straight into a preallocated array (``read_into``),
+    or as a binary block (``read_binary_block``), with no data lost in between.
     '''
 
     port = None  #: socket server's port number
+    chunk_size = 65536  #: bytes requested from the socket at a time
     _socket = None
     _termination = None
+    _buffer = None
+    _skip_termination = False
 
     def __init__(self, ip_address, port, timeout=2, termination=LF):
         """
@@ -103,6 +349,7 @@ class TCPSocketConnection(object):
         self.port = port
         self.ip_address = ip_address
         self._termination = termination
+        self._buffer = bytearray()
 
     def _send(self, socket, value):
         encoded_value = (('%s' % value) + self._termination).encode('ascii')
@@ -110,9 +357,94 @@ class TCPSocketConnection(object):
         return sent
 
     def _recv(self, socket, msg_length=2048):
-        received_value = socket.recv(msg_length)
+        if self._buffer:
+            received_value = bytes(self._buffer[:msg_length])
+            del self._buffer[:msg_length]
+        else:
+            received_value = socket.recv(msg_length)
         return received_value.decode('ascii')
 
+    # Buffered reading. These expect to be connected.
+
+    def _fill(self):
+        chunk = self._socket.recv(self.chunk_size)
+        if not chunk:
+            raise ConnectionError('Socket closed by {} during a read'.format(self.ip_address))
+        if self._skip_termination:
+            chunk = chunk.lstrip(b'\r\n')
+            self._skip_termination = (len(chunk) == 0)
+        self._buffer += chunk
+
+    def _read_until(self, term):
+        start = 0
+        while True:
+            pos = self._buffer.find(term, start)
+            if pos >= 0:
+                end = pos + len(term)
+                data = bytes(self._buffer[:end])
+                del self._buffer[:end]
+                return data
+            start = max(0, len(self._buffer) - len(term) + 1)
+            self._fill()
+
+    def _read_exact(self, n):
+        while len(self._buffer) < n:
+            self._fill()
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    def _read_into(self, buffer):
+        view = memoryview(buffer).cast('B')
+        n = len(view)
+        have = min(len(self._buffer), n)
+        view[:have] = self._buffer[:have]
+        del self._buffer[:have]
+        while have < n:
+            got = self._socket.recv_into(view[have:], n - have)
+            if got == 0:
+                raise ConnectionError('Socket closed by {} during a read'.format(self.ip_address))
+            have += got
+        return n
+
+    def _read_block_header(self):
+        ''' Reads up to the start of the data of a definite length binary block.
+
+        Returns:
+            (bytes, int): everything up to the data, and the data length
+        '''
+        prefix = self._read_until(b'#')
+        nDigits = self._read_exact(1)
+        if nDigits == b'0':
+            raise ValueError('Indefinite length binary blocks (#0) are not supported')
+        digits = self._read_exact(int(nDigits))
+        return prefix + nDigits + digits, int(digits)
+
+    def _finish_block(self):
+        # the termination following the block must not show up in the next response
+        del self._buffer[:len(self._buffer) - len(self._buffer.lstrip(b'\r\n'))]
+        if not self._buffer:
+            self._skip_termination = True
+
+    def _read_response(self):
+        ''' Reads one whole response as bytes. If it contains a definite length
+        binary block, termination characters inside the block do not end it.
+        '''
+        while True:
+            hashPos = self._buffer.find(b'#')
+            termPos = self._buffer.find(b'\n')
+            if termPos >= 0 and (hashPos < 0 or termPos < hashPos):
+                return self._read_until(b'\n')
+            if 0 <= hashPos < len(self._buffer) - 1:
+                if self._buffer[hashPos + 1:hashPos + 2].isdigit():
+                    header, length = self._read_block_header()
+                    data = self._read_exact(length)
+                    self._finish_block()
+                    return header + data
+                if termPos >= 0:
+                    return self._read_until(b'\n')
+            self._fill()
+
     def connect(self):
         ''' Connects to the socket and leaves the connection open.
         If already connected, does nothing.
@@ -127,6 +459,8 @@ class TCPSocketConnection(object):
                 init_time = time.time()
                 s.settimeout(self.timeout)
                 s.connect((self.ip_address, self.port))
+                # commands are short. Do not hold them back waiting for acknowledgements.
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             except socket.error:
                 # avoiding shutdown to prevent sending any data to remote socket
                 # https://stackoverflow.com/questions/13109899/does-socket-become-unusable-after-connect-fails
@@ -150,6 +484,8 @@ class TCPSocketConnection(object):
             self._socket.shutdown(socket.SHUT_WR)
             self._socket.close()
             self._socket = None
+        self._buffer = bytearray()
+        self._skip_termination = False
 
     @contextmanager
     def connected(self):
@@ -162,10 +498,10 @@ class TCPSocketConnection(object):
 
         .. code-block:: python
 
-            def query(self, query_msg, msg_length=2048):
+            def query(self, query_msg):
                 with self.connected():
-                    self._send(self._socket, query_msg)
-                    recv = self._recv(self._socket, msg_length)
+                    self.send(query_msg)
+                    recv = self.readline()
                 return recv
 
         '''
@@ -200,5 +536,98 @@ class TCPSocketConnection(object):
             recv = self._recv(self._socket, msg_length)
         return recv
 
+    def readline(self, timeout=None):
+        ''' Receives an ASCII string up to and including the next line feed.
+        Auto-connects if necessary.
+
+        Args:
+            timeout (float): seconds to wait for the line, if different from ``self.timeout``
+        '''
+        with self.connected():
+            if timeout is None:
+                return self._read_until(b'\n').decode('ascii')
+            self._socket.settimeout(timeout)
+            try:
+                return self._read_until(b'\n').decode('ascii')
+            finally:
+                self._socket.settimeout(self.timeout)
+
+    def read_until(self, term):
+        ''' Receives bytes up to and including ``term``. Auto-connects if necessary.
+
+        Args:
+            term (bytes or str): terminator
+        '''
+        if isinstance(term, str):
+            term = term.encode('ascii')
+        with self.connected():
+            return self._read_until(term)
+
+    def read_exact(self, n):
+        ''' Receives exactly ``n`` bytes. Auto-connects if necessary. '''
+        with self.connected():
+            return self._read_exact(n)
+
+    def read_into(self, buffer):
+        ''' Fills a preallocated, writable buffer (bytearray, memoryview, ndarray) with
+        received bytes, without intermediate copies. Auto-connects if necessary.
+
+        Returns:
+            (int): number of bytes received, which is the size of ``buffer``
+        '''
+        with self.connected():
+            return self._read_into(buffer)
+
+    def read_binary_block(self, into=None):
+        ''' Receives a definite length binary block (``#<n><length><data>``).
+        Anything before the ``#`` is discarded. Auto-connects if necessary.
+
+        Args:
+            into (buffer): if given, the data are written in it. It must be the right size.
+
+        Returns:
+            (bytes): the data, or ``into`` if given
+        '''
+        with self.connected():
+            _, length = self._read_block_header()
+            if into is None:
+                data = self._read_exact(length)
+            else:
+                if memoryview(into).nbytes != length:
+                    raise ValueError('Block has {} bytes, but the buffer has {}'.format(
+                        length, memoryview(into).nbytes))
+                self._read_into(into)
+                data = into
+            self._finish_block()
+        return data
+
+    def query_raw_binary(self, query_msg, msg_length=2048):
+        ''' Sends a query and receives the whole response as bytes, which
+            can contain a binary block. Auto-connects if necessary.
+        '''
+        with self.connected():
+            self._send(self._socket, query_msg)
+            recv = self._read_response()
+        return recv
+
+    def query_binary_values(self, query_msg, datatype='f', is_big_endian=False,
+                            container=np.array):
+        ''' Sends a query and receives the binary block response straight into an array.
+            See :py:meth:`InstrumentSessionBase.query_binary_values`.
+        '''
+        dtype = np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+        with self.connected():
+            self._send(self._socket, query_msg)
+            _, length = self._read_block_header()
+            if length % dtype.itemsize != 0:
+                self._read_exact(length)
+                self._finish_block()
+                raise ValueError('Binary block of {} bytes is not a whole number of {!r} elements'.format(
+                    length, datatype))
+            values = np.empty(length // dtype.itemsize, dtype=dtype)
+            self._read_into(values)
+            self._finish_block()
+        return _to_container(values.astype(dtype.newbyteorder('='), copy=False), container)
+
     def query(self, query_msg, msg_length=2048):
         raise NotImplementedError
@@ -0,0 +1,318 @@
+''' Opt-in latency and throughput instrumentation of instrument sessions.
+
+    When enabled, every transfer made by :py:class:`VISAObject`, :py:class:`RVISAObject`,
+    :py:class:`PrologixGPIBObject` and :py:class:`TCPSocketConnection` is timed and counted
+    per address and per command header (the "verb", like ``CURV?`` or ``:CH1:SCALE``).
+
+    Usage:
+
+    .. code-block:: python
+
+        import lightlab
+        from lightlab.equipment.visa_bases import instrumentation
+
+        instrumentation.enable()
+        ...  # run the sweep
+        print(instrumentation.report())
+        lightlab.stats()  # the same numbers, as a dict
+        instrumentation.export('sweep_stats.json')
+
+    Enabling wraps the methods of those classes. Disabling puts the originals back,
+    so that when instrumentation is off, it costs nothing at all.
+
+    Calls made from inside another instrumented call (a query sent through a
+    Prologix controller's socket, for instance) are counted once, by the outermost one.
+    Writes that are only queued in a :py:meth:`~InstrumentSessionBase.batch` are not
+    counted; the transfer that eventually sends them is.
+'''
+import atexit
+import csv
+import functools
+import json
+import math
+import threading
+import time
+import numpy as np
+from lightlab import visalogger as logger
+from .visa_driver import clear_delegation_caches
+
+
+class LatencyHistogram(object):
+    ''' Histogram of latencies with logarithmically spaced bins.
+
+        Percentiles are estimated with the geometric center of their bin,
+        which is within about 6% of the true value.
+    '''
+    binsPerDecade = 20
+    minLatency = 1e-6  #: seconds. Anything faster goes in the first bin.
+
+    def __init__(self):
+        self.bins = dict()  # bin index -> count
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        if seconds > self.minLatency:
+            index = int(math.log10(seconds / self.minLatency) * self.binsPerDecade)
+        else:
+            index = 0
+        self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        ''' Args:
+                p (float): between 0 and 100
+
+            Returns:
+                (float): latency in seconds, or None if there were no calls
+        '''
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for index in sorted(self.bins.keys()):
+            seen += self.bins[index]
+            if seen >= rank:
+                break
+        center = self.minLatency * 10 ** ((index + .5) / self.binsPerDecade)
+        return min(center, self.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class CallStats(object):
+    ''' Counters for one (address, verb) '''
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.bytesOut = 0
+        self.bytesIn = 0
+        self.latency = LatencyHistogram()
+
+    def as_dict(self):
+        return dict(count=self.count, errors=self.errors,
+                    bytes_out=self.bytesOut, bytes_in=self.bytesIn,
+                    total_s=self.latency.total, mean_s=self.latency.mean,
+                    p50_s=self.latency.percentile(50), p95_s=self.latency.percentile(95),
+                    p99_s=self.latency.percentile(99), max_s=self.latency.max)
+
+
+_stats = dict()  # address -> verb -> CallStats
+_statsLock = threading.Lock()
+_local = threading.local()
+_originals = []  # (class, name, original function) of what is currently wrapped
+_exportPaths = []
+
+
+def _nbytes(value):
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, memoryview):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def command_verb(command):
+    ''' The header of a command, without its arguments: ``':ch1:scale 0.1'`` gives ``':CH1:SCALE'`` '''
+    parts = command.strip().split(None, 1)
+    return parts[0].upper() if parts else ''
+
+
+def _session_address(obj):
+    address = getattr(obj, 'address', None)
+    if address is None and hasattr(obj, 'ip_address'):
+        address = '{}:{}'.format(obj.ip_address, obj.port)
+    return str(address)
+
+
+def record(address, verb, seconds, bytesOut=0, bytesIn=0, error=False):
+    ''' Adds one call to the statistics. Instrumented methods call this;
+        other transports can too.
+    '''
+    with _statsLock:
+        byVerb = _stats.setdefault(address, dict())
+        try:
+            entry = byVerb[verb]
+        except KeyError:
+            entry = byVerb[verb] = CallStats()
+        entry.count += 1
+        entry.errors += int(error)
+        entry.bytesOut += bytesOut
+        entry.bytesIn += bytesIn
+        entry.latency.add(seconds)
+
+
+def _instrumented(func, name, takesCommand):
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        depth = getattr(_local, 'depth', 0)
+        if depth > 0 or (name == 'write' and getattr(self, '_batch', None) is not None):
+            return func(self, *args, **kwargs)
+        _local.depth = 1
+        error = False
+        result = None
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _local.depth = 0
+            if takesCommand and args:
+                command = args[0]
+                if isinstance(command, (list, tuple)):
+                    verb = '<{}>'.format(name)
+                    bytesOut = sum(len(cmd) for cmd in command)
+                else:
+                    verb = command_verb(command)
+                    bytesOut = len(command)
+            else:
+                verb = '<{}>'.format(name)
+                bytesOut = 0
+            try:
+                record(_session_address(self), verb, elapsed, bytesOut, _nbytes(result), error)
+            except Exception as err:  # pylint: disable=broad-except
+                logger.warning('Instrumentation failed to record %s: %s', name, err)
+    wrapper._instrumented_original = func
+    return wrapper
+
+
+def _targets():
+    ''' Returns:
+            (list): ``(class, method names that take a command, method names that do not)``
+    '''
+    from .driver_base import TCPSocketConnection
+    from .visa_object import VISAObject
+    from .rvisa_object import RVISAObject
+    from .prologix_gpib import PrologixGPIBObject, PrologixResourceManager
+    return [
+        (VISAObject, ('write', 'query', 'query_raw_binary', 'execute'), ()),
+        (RVISAObject, ('write', 'query', 'query_raw_binary', 'execute'), ()),
+        (PrologixGPIBObject, ('write', 'query', 'query_raw_binary', 'execute'), ('spoll',)),
+        (TCPSocketConnection, ('send', 'query_raw_binary', 'query_binary_values'),
+         ('recv', 'readline', 'read_until', 'read_exact', 'read_into', 'read_binary_block')),
+        (PrologixResourceManager, ('query',), ()),
+    ]
+
+
+def is_enabled():
+    return len(_originals) > 0
+
+
+def enable(export_to=None):
+    ''' Starts recording. Does nothing if already enabled, except for adding ``export_to``.
+
+        Args:
+            export_to (str): if given, the statistics are written to this file
+                (see :py:func:`export`) when the interpreter exits
+    '''
+    if export_to is not None and export_to not in _exportPaths:
+        if not _exportPaths:
+            atexit.register(_export_at_exit)
+        _exportPaths.append(export_to)
+    if is_enabled():
+        return
+    for cls, withCommand, withoutCommand in _targets():
+        for names, takesCommand in ((withCommand, True), (withoutCommand, False)):
+            for name in names:
+                if name not in cls.__dict__:
+                    continue  # inherited, so already wrapped in the parent
+                original = cls.__dict__[name]
+                setattr(cls, name, _instrumented(original, name, takesCommand))
+                _originals.append((cls, name, original))
+    clear_delegation_caches()
+    logger.debug('Session instrumentation enabled')
+
+
+def disable():
+    ''' Stops recording and removes every wrapper. Statistics are kept until :py:func:`reset`. '''
+    while _originals:
+        cls, name, original = _originals.pop()
+        setattr(cls, name, original)
+    clear_delegation_caches()
+
+
+def reset():
+    ''' Forgets every statistic recorded so far '''
+    with _statsLock:
+        _stats.clear()
+
+
+def stats(address=None):
+    ''' Returns:
+            (dict): ``{address: {verb: {'count', 'errors', 'bytes_out', 'bytes_in',
+            'total_s', 'mean_s', 'p50_s', 'p95_s', 'p99_s', 'max_s'}}}``,
+            or just ``{verb: {...}}`` if ``address`` is given
+    '''
+    with _statsLock:
+        snapshot = {addr: {verb: entry.as_dict() for verb, entry in byVerb.items()}
+                    for addr, byVerb in _stats.items()}
+    if address is not None:
+        return snapshot.get(address, dict())
+    return snapshot
+
+
+def _rows():
+    rows = []
+    for addr, byVerb in sorted(stats().items()):
+        for verb, entry in sorted(byVerb.items()):
+            row = dict(address=addr, verb=verb)
+            row.update(entry)
+            rows.append(row)
+    return rows
+
+
+_columns = ('address', 'verb', 'count', 'errors', 'bytes_out', 'bytes_in',
+            'total_s', 'mean_s', 'p50_s', 'p95_s', 'p99_s', 'max_s')
+
+
+def export(filename):
+    ''' Writes the statistics to a file: CSV if it ends in ``.csv``, JSON otherwise. '''
+    if str(filename).endswith('.csv'):
+        with open(filename, 'w', newline='') as fx:
+            writer = csv.DictWriter(fx, fieldnames=_columns)
+            writer.writeheader()
+            writer.writerows(_rows())
+    else:
+        with open(filename, 'w') as fx:
+            json.dump(stats(), fx, indent=2, sort_keys=True)
+
+
+def _export_at_exit():
+    for filename in _exportPaths:
+        try:
+            export(filename)
+        except Exception as err:  # pylint: disable=broad-except
+            logger.error('Could not export session statistics to %s: %s', filename, err)
+
+
+def report():
+    ''' Returns:
+            (str): a table of the statistics, one line per address and verb, slowest first
+    '''
+    def ms(seconds):
+        return '{:9.3f}'.format(1e3 * seconds) if seconds is not None else ' ' * 9
+    rows = sorted(_rows(), key=lambda r: r['total_s'], reverse=True)
+    lines = ['{:<32} {:<20} {:>7} {:>10} {:>10} {:>9} {:>9} {:>9} {:>9}'.format(
+        'address', 'verb', 'count', 'bytes out', 'bytes in',
+        'total ms', 'p50 ms', 'p95 ms', 'p99 ms')]
+    for row in rows:
+        lines.append('{:<32} {:<20} {:>7} {:>10} {:>10} {} {} {} {}'.format(
+            row['address'][:32], row['verb'][:20], row['count'], row['bytes_out'], row['bytes_in'],
+            ms(row['total_s']), ms(row['p50_s']), ms(row['p95_s']), ms(row['p99_s'])))
+    return '\n'.join(lines)
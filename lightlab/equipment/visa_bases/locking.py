@@ -0,0 +1,123 @@
+''' Locks that make instrument sessions safe to use from several threads.
+
+    There are two kinds, both process-wide and reentrant:
+
+        * a session lock per instrument address, shared by every session object
+          that talks to that address. ``write``, ``query``, ``query_raw_binary``
+          and ``execute`` hold it, so a query and its response are never
+          separated by another thread's command to the same instrument.
+        * a bus lock per physical link: a GPIB board (``GPIB0``), a Prologix
+          controller (``prologix://<ip>``), or a GPIB board behind an RVISA server.
+          Instruments with a link of their own (LAN, USB, serial) are their own bus.
+
+    A transaction of several commands holds both with :py:meth:`InstrumentSessionBase.locked`:
+
+    .. code-block:: python
+
+        with scope.locked():
+            scope.write(':CH1:SCALE 0.1')
+            scale = scope.query(':CH1:SCALE?')
+
+    Locks are always taken session first, then bus. A transaction that uses
+    several instruments must lock them all at once, with :py:func:`locked`,
+    instead of nesting their ``locked()`` blocks.
+'''
+from contextlib import ExitStack, contextmanager
+import functools
+import re
+import threading
+
+_sessionLocks = dict()  # address -> RLock
+_busLocks = dict()  # bus key -> RLock
+_registryLock = threading.Lock()
+
+_gpibBoard = re.compile(r'^GPIB(\d*)::', re.IGNORECASE)
+
+
+def _get_lock(registry, key):
+    try:
+        return registry[key]
+    except KeyError:
+        with _registryLock:
+            return registry.setdefault(key, threading.RLock())
+
+
+def session_lock(address):
+    ''' Returns:
+            (RLock): the lock of the instrument at ``address``
+    '''
+    return _get_lock(_sessionLocks, str(address))
+
+
+def bus_lock(key):
+    ''' Returns:
+            (RLock): the lock of the bus called ``key`` (see :py:func:`bus_key`)
+    '''
+    return _get_lock(_busLocks, key)
+
+
+def bus_key(address, url=None):
+    ''' Name of the bus that an address is on.
+
+        Args:
+            address (str): VISA or ``prologix://`` address
+            url (str): RVISA server, for remote instruments
+
+        Returns:
+            (str): like ``'GPIB0'``, ``'prologix://10.0.0.5'``, ``'http://server/GPIB0'``,
+            or the address itself for instruments that are their own bus
+    '''
+    address = str(address)
+    if address.startswith('prologix://'):
+        bus = 'prologix://' + address[len('prologix://'):].split('/', 1)[0]
+    else:
+        match = _gpibBoard.match(address)
+        bus = 'GPIB{}'.format(match.group(1) or 0) if match else address
+    if url is not None:
+        bus = '{}/{}'.format(url.rstrip('/'), bus)
+    return bus
+
+
+class _NoLock(object):
+    ''' Stands in for the bus lock of sessions that take it for each transfer instead '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_LOCK = _NoLock()
+
+
+def synchronized(method):
+    ''' Makes a session method hold the session lock, then the session's
+        ``_callBusLock``, while it runs
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.session_lock, self._callBusLock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def locked(*sessions):
+    ''' Holds the session and bus locks of several sessions,
+        in an order that cannot deadlock with other threads.
+
+        Args:
+            sessions: sessions, drivers, or anything with ``session_lock`` and ``bus_lock``
+    '''
+    with _registryLock:
+        sessionKeys = {id(lock): key for key, lock in _sessionLocks.items()}
+        busKeys = {id(lock): key for key, lock in _busLocks.items()}
+    sessionLocks = {id(s.session_lock): s.session_lock for s in sessions}
+    busLocks = {id(s.bus_lock): s.bus_lock for s in sessions}
+    ordered = [sessionLocks[i] for i in sorted(sessionLocks, key=lambda i: sessionKeys.get(i, ''))]
+    ordered += [busLocks[i] for i in sorted(busLocks, key=lambda i: busKeys.get(i, ''))]
+    with ExitStack() as stack:
+        for lock in ordered:
+            stack.enter_context(lock)
+        yield
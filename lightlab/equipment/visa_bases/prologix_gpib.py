@@ -1,9 +1,13 @@
 # prologix patch, to be inserted somewhere in visa_bases
+from contextlib import contextmanager
 import socket
+import threading
 import time
 import re
 from lightlab import visalogger as logger
 from .driver_base import InstrumentSessionBase, TCPSocketConnection
+from . import locking
+from .locking import synchronized
 
 
 class PrologixResourceManager(TCPSocketConnection):
@@ -34,7 +38,7 @@ class PrologixResourceManager(TCPSocketConnection):
 
         with p.connected():
             p.startup()
-            p.send('++addr 23')  # talks to address 23
+            p.address_device('23')  # talks to address 23
             p.send('command value')  # sends the command and does not expect to read anything
             p.query('command')  # sends a command but reads stuff back
 
@@ -46,21 +50,34 @@ class PrologixResourceManager(TCPSocketConnection):
 
         p.send('++addr 23')  # opens and close socket automatically
 
-    .. warning::
-
-        If a second socket is opened from the same computer while the first was online,
-        the first socket will stop responding and Prologix will send data to the just-opened socket.
-
-    .. todo:: Make this class a singleton to mitigate the issue above.
+    If a second socket is opened from the same computer while the first was online,
+    the first socket will stop responding and Prologix will send data to the just-opened socket.
+    That is why there is only one manager per controller: creating a second one with
+    the same ``ip_address`` returns the first.
 
+    A ``connected()`` block holds the manager's lock, so commands from different
+    threads do not interleave. When it exits, the socket is left open and closed
+    only after ``idle_timeout`` seconds without use. The manager also remembers
+    which GPIB device is addressed, so ``address_device`` only sends ``++addr``
+    when it changes. See ``stats``.
     '''
 
-    # TODO: make this class a singleton:
-    # https://howto.lintel.in/python-__new__-magic-method-explained/
-
     port = 1234  #: port that the Prologix GPIB-Ethernet controller listens to.
+    idle_timeout = 10  #: seconds before an unused socket is closed. 0 closes it right after use.
     _socket = None
 
+    _instances = dict()
+    _instances_lock = threading.Lock()
+
+    def __new__(cls, ip_address, timeout=2):
+        with cls._instances_lock:
+            try:
+                return cls._instances[ip_address]
+            except KeyError:
+                instance = super().__new__(cls)
+                cls._instances[ip_address] = instance
+                return instance
+
     def __init__(self, ip_address, timeout=2):
         """
         Args:
@@ -68,9 +85,93 @@ class PrologixResourceManager(TCPSocketConnection):
             timeout (float): timeout in seconds for establishing socket
                 connection to socket server, default 2.
         """
+        if getattr(self, '_initialized', False):
+            return
         self.timeout = timeout
         self.ip_address = ip_address
         super().__init__(ip_address, self.port, timeout=timeout, termination='\n')
+        self.lock = locking.bus_lock('prologix://' + ip_address)  #: also the ``bus_lock`` of its instruments
+        self.current_address = None  #: GPIB address the controller is talking to, if known
+        self.stats = dict(commands=0, addr_sent=0, addr_skipped=0, connects=0, idle_disconnects=0)
+        self._lastUsed = time.monotonic()
+        self._idleTimer = None
+        self._initialized = True
+
+    def connect(self):
+        with self.lock:
+            if self._socket is None:
+                self.current_address = None  # someone else could have changed it meanwhile
+                self.stats['connects'] += 1
+            return super().connect()
+
+    def disconnect(self):
+        with self.lock:
+            self.current_address = None
+            super().disconnect()
+
+    @contextmanager
+    def connected(self):
+        ''' Context manager that holds the lock and makes sure the socket is connected.
+        The socket stays open afterwards, until it has been idle for ``idle_timeout``.
+        If the block raises, it is closed, so that the next user does not read
+        what is left of a response or trust the addressed device.
+        It can be nested.
+        '''
+        with self.lock:
+            previously_connected = (self._socket is not None)
+            self.connect()
+            try:
+                yield self
+            except BaseException:
+                self.disconnect()
+                raise
+            finally:
+                self._lastUsed = time.monotonic()
+                if self.idle_timeout <= 0:
+                    if not previously_connected:
+                        self.disconnect()
+                else:
+                    self._schedule_idle_close(self.idle_timeout)
+
+    def _schedule_idle_close(self, delay):
+        if self._idleTimer is not None and self._idleTimer.is_alive():
+            return
+        self._idleTimer = threading.Timer(delay, self._close_if_idle)
+        self._idleTimer.daemon = True
+        self._idleTimer.start()
+
+    def _close_if_idle(self):
+        with self.lock:
+            self._idleTimer = None
+            if self._socket is None:
+                return
+            idle = time.monotonic() - self._lastUsed
+            if idle >= self.idle_timeout:
+                logger.debug('Closing idle connection to Prologix %s', self.ip_address)
+                self.stats['idle_disconnects'] += 1
+                self.disconnect()
+            else:
+                self._schedule_idle_close(self.idle_timeout - idle)
+
+    def _send(self, socket, value):
+        self.stats['commands'] += 1
+        return super()._send(socket, value)
+
+    def address_device(self, gpib_addr):
+        ''' Makes the controller talk to the GPIB device at ``gpib_addr`` (like ``'23'`` or ``'23 96'``).
+        Nothing is sent if it is already addressed.
+        '''
+        with self.connected():
+            if self.current_address == gpib_addr:
+                self.stats['addr_skipped'] += 1
+                return
+            self.send('++addr {}'.format(gpib_addr))
+            self.stats['addr_sent'] += 1
+            self.current_address = gpib_addr
+
+    def reset_stats(self):
+        for k in self.stats:
+            self.stats[k] = 0
 
     def startup(self):
         ''' Sends the startup configuration to the controller.
@@ -88,18 +189,23 @@ class PrologixResourceManager(TCPSocketConnection):
 
         Args:
             query_msg (str): query message.
-            msg_length (int): maximum message length. If the received
-                message does not contain a '\n', it triggers another
-                socket recv command with the same message length.
+            msg_length (int): unused, kept for compatibility.
+                The response is read up to the first '\n', however long it is.
         '''
         with self.connected():
             self._send(self._socket, query_msg)
-            recv = self._recv(self._socket, msg_length)
-            while not recv.endswith('\n'):
-                recv += self._recv(self._socket, msg_length)
+            recv = self._read_until(b'\n').decode('ascii')
         return recv
 
 
+def prologix_stats():
+    ''' Returns:
+            (dict): ``{ip_address: PrologixResourceManager.stats}`` for every controller in use
+    '''
+    with PrologixResourceManager._instances_lock:
+        return {ip: dict(rm.stats) for ip, rm in PrologixResourceManager._instances.items()}
+
+
 def _is_valid_hostname(hostname):
     '''Validates whether a hostname is valis. abc.example.com'''
     # from https://stackoverflow.com/questions/2532053/validate-a-hostname-string
@@ -203,13 +309,25 @@ class PrologixGPIBObject(InstrumentSessionBase):
         status_byte = int(spoll.rstrip())
         return status_byte
 
+    @property
+    def _callBusLock(self):
+        # The controller is locked for each transfer, so that other instruments
+        # can use it while this one is busy, as in _send_and_wait
+        return locking.NO_LOCK
+
+    @synchronized
     def LLO(self):
         '''This command disables front panel operation of the currently addressed instrument.'''
-        self._prologix_rm.send('++llo')
+        with self._prologix_rm.connected() as pconn:
+            pconn.address_device(self._prologix_gpib_addr_formatted())
+            pconn.send('++llo')
 
+    @synchronized
     def LOC(self):
         '''This command enables front panel operation of the currently addressed instrument.'''
-        self._prologix_rm.send('++loc')
+        with self._prologix_rm.connected() as pconn:
+            pconn.address_device(self._prologix_gpib_addr_formatted())
+            pconn.send('++loc')
 
     @property
     def termination(self):
@@ -253,39 +371,70 @@ class PrologixGPIBObject(InstrumentSessionBase):
 
     def close(self):
         ''' Closes the connection with the instrument.
-        Side effect: disconnects prologix socket controller'''
+        Side effect: disconnects prologix socket controller, which is shared with
+        other instruments on it. They reconnect on their next command.'''
         self._prologix_rm.disconnect()
 
+    @synchronized
     def write(self, writeStr):
+        if self._batch is not None:
+            self._batch.write(writeStr)
+            return
         with self._prologix_rm.connected() as pconn:
-            pconn.send('++addr {}'.format(self._prologix_gpib_addr_formatted()))
+            pconn.address_device(self._prologix_gpib_addr_formatted())
             pconn.send(self._prologix_escape_characters(writeStr))
 
+    @synchronized
     def query(self, queryStr, withTimeout=None):
         '''Read the unmodified string sent from the instrument to the
            computer.
         '''
+        if self._batch is not None:
+            if withTimeout is None:
+                return self._batch.query_now(queryStr)
+            self._batch.flush()
         logger.debug('%s - Q - %s', self.address, queryStr)
-        retStr = self.query_raw_binary(queryStr, withTimeout)
+        self._send_and_wait(queryStr, withTimeout)
+        with self._prologix_rm.connected() as pconn:
+            pconn.address_device(self._prologix_gpib_addr_formatted())
+            retStr = pconn.query('++read eoi')
         logger.debug('Query Read - %s', repr(retStr))
         return retStr.rstrip()
 
+    @synchronized
+    def execute(self, commands):
+        ''' Sends the commands one by one, like the base class, but in a single socket connection '''
+        with self._prologix_rm.connected():
+            return super().execute(commands)
+
     def wait(self, bigMsTimeout=10000):
         self.query('*OPC?', withTimeout=bigMsTimeout)
 
+    @synchronized
     def clear(self):
         '''This command sends the Selected Device Clear (SDC) message to the currently specified GPIB address.'''
         with self._prologix_rm.connected() as pconn:
-            pconn.send('++addr {}'.format(self._prologix_gpib_addr_formatted()))
+            pconn.address_device(self._prologix_gpib_addr_formatted())
             pconn.send('++clr')
 
+    @synchronized
     def query_raw_binary(self, queryStr, withTimeout=None):
         '''Read the unmodified string sent from the instrument to the
            computer. In contrast to query(), no termination characters
            are stripped. Also no decoding.'''
+        if self._batch is not None:
+            self._batch.flush()
+        self._send_and_wait(queryStr, withTimeout)
+        with self._prologix_rm.connected() as pconn:
+            pconn.address_device(self._prologix_gpib_addr_formatted())
+            return pconn.query_raw_binary('++read eoi')
 
+    def _send_and_wait(self, queryStr, withTimeout=None):
+        ''' Sends the query and waits until the instrument has a message available.
+            The controller is free for other threads while waiting.
+        '''
         with self._prologix_rm.connected() as pconn:
-            pconn.send('++addr {}'.format(self._prologix_gpib_addr_formatted()))
+            pconn.address_device(self._prologix_gpib_addr_formatted())
             pconn.send(self._prologix_escape_characters(queryStr))
 
         if withTimeout is None:
@@ -300,8 +449,7 @@ class PrologixGPIBObject(InstrumentSessionBase):
             # MAV indicates that the message is available
             MAV = (status_byte >> 4) & 1
             if MAV == 1:
-                retStr = self._prologix_rm.query('++read eoi')
-                return retStr.rstrip()
+                return
             # ask for the message in small increments
             time.sleep(0.1)
 
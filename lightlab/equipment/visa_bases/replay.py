@@ -0,0 +1,374 @@
+''' Recording of instrument session traffic, and replay of it without hardware.
+
+    Any :py:class:`InstrumentSession` (so any driver, local or remote) can be recorded.
+    Every command and response is kept, with its timestamp and latency:
+
+    .. code-block:: python
+
+        from lightlab.equipment.visa_bases import replay
+
+        with replay.recording(keithley, scope, filename='sweep.trace.gz'):
+            sweeper.gather()
+
+    Later, with no lab attached, the same drivers get their responses from the file:
+
+    .. code-block:: python
+
+        keithley = Keithley_2400_SM(address='GPIB0::23::INSTR')
+        scope = Tektronix_DPO4034_Oscope(address='GPIB0::18::INSTR')
+        with replay.replaying(keithley, scope, filename='sweep.trace.gz') as trace:
+            sweeper.gather()  # as fast as possible
+        print(trace.total_latency)  # seconds the hardware took when it was recorded
+
+    With ``realtime=True``, every call takes as long as it did when it was recorded.
+
+    Calls are matched per instrument address. By default they must come in the
+    recorded order with the same commands, otherwise :py:class:`ReplayMismatch` is raised.
+    That makes a replay a regression test of the drivers.
+    With ``strict=False``, each response is looked up by its command instead,
+    and writes that were not recorded are accepted.
+
+    Files are JSON lines, gzip compressed if the name ends in ``.gz``.
+'''
+import base64
+from collections import deque
+from contextlib import contextmanager
+import gzip
+import json
+import time
+from lightlab import visalogger as logger
+from .driver_base import InstrumentSessionBase
+from .visa_driver import InstrumentSession
+
+TRACE_VERSION = 1
+
+
+class ReplayMismatch(RuntimeError):
+    ''' A replayed call does not match the recording '''
+    pass
+
+
+class SessionTrace(object):
+    ''' Commands and responses of any number of sessions, in order.
+
+        Each event is a dict with keys
+        ``a`` (address), ``m`` (method), ``c`` (command), ``r`` (response),
+        ``t`` (seconds since the start of the trace), ``dt`` (latency in seconds)
+        and, for calls that raised, ``e`` (the error message).
+    '''
+
+    def __init__(self, events=None):
+        self.events = events if events is not None else []
+        self.created = time.time()
+        self._t0 = time.perf_counter()
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, address, method, command, response, started, latency, error=None):
+        event = dict(a=address, m=method, c=command, r=response,
+                     t=round(started - self._t0, 6), dt=round(latency, 6))
+        if error is not None:
+            event['e'] = error
+        self.events.append(event)
+
+    def for_address(self, address):
+        return [ev for ev in self.events if ev['a'] == address]
+
+    @property
+    def addresses(self):
+        return sorted(set(ev['a'] for ev in self.events))
+
+    @property
+    def total_latency(self):
+        ''' Seconds spent waiting for instruments while recording '''
+        return sum(ev['dt'] for ev in self.events)
+
+    def save(self, filename):
+        opener = gzip.open if str(filename).endswith('.gz') else open
+        with opener(filename, 'wt') as fx:
+            json.dump(dict(version=TRACE_VERSION, created=self.created), fx)
+            fx.write('\n')
+            for event in self.events:
+                if isinstance(event['r'], bytes):
+                    event = dict(event, r=base64.b64encode(event['r']).decode('ascii'), b=1)
+                json.dump(event, fx, separators=(',', ':'))
+                fx.write('\n')
+
+    @classmethod
+    def load(cls, filename):
+        opener = gzip.open if str(filename).endswith('.gz') else open
+        with opener(filename, 'rt') as fx:
+            header = json.loads(fx.readline())
+            if header.get('version') != TRACE_VERSION:
+                raise ValueError('{} is not a version {} session trace'.format(filename, TRACE_VERSION))
+            events = []
+            for line in fx:
+                event = json.loads(line)
+                if event.pop('b', False):
+                    event['r'] = base64.b64decode(event['r'])
+                events.append(event)
+        trace = cls(events)
+        trace.created = header.get('created')
+        return trace
+
+
+class RecordingSession(InstrumentSessionBase):
+    ''' Passes every call to another session and records it in a :py:class:`SessionTrace`.
+        Attributes that are not calls (``timeout``, ``termination``, ...) are those of
+        the other session.
+    '''
+
+    def __init__(self, session, trace):
+        self.__dict__['session'] = session
+        self.__dict__['trace'] = trace
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def __setattr__(self, name, value):
+        if name != '_batch' and hasattr(self.session, name):
+            setattr(self.session, name, value)
+        else:
+            super().__setattr__(name, value)
+
+    def _call(self, method, command, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            if command is None:
+                response = getattr(self.session, method)(*args, **kwargs)
+            else:
+                response = getattr(self.session, method)(command, *args, **kwargs)
+        except Exception as err:
+            self.trace.add(self.session.address, method, command, None,
+                           started, time.perf_counter() - started, error=str(err))
+            raise
+        self.trace.add(self.session.address, method, command, response,
+                       started, time.perf_counter() - started)
+        return response
+
+    @property
+    def timeout(self):
+        return self.session.timeout
+
+    @timeout.setter
+    def timeout(self, newTimeout):
+        self.session.timeout = newTimeout
+
+    def open(self):
+        return self.session.open()
+
+    def close(self):
+        return self.session.close()
+
+    def write(self, writeStr):
+        if self._batch is not None:
+            self._batch.write(writeStr)
+            return
+        self._call('write', writeStr)
+
+    def query(self, queryStr, withTimeout=None):
+        if self._batch is not None:
+            return self._batch.query_now(queryStr)
+        if withTimeout is None:
+            return self._call('query', queryStr)
+        return self._call('query', queryStr, withTimeout)
+
+    def query_raw_binary(self, queryStr, withTimeout=None):
+        if withTimeout is None:
+            return self._call('query_raw_binary', queryStr)
+        return self._call('query_raw_binary', queryStr, withTimeout)
+
+    def execute(self, commands):
+        return self._call('execute', list(commands))
+
+    def spoll(self):
+        return self._call('spoll', None)
+
+    def LLO(self):
+        return self._call('LLO', None)
+
+    def LOC(self):
+        return self._call('LOC', None)
+
+    def wait(self, bigMsTimeout=10000):
+        return self._call('wait', None, bigMsTimeout)
+
+    def clear(self):
+        return self._call('clear', None)
+
+
+class ReplaySession(InstrumentSessionBase):
+    ''' Serves the responses of a :py:class:`SessionTrace` for one address, with no hardware. '''
+
+    termination = '\n'
+    _timeout = None
+
+    def __init__(self, trace, address, realtime=False, strict=True):
+        '''
+            Args:
+                trace (SessionTrace): the recording
+                address (str): the instrument whose events are replayed
+                realtime (bool): if True, every call takes as long as it did when recorded
+                strict (bool): if True, calls must come in the recorded order
+        '''
+        self.trace = trace
+        self.address = address
+        self.tempSess = False
+        self.realtime = realtime
+        self.strict = strict
+        self.events = deque(trace.for_address(address))
+        self.replayed = 0  #: number of calls served
+        if not self.events:
+            logger.warning('Nothing recorded for %s', address)
+
+    def _next(self, method, command):
+        if self.strict:
+            if not self.events:
+                raise ReplayMismatch('{}: {}({!r}) was not recorded, the recording is over'.format(
+                    self.address, method, command))
+            event = self.events[0]
+            if event['m'] != method or event['c'] != command:
+                raise ReplayMismatch('{}: expected {}({!r}), got {}({!r})'.format(
+                    self.address, event['m'], event['c'], method, command))
+            self.events.popleft()
+        else:
+            for event in self.events:
+                if event['m'] == method and event['c'] == command:
+                    self.events.remove(event)
+                    break
+            else:
+                if method in ('write', 'LLO', 'LOC', 'clear'):
+                    return None
+                raise ReplayMismatch('{}: {}({!r}) was not recorded'.format(
+                    self.address, method, command))
+        self.replayed += 1
+        if self.realtime:
+            time.sleep(event['dt'])
+        if 'e' in event:
+            raise RuntimeError('{} (replayed)'.format(event['e']))
+        return event['r']
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, newTimeout):
+        self._timeout = newTimeout
+
+    @property
+    def remaining(self):
+        ''' Number of recorded calls not replayed yet '''
+        return len(self.events)
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def write(self, writeStr):
+        if self._batch is not None:
+            self._batch.write(writeStr)
+            return
+        self._next('write', writeStr)
+
+    def query(self, queryStr, withTimeout=None):
+        if self._batch is not None:
+            return self._batch.query_now(queryStr)
+        return self._next('query', queryStr)
+
+    def query_raw_binary(self, queryStr, withTimeout=None):
+        return self._next('query_raw_binary', queryStr)
+
+    def execute(self, commands):
+        return self._next('execute', list(commands))
+
+    def spoll(self):
+        return self._next('spoll', None)
+
+    def LLO(self):
+        return self._next('LLO', None)
+
+    def LOC(self):
+        return self._next('LOC', None)
+
+    def wait(self, bigMsTimeout=10000):
+        return self._next('wait', None)
+
+    def clear(self):
+        return self._next('clear', None)
+
+
+def _session_holder(obj):
+    ''' The InstrumentSession behind a driver, a session or a lab Instrument '''
+    if isinstance(obj, InstrumentSession):
+        return obj
+    driver = getattr(obj, 'driver', None)
+    if isinstance(driver, InstrumentSession):
+        return driver
+    raise TypeError('{} is not an instrument session, driver or instrument'.format(obj))
+
+
+def record(obj, trace=None):
+    ''' Starts recording the traffic of a driver, session or lab Instrument.
+
+        Returns:
+            (SessionTrace): ``trace``, or a new one
+    '''
+    if trace is None:
+        trace = SessionTrace()
+    holder = _session_holder(obj)
+    if not isinstance(holder._session_object, RecordingSession):
+        holder._session_object = RecordingSession(holder._session_object, trace)
+    return trace
+
+
+def replay(obj, trace, realtime=False, strict=True):
+    ''' Makes a driver, session or lab Instrument get its responses from ``trace``.
+
+        Returns:
+            (ReplaySession): the session that serves them
+    '''
+    holder = _session_holder(obj)
+    session = ReplaySession(trace, holder.address, realtime=realtime, strict=strict)
+    holder._session_object = session
+    return session
+
+
+@contextmanager
+def recording(*objs, filename=None):
+    ''' Records the traffic of every object in the block.
+        The trace is saved to ``filename``, if given, even if the block raises.
+    '''
+    trace = SessionTrace()
+    holders = [_session_holder(obj) for obj in objs]
+    originals = [holder._session_object for holder in holders]
+    for holder in holders:
+        record(holder, trace)
+    try:
+        yield trace
+    finally:
+        for holder, original in zip(holders, originals):
+            holder._session_object = original
+        if filename is not None:
+            trace.save(filename)
+
+
+@contextmanager
+def replaying(*objs, filename=None, trace=None, realtime=False, strict=True):
+    ''' Replays a trace, from ``filename`` or given directly, for every object in the block.
+        Their real sessions are put back afterwards.
+    '''
+    if trace is None:
+        trace = SessionTrace.load(filename)
+    holders = [_session_holder(obj) for obj in objs]
+    originals = [holder._session_object for holder in holders]
+    for holder in holders:
+        replay(holder, trace, realtime=realtime, strict=strict)
+    try:
+        yield trace
+    finally:
+        for holder, original in zip(holders, originals):
+            holder._session_object = original
@@ -8,11 +8,13 @@ from .rvisa_object import RVISAObject
 class RemoteSession(InstrumentSession):
     _session_object = None
     
-    def __init__(self, address=None, tempSess=False, url=None):
+    def __init__(self, address=None, tempSess=False, url=None, leaseTime=None):
         self.reinstantiate_session(address, tempSess, url)
         self.tempSess = tempSess
         self.address = address
         self.url = url
+        if leaseTime is not None:
+            self.leaseTime = leaseTime
     
     def reinstantiate_session(self, address, tempSess, url):
         self._session_object = RVISAObject(address=address, tempSess=tempSess, url=url)
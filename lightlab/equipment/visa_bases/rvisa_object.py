@@ -1,8 +1,10 @@
-import rvisa as visa
 import time
 from lightlab import visalogger as logger
 from .driver_base import InstrumentSessionBase
 from .visa_object import VISAObject
+from . import locking
+from .locking import synchronized
+from . import rvisa_pool
 
 OPEN_RETRIES = 5
 
@@ -11,12 +13,14 @@ LF = '\n'
 
 # Note: this class inherits from the VISAObject class and simply overrides specific methods.
 class RVISAObject(VISAObject):
-    def __init__(self, address=None, tempSess=False, url=None, timeout=None):
+    def __init__(self, address=None, tempSess=False, url=None, timeout=None, leaseTime=None):
         '''
             Args:
                 tempSess (bool): If True, the session is opened and closed every time there is a command
                 address (str): The full visa address
                 url (str, required): the remote instrumentation server link
+                leaseTime (float): If given, a ``tempSess`` session stays open
+                    until there has been no command for this many seconds
         '''
         self.tempSess = tempSess
         self.resMan = None
@@ -25,21 +29,28 @@ class RVISAObject(VISAObject):
         self._open_retries = 0
         self.__timeout = timeout
         self.__termination=None
+        if leaseTime is not None:
+            self.leaseTime = leaseTime
+        self.leaseStats = dict(opens=0, reuses=0, idle_closes=0)
         
         # RVisa edit:
         self.url = url
     
     def open(self):
         if self.mbSession is not None:
+            if self.tempSess:
+                self.leaseStats['reuses'] += 1
             return
         if self.address is None:
             raise RuntimeError("Attempting to open connection to unknown address.")
         if self.url is None:
             raise RuntimeError("Remote instrumentation connection is unset.")
         if self.resMan is None:
-            self.resMan = visa.ResourceManager(self.url,self.__timeout)
+            # Resource managers are shared between all objects using this server
+            self.resMan = rvisa_pool.get_pool(self.url, self.__timeout).acquire()
         try:
             self.mbSession = self.resMan.open_resource(self.address)
+            self.leaseStats['opens'] += 1
             if not self.tempSess:
                 logger.debug('Opened %s', self.address)
         except Exception as err:
@@ -47,6 +58,7 @@ class RVISAObject(VISAObject):
             
     def close(self):
         if self.mbSession is None:
+            self._release_resource_manager()
             return
         try:
             self.mbSession.close()            
@@ -54,11 +66,28 @@ class RVISAObject(VISAObject):
             print(err)
             logger.error(f"There was a problem connectin. Error:\n {err}")
             raise
+        finally:
+            self._release_resource_manager()
         self.mbSession = None
         if not self.tempSess:
             logger.debug('Closed %s', self.address)
+
+    def _bus_key(self):
+        ''' Instruments on the same GPIB board of the same server share a bus '''
+        return locking.bus_key(self.address, self.url)
+
+    def _release_resource_manager(self):
+        ''' Hands the resource manager back to the pool, where it is kept alive for reuse '''
+        if self.resMan is not None:
+            rvisa_pool.get_pool(self.url, self.__timeout).release(self.resMan)
+            self.resMan = None
     
+    @synchronized
     def query(self, queryStr, withTimeout=None):
+        if self._batch is not None:
+            if withTimeout is None:
+                return self._batch.query_now(queryStr)
+            self._batch.flush()
         retStr = None
         timeout = withTimeout
         try:
@@ -77,11 +106,49 @@ class RVISAObject(VISAObject):
             retStr = retStr.rstrip()
             logger.debug('Query Read - %s', retStr)
         finally:
-            if self.tempSess:
-                self.close()
+            self._release()
         return retStr
     
+    @synchronized
+    def query_raw_binary(self, queryStr, withTimeout=None):
+        ''' Sends a query and returns the unmodified response as bytes.
+
+            Remote sessions without ``read_raw`` only pass strings. Then the response
+            comes back through ``query``, and its characters are taken as bytes (latin-1).
+        '''
+        if self._batch is not None:
+            self._batch.flush()
+        retBytes = None
+        try:
+            self.open()
+            logger.debug('%s - Q - %s', self.address, queryStr)
+            readRaw = getattr(self.mbSession, 'read_raw', None)
+            try:
+                if readRaw is None:
+                    if withTimeout is None:
+                        retStr = self.mbSession.query(queryStr)
+                    else:
+                        retStr = self.mbSession.query(queryStr, withTimeout)
+                    retBytes = retStr.encode('latin-1')
+                else:
+                    self.mbSession.write(queryStr)
+                    if withTimeout is None:
+                        retBytes = readRaw()
+                    else:
+                        retBytes = readRaw(timeout=withTimeout)
+            except Exception:
+                logger.error('Problem querying to %s', self.address)
+                raise
+            logger.debug('Query Read - %s bytes', len(retBytes))
+        finally:
+            self._release()
+        return retBytes
+
+    @synchronized
     def write(self, writeStr):
+        if self._batch is not None:
+            self._batch.write(writeStr)
+            return
         try:
             self.open()
             try:
@@ -91,8 +158,7 @@ class RVISAObject(VISAObject):
                 raise
             logger.debug('%s - W - %s', self.address, writeStr)
         finally:
-            if self.tempSess:
-                self.close()
+            self._release()
 
 
     
@@ -103,8 +169,7 @@ class RVISAObject(VISAObject):
                 try:
                     self.open()
                 finally:
-                    if self.tempSess:
-                        self.close()
+                    self._release()
             else:
                 pass # NOTE: RVisa does not have a built-in attribute for timeouts under our ResourceManager. Timeouts are handled on a query-basis.
         return self.__timeout
@@ -0,0 +1,278 @@
+''' Process-wide pool of RVISA resource managers, shared by every
+    :py:class:`~lightlab.equipment.visa_bases.rvisa_object.RVISAObject`
+    (and therefore every ``RemoteSession``) that talks to the same server.
+
+    Building an ``rvisa.ResourceManager`` means setting up a new connection
+    to the remote gateway. Without pooling, that happens on every ``open()``,
+    which is every single ``write``/``query`` when ``tempSess=True``.
+
+    Usage:
+
+    .. code-block:: python
+
+        from lightlab.equipment.visa_bases import rvisa_pool
+
+        rvisa_pool.configure(max_sessions=2, idle_timeout=120)
+        ...  # use drivers as usual
+        print(rvisa_pool.pool_stats())
+
+    Resource managers that are released stay alive (keep-alive) and are
+    handed back out on the next request. Those that sit idle for longer than
+    ``idle_timeout`` seconds are closed the next time the pool is accessed.
+    At most ``max_sessions`` managers are created per URL; once that many
+    are busy, new requests share the least loaded one.
+'''
+from contextlib import contextmanager
+import threading
+import time
+from lightlab import visalogger as logger
+
+DEFAULT_MAX_SESSIONS = 4  #: resource managers per server URL
+DEFAULT_IDLE_TIMEOUT = 60  #: seconds before an unused resource manager is closed
+
+
+def _rvisa_factory(url, timeout):
+    import rvisa
+    return rvisa.ResourceManager(url, timeout)
+
+
+class PoolStats(object):
+    ''' Counters for one :py:class:`ResourceManagerPool`.
+
+        Attributes:
+            hits (int): requests served by an already open resource manager
+            misses (int): requests that had to create a resource manager
+            opens (int): resource managers created successfully
+            evictions (int): resource managers closed for being idle
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.opens = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    opens=self.opens, evictions=self.evictions)
+
+    def __repr__(self):
+        return '<PoolStats hits={hits}, misses={misses}, opens={opens}, ' \
+            'evictions={evictions}>'.format(**self.as_dict())
+
+
+class _PooledManager(object):
+    __slots__ = ('resMan', 'users', 'lastUsed')
+
+    def __init__(self, resMan):
+        self.resMan = resMan
+        self.users = 0
+        self.lastUsed = time.monotonic()
+
+
+class ResourceManagerPool(object):
+    ''' Thread-safe pool of resource managers connected to one server URL.
+
+        Do not instantiate directly, use :py:func:`get_pool`.
+    '''
+
+    def __init__(self, url, timeout=None, factory=None,
+                 max_sessions=DEFAULT_MAX_SESSIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        '''
+            Args:
+                url (str): the remote instrumentation server link
+                timeout (float): passed to the resource manager constructor
+                factory (callable): ``factory(url, timeout)`` returns a new resource manager.
+                    Defaults to ``rvisa.ResourceManager``.
+                max_sessions (int): maximum number of resource managers for this URL
+                idle_timeout (float): seconds a released resource manager is kept alive
+        '''
+        self.url = url
+        self.timeout = timeout
+        self.factory = factory if factory is not None else _rvisa_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.stats = PoolStats()
+        self._lock = threading.Lock()
+        self._managers = []
+
+    def __len__(self):
+        return len(self._managers)
+
+    def acquire(self):
+        ''' Returns a resource manager, reusing an open one if possible.
+            Every call must be paired with a :py:meth:`release`.
+        '''
+        with self._lock:
+            self._evict_idle()
+            idle = [pm for pm in self._managers if pm.users == 0]
+            if idle:
+                pooled = max(idle, key=lambda pm: pm.lastUsed)  # the warmest one
+                self.stats.hits += 1
+            elif len(self._managers) < self.max_sessions:
+                self.stats.misses += 1
+                pooled = _PooledManager(self.factory(self.url, self.timeout))
+                self.stats.opens += 1
+                self._managers.append(pooled)
+                logger.debug('Opened resource manager #%s for %s', len(self._managers), self.url)
+            else:
+                pooled = min(self._managers, key=lambda pm: pm.users)
+                self.stats.hits += 1
+            pooled.users += 1
+            pooled.lastUsed = time.monotonic()
+            return pooled.resMan
+
+    def release(self, resMan):
+        ''' Gives back a resource manager obtained with :py:meth:`acquire`.
+            It stays open for reuse until it has been idle for ``idle_timeout``.
+        '''
+        with self._lock:
+            for pooled in self._managers:
+                if pooled.resMan is resMan:
+                    pooled.users = max(pooled.users - 1, 0)
+                    pooled.lastUsed = time.monotonic()
+                    break
+            else:
+                logger.warning('Releasing a resource manager that does not belong to the pool of %s',
+                               self.url)
+            self._evict_idle()
+
+    @contextmanager
+    def session(self):
+        ''' Context manager version of :py:meth:`acquire`/:py:meth:`release`. '''
+        resMan = self.acquire()
+        try:
+            yield resMan
+        finally:
+            self.release(resMan)
+
+    def evict_idle(self):
+        ''' Closes resource managers that have been idle for longer than ``idle_timeout``.
+
+            Returns:
+                (int): number of resource managers closed
+        '''
+        with self._lock:
+            return self._evict_idle()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        stale = [pm for pm in self._managers
+                 if pm.users == 0 and now - pm.lastUsed > self.idle_timeout]
+        for pooled in stale:
+            self._managers.remove(pooled)
+            self.stats.evictions += 1
+            _close_quietly(pooled.resMan)
+            logger.debug('Evicted idle resource manager for %s', self.url)
+        return len(stale)
+
+    def close_all(self):
+        ''' Closes every resource manager, including those in use. '''
+        with self._lock:
+            for pooled in self._managers:
+                _close_quietly(pooled.resMan)
+            self._managers = []
+
+    def __repr__(self):
+        return '<ResourceManagerPool {} ({} open, {})>'.format(self.url, len(self), self.stats)
+
+
+def _close_quietly(resMan):
+    close = getattr(resMan, 'close', None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as err:  # pylint: disable=broad-except
+        logger.warning('Problem closing a pooled resource manager: %s', err)
+
+
+_pools = dict()
+_factories = dict()
+_defaults = dict(max_sessions=DEFAULT_MAX_SESSIONS, idle_timeout=DEFAULT_IDLE_TIMEOUT)
+_registry_lock = threading.Lock()
+
+
+def get_pool(url, timeout=None):
+    ''' Returns the shared pool for this server URL, creating it if needed.
+
+        Args:
+            url (str): the remote instrumentation server link
+            timeout (float): resource manager timeout. Pools are per (url, timeout).
+
+        Returns:
+            (ResourceManagerPool)
+    '''
+    key = (url, timeout)
+    with _registry_lock:
+        try:
+            return _pools[key]
+        except KeyError:
+            pool = ResourceManagerPool(url, timeout, factory=_factories.get(url), **_defaults)
+            _pools[key] = pool
+            return pool
+
+
+def configure(max_sessions=None, idle_timeout=None):
+    ''' Sets the limits of all pools, present and future.
+
+        Args:
+            max_sessions (int): maximum number of resource managers per URL
+            idle_timeout (float): seconds a released resource manager is kept alive
+    '''
+    with _registry_lock:
+        if max_sessions is not None:
+            if max_sessions < 1:
+                raise ValueError('max_sessions must be at least 1')
+            _defaults['max_sessions'] = max_sessions
+        if idle_timeout is not None:
+            if idle_timeout < 0:
+                raise ValueError('idle_timeout cannot be negative')
+            _defaults['idle_timeout'] = idle_timeout
+        for pool in _pools.values():
+            pool.max_sessions = _defaults['max_sessions']
+            pool.idle_timeout = _defaults['idle_timeout']
+
+
+def register_factory(url, factory):
+    ''' Makes pools for ``url`` build their resource managers with ``factory(url, timeout)``
+        instead of ``rvisa.ResourceManager``. Useful for test servers.
+    '''
+    with _registry_lock:
+        _factories[url] = factory
+        for (pool_url, _), pool in _pools.items():
+            if pool_url == url:
+                pool.factory = factory
+
+
+def unregister_factory(url):
+    with _registry_lock:
+        _factories.pop(url, None)
+        for (pool_url, _), pool in _pools.items():
+            if pool_url == url:
+                pool.factory = _rvisa_factory
+
+
+def pool_stats():
+    ''' Returns:
+            (dict): ``{url: {'hits': ..., 'misses': ..., 'opens': ..., 'evictions': ..., 'open': ...}}``
+    '''
+    with _registry_lock:
+        ret = dict()
+        for (url, _), pool in _pools.items():
+            entry = ret.setdefault(url, dict(hits=0, misses=0, opens=0, evictions=0, open=0))
+            for k, v in pool.stats.as_dict().items():
+                entry[k] += v
+            entry['open'] += len(pool)
+        return ret
+
+
+def clear_pools():
+    ''' Closes all resource managers and forgets every pool. '''
+    with _registry_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
@@ -1,5 +1,6 @@
 from lightlab import visalogger
 import inspect
+import weakref
 
 from .driver_base import InstrumentSessionBase
 from .prologix_gpib import PrologixGPIBObject
@@ -17,9 +18,20 @@ class _AttrGetter(object):
         raise AttributeError("'{}' has no attribute '{}'".format(str(self), name))
 
 
-_InstrumentSessionBase_methods = list(name for name, _ in inspect.getmembers(
+_InstrumentSessionBase_methods = frozenset(name for name, _ in inspect.getmembers(
     InstrumentSessionBase, lambda o: inspect.isfunction(o) or isinstance(o, property)))
 
+_cachingSessions = weakref.WeakSet()  # InstrumentSessions holding delegated methods
+
+
+def clear_delegation_caches():
+    ''' Makes every :py:class:`InstrumentSession` look up its delegated methods again.
+        Needed when methods of the session classes are replaced, like
+        :py:mod:`~lightlab.equipment.visa_bases.instrumentation` does.
+    '''
+    for session in list(_cachingSessions):
+        session._clear_delegates()
+
 
 class InstrumentSession(_AttrGetter):
     ''' This class is the interface between the higher levels of lightlab instruments
@@ -46,10 +58,13 @@ class InstrumentSession(_AttrGetter):
         else:
             self._session_object = VISAObject(address=address, tempSess=tempSess)
 
-    def __init__(self, address=None, tempSess=False):
+    def __init__(self, address=None, tempSess=False, leaseTime=None):
         self.reinstantiate_session(address, tempSess)
         self.tempSess = tempSess
         self.address = address
+        if leaseTime is not None:
+            # goes to the session, see VISAObject.leaseTime
+            self.leaseTime = leaseTime
 
     def open(self):
         return self._session_object.open()
@@ -57,33 +72,48 @@ class InstrumentSession(_AttrGetter):
     def close(self):
         return self._session_object.close()
 
+    cacheDelegates = True  #: keep delegated methods, so that later calls skip ``__getattr__``
+
     def __getattr__(self, name):
-        if name in ('_session_object'):
+        if name == '_session_object':
             return super().__getattr__(name)
+        session = self._session_object
+        try:
+            return_attr = getattr(session, name)
+        except AttributeError:
+            return_attr = super().__getattr__(name)  # pylint: disable=assignment-from-no-return
         else:
-            try:
-                return_attr = getattr(self._session_object, name)
-            except AttributeError:
-                return_attr = super().__getattr__(name)  # pylint: disable=assignment-from-no-return
-            else:
-                if name not in _InstrumentSessionBase_methods:
-                    visalogger.warning("Access to %s.%s will be deprecated soon. "
-                                       "Please include it in InstrumentSessionBase. "
-                                       "", type(self._session_object).__name__, name)
-
-            return return_attr
+            if name not in _InstrumentSessionBase_methods:
+                visalogger.warning("Access to %s.%s will be deprecated soon. "
+                                   "Please include it in InstrumentSessionBase. "
+                                   "", type(session).__name__, name)
+            elif (self.cacheDelegates and inspect.ismethod(return_attr)
+                  and return_attr.__self__ is session):
+                # Found by normal lookup from now on. Dropped when the session changes.
+                self.__dict__[name] = return_attr
+                self.__dict__.setdefault('_delegated', set()).add(name)
+                _cachingSessions.add(self)
+        return return_attr
+
+    def _clear_delegates(self):
+        for name in self.__dict__.pop('_delegated', ()):
+            self.__dict__.pop(name, None)
 
     def __dir__(self):
         return set(super().__dir__() + list(_InstrumentSessionBase_methods))
 
     def __setattr__(self, name, value):
-        if name in ('_session_object'):
+        if name == '_session_object':
+            self._clear_delegates()
             super().__setattr__(name, value)
-        elif name in ('address'):
+        elif name == 'address':
             super().__setattr__(name, value)
             if self._session_object is not None and self._session_object.address != value:
                 tempSess = self._session_object.tempSess
+                leaseTime = vars(self._session_object).get('leaseTime')
                 self.reinstantiate_session(address=value, tempSess=tempSess)
+                if leaseTime is not None:
+                    self._session_object.leaseTime = leaseTime
         elif hasattr(self._session_object, name):
             setattr(self._session_object, name, value)
             # also change in local dictionary if possible
@@ -120,6 +150,33 @@ class DriverMeta(type):
                     raise IncompleteClass(cls.__name__ + ' does not implement {}, '.format(essential) +
                                           'which is essential for {}'.format(inst_klass.__name__))
         super().__init__(name, bases, dct)
+        cls._kwargRouting = DriverMeta._routing(cls)
+
+    @staticmethod
+    def _routing(klass):
+        ''' How to split initializer kwargs between driver and Instrument.
+            Computed once per class, because inspecting every ``__init__`` in the
+            bases is slow compared to instantiating.
+
+            Returns:
+                (tuple): ``(instrument_category, names of driver init args,
+                names that cannot be passed as kwargs)``
+        '''
+        inst_klass = klass.instrument_category
+        if inst_klass is None:
+            return (None, frozenset(), frozenset())
+
+        def getArgs(k):
+            if k is object:
+                return []
+            initArgs = inspect.getfullargspec(k.__init__)[0]
+            for base_klass in k.__bases__:
+                initArgs.extend(getArgs(base_klass))
+            return initArgs
+        forbidden = frozenset(inst_klass.essentialMethods
+                              + inst_klass.essentialProperties
+                              + inst_klass.optionalAttributes)
+        return (inst_klass, frozenset(getArgs(klass)), forbidden)
 
     def __call__(cls, name=None, address=None, *args, **kwargs):
         r'''
@@ -134,20 +191,16 @@ class DriverMeta(type):
 
             # Split the kwargs into those needed by
             # 1) driver and its bases and 2) the leftovers
-            def getArgs(klass):
-                if klass is object:
-                    return []
-                initArgs = inspect.getfullargspec(klass.__init__)[0]
-                for base_klass in klass.__bases__:
-                    initArgs.extend(getArgs(base_klass))
-                return initArgs
-            driver_initArgNames = getArgs(cls)
+            routing = cls.__dict__.get('_kwargRouting')
+            if routing is None or routing[0] is not cls.instrument_category:
+                # instrument_category was changed after the class was made
+                routing = DriverMeta._routing(cls)
+                cls._kwargRouting = routing
+            _, driver_initArgNames, forbidden = routing
             driver_kwargs = dict()
             instrument_kwargs = dict()
             for k, v in kwargs.items():
-                if k in cls.instrument_category.essentialMethods \
-                        + cls.instrument_category.essentialProperties \
-                        + cls.instrument_category.optionalAttributes:
+                if k in forbidden:
                     raise ValueError('Essential attribute {} cannot be '.format(k) +
                                      'passed as a kwarg to the initializer of {}.'.format(cls.__name__))
                 if k in driver_initArgNames:
@@ -1,13 +1,19 @@
 import rvisa as pyvisa
+import threading
 import time
+import weakref
 from lightlab import visalogger as logger
 from .driver_base import InstrumentSessionBase
+from .locking import synchronized
+from .command_batch import DEFAULT_MAX_MESSAGE_LENGTH, compound_messages, split_responses, is_query
 
 OPEN_RETRIES = 5
 
 CR = '\r'
 LF = '\n'
 
+_leasedSessions = weakref.WeakSet()
+
 
 class VISAObject(InstrumentSessionBase):
     '''
@@ -27,12 +33,18 @@ class VISAObject(InstrumentSessionBase):
     _open_retries = 0
     _termination = CR + LF
     __timeout = None
+    maxMessageLength = DEFAULT_MAX_MESSAGE_LENGTH  #: for compound messages in :py:meth:`execute`. 0 disables them.
+    leaseTime = None  #: seconds that a ``tempSess`` session stays open after its last command. None closes it right away.
+    _leaseTimer = None
+    _lastUsed = 0
 
-    def __init__(self, address=None, tempSess=False):
+    def __init__(self, address=None, tempSess=False, leaseTime=None):
         '''
             Args:
                 tempSess (bool): If True, the session is opened and closed every time there is a command
                 address (str): The full visa address
+                leaseTime (float): If given, a ``tempSess`` session is leased instead:
+                    it stays open until there has been no command for this many seconds
         '''
         self.tempSess = tempSess
         self.resMan = None
@@ -40,12 +52,17 @@ class VISAObject(InstrumentSessionBase):
         self.address = address
         self._open_retries = 0
         self.__timeout = None
+        if leaseTime is not None:
+            self.leaseTime = leaseTime
+        self.leaseStats = dict(opens=0, reuses=0, idle_closes=0)
 
     def open(self):
         '''
             Open connection with 5 retries.
         '''
         if self.mbSession is not None:
+            if self.tempSess:
+                self.leaseStats['reuses'] += 1
             return
         if self.address is None:
             raise RuntimeError("Attempting to open connection to unknown address.")
@@ -71,6 +88,7 @@ class VISAObject(InstrumentSessionBase):
             if self._open_retries != 0:
                 logger.warning('Found it!')
             self._open_retries = 0
+            self.leaseStats['opens'] += 1
 
     def close(self):
         if self.mbSession is None:
@@ -84,7 +102,42 @@ class VISAObject(InstrumentSessionBase):
         if not self.tempSess:
             logger.debug('Closed %s', self.address)
 
+    def _release(self):
+        ''' Called at the end of every command. A ``tempSess`` session is closed,
+            unless it is leased, in which case it is closed once it has been idle for ``leaseTime``.
+        '''
+        if not self.tempSess:
+            return
+        if self.leaseTime is None:
+            self.close()
+            return
+        self._lastUsed = time.monotonic()
+        if self._leaseTimer is None:
+            _leasedSessions.add(self)
+            self._schedule_idle_close(self.leaseTime)
+
+    def _schedule_idle_close(self, delay):
+        self._leaseTimer = threading.Timer(delay, self._close_if_idle)
+        self._leaseTimer.daemon = True
+        self._leaseTimer.start()
+
+    def _close_if_idle(self):
+        with self.session_lock:
+            self._leaseTimer = None
+            if self.mbSession is None:
+                return
+            idle = time.monotonic() - self._lastUsed
+            if idle >= self.leaseTime:
+                self.leaseStats['idle_closes'] += 1
+                self.close()
+            else:
+                self._schedule_idle_close(self.leaseTime - idle)
+
+    @synchronized
     def write(self, writeStr):
+        if self._batch is not None:
+            self._batch.write(writeStr)
+            return
         try:
             self.open()
             try:
@@ -94,10 +147,14 @@ class VISAObject(InstrumentSessionBase):
                 raise
             logger.debug('%s - W - %s', self.address, writeStr)
         finally:
-            if self.tempSess:
-                self.close()
+            self._release()
 
+    @synchronized
     def query(self, queryStr, withTimeout=None):
+        if self._batch is not None:
+            if withTimeout is None:
+                return self._batch.query_now(queryStr)
+            self._batch.flush()
         retStr = None
         try:
             self.open()
@@ -116,14 +173,59 @@ class VISAObject(InstrumentSessionBase):
             retStr = retStr.rstrip()
             logger.debug('Query Read - %s', retStr)
         finally:
-            if self.tempSess:
-                self.close()
+            self._release()
         return retStr
 
     def instrID(self):
         r"""Returns the \*IDN? string"""
         return self.query('*IDN?')
 
+    @synchronized
+    def execute(self, commands):
+        ''' Sends a sequence of commands in order and returns the responses of the queries.
+
+            Commands are joined into ``;``-separated compound messages of up to
+            ``maxMessageLength`` characters, so there is one transport call per message
+            instead of one per command. If the responses to a compound query cannot
+            be matched up with the queries, those queries are repeated one by one.
+
+            Args:
+                commands (list(str)): writes and queries, mixed
+
+            Returns:
+                (list(str)): responses of the queries, in order
+        '''
+        results = []
+        queries = [cmd for cmd in commands if is_query(cmd)]  # as given, for repeating them
+        try:
+            self.open()
+            for message, nQueries in compound_messages(commands, self.maxMessageLength):
+                if nQueries == 0:
+                    try:
+                        self.mbSession.write(message)
+                    except Exception:
+                        logger.error('Problem writing to %s', self.address)
+                        raise
+                    logger.debug('%s - W - %s', self.address, message)
+                    continue
+                logger.debug('%s - Q - %s', self.address, message)
+                try:
+                    retStr = self.mbSession.query(message).rstrip()
+                except Exception:
+                    logger.error('Problem querying to %s', self.address)
+                    raise
+                logger.debug('Query Read - %s', retStr)
+                responses = split_responses(retStr, nQueries)
+                if responses is None:
+                    logger.warning('%s gave %s for %s queries. Repeating them one by one.',
+                                   self.address, repr(retStr), nQueries)
+                    responses = [self.mbSession.query(cmd).rstrip()
+                                 for cmd in queries[len(results):len(results) + nQueries]]
+                results.extend(responses)
+        finally:
+            self._release()
+        return results
+
     @property
     def timeout(self):
         if self.__timeout is None:
@@ -133,8 +235,7 @@ class VISAObject(InstrumentSessionBase):
                     self.__timeout = self.mbSession.get_visa_attribute(
                         pyvisa.constants.VI_ATTR_TMO_VALUE)  # None means default
                 finally:
-                    if self.tempSess:
-                        self.close()
+                    self._release()
             else:
                 self.__timeout = self.mbSession.get_visa_attribute(
                     pyvisa.constants.VI_ATTR_TMO_VALUE)  # None means default
@@ -158,6 +259,7 @@ class VISAObject(InstrumentSessionBase):
     def LOC(self):
         raise NotImplementedError()
 
+    @synchronized
     def clear(self):
         if self.mbSession is None:
             try:
@@ -168,8 +270,33 @@ class VISAObject(InstrumentSessionBase):
         else:
             self.mbSession.clear()
 
-    def query_raw_binary(self):
-        raise NotImplementedError()
+    @synchronized
+    def query_raw_binary(self, queryStr, withTimeout=None):
+        ''' Sends a query and returns the unmodified response as bytes.
+            No termination characters are stripped and there is no decoding.
+        '''
+        if self._batch is not None:
+            self._batch.flush()
+        retBytes = None
+        try:
+            self.open()
+            logger.debug('%s - Q - %s', self.address, queryStr)
+            if withTimeout is not None:
+                toutOrig = self.timeout
+                self.timeout = withTimeout
+            try:
+                self.mbSession.write(queryStr)
+                retBytes = self.mbSession.read_raw()
+            except Exception:
+                logger.error('Problem querying to %s', self.address)
+                raise
+            finally:
+                if withTimeout is not None:
+                    self.timeout = toutOrig
+            logger.debug('Query Read - %s bytes', len(retBytes))
+        finally:
+            self._release()
+        return retBytes
 
     def spoll(self):
         raise NotImplementedError()
@@ -187,4 +314,12 @@ class VISAObject(InstrumentSessionBase):
         else:
             raise ValueError("Termination must be one of these: CR, CRLF, LR, ''")
         if self.mbSession is not None:
-            self.mbSession.write_termination = value
\ No newline at end of file
+            self.mbSession.write_termination = value
+
+
+def lease_stats():
+    ''' Returns:
+            (dict): ``{address: VISAObject.leaseStats}`` for every leased session.
+            ``reuses`` counts the commands that did not have to open the session again.
+    '''
+    return {obj.address: dict(obj.leaseStats) for obj in list(_leasedSessions)}
@@ -0,0 +1,144 @@
+''' Runs operations on several instruments at the same time.
+
+    Operations on instruments that are on different buses (GPIB boards,
+    Prologix controllers, LAN links, ...) run in parallel. Those on the same bus
+    run one after another, in the order they were given, because the bus could not
+    serve them any faster. See :py:mod:`lightlab.equipment.visa_bases.locking`.
+
+    Every :py:class:`~lightlab.laboratory.experiments.Experiment` has one:
+
+    .. code-block:: python
+
+        class MyExperiment(Experiment):
+            def hardware_warmup(self):
+                self.executor.gather(self.laser.enable, self.smu.enable, self.scope.run)
+
+        # or directly
+        voltage, spectrum = executor.gather(smu.measVoltage, (osa, osa.spectrum, 1550))
+        idns = executor.map('instrID', [smu, osa, scope])  # in the same order
+
+    If some operations raise, the others still run to the end, then
+    :py:class:`ExecutorError` is raised with every exception and its instrument.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import inspect
+import threading
+from lightlab import logger
+
+
+class ExecutorError(RuntimeError):
+    ''' Some of the operations given to :py:meth:`InstrumentExecutor.gather` raised.
+
+        Attributes:
+            errors (list): ``(instrument, exception)`` of every operation that raised
+            results (list): results in the order given, with the exceptions in place
+    '''
+
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results = results
+        super().__init__('{} of {} operations failed: {}'.format(
+            len(errors), len(results),
+            '; '.join('{}: {!r}'.format(target, err) for target, err in errors)))
+
+
+def busOf(target):
+    ''' Name of the bus that an instrument, driver or session is on.
+        Targets whose bus cannot be told get one of their own.
+    '''
+    from lightlab.laboratory.instruments import Instrument
+    session = target
+    try:
+        if isinstance(target, Instrument):
+            session = target.driver
+        if getattr(session, 'address', None) is not None:
+            return session._bus_key()
+    except Exception:  # pylint: disable=broad-except
+        pass
+    return 'object-{}'.format(id(target))
+
+
+def _task(entry):
+    ''' Splits an operation into ``(target, function, args)``.
+        It is either a bound method of the target or a tuple ``(target, function, *args)``.
+    '''
+    if isinstance(entry, tuple):
+        target, function = entry[:2]
+        return target, function, entry[2:]
+    if not inspect.ismethod(entry):
+        raise TypeError('{!r} is not a method of an instrument. '.format(entry) +
+                        'Give it as (instrument, function, *args) instead.')
+    return entry.__self__, entry, ()
+
+
+class InstrumentExecutor(object):
+    ''' Runs instrument operations in parallel, with one worker thread per bus. '''
+
+    def __init__(self):
+        self._lanes = dict()  # bus -> single thread executor
+        self._lanesLock = threading.Lock()
+
+    def _lane(self, bus):
+        with self._lanesLock:
+            try:
+                return self._lanes[bus]
+            except KeyError:
+                lane = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lightlab-' + bus)
+                self._lanes[bus] = lane
+                return lane
+
+    def submit(self, target, function, *args, **kwargs):
+        ''' Schedules ``function(*args, **kwargs)`` on the bus of ``target``.
+
+            Returns:
+                (concurrent.futures.Future): its result
+        '''
+        return self._lane(busOf(target)).submit(function, *args, **kwargs)
+
+    def gather(self, *operations, returnExceptions=False):
+        ''' Runs operations and waits for all of them.
+
+            Args:
+                operations: bound methods of instruments (``smu.enable``),
+                    or tuples ``(instrument, function, *args)``
+                returnExceptions (bool): if True, exceptions are returned in place of
+                    results instead of raising :py:class:`ExecutorError`
+
+            Returns:
+                (list): the results, in the order given
+        '''
+        tasks = [_task(entry) for entry in operations]
+        futures = [self.submit(target, function, *args) for target, function, args in tasks]
+        return self._collect([target for target, _, _ in tasks], futures, returnExceptions)
+
+    def map(self, methodName, targets, *args, returnExceptions=False, **kwargs):
+        ''' Calls the same method of several instruments, like ``instr.startup()``.
+
+            Returns:
+                (list): the results, in the order of ``targets``
+        '''
+        targets = list(targets)
+        futures = [self.submit(target, lambda t=target: getattr(t, methodName)(*args, **kwargs))
+                   for target in targets]
+        return self._collect(targets, futures, returnExceptions)
+
+    def _collect(self, targets, futures, returnExceptions):
+        results = []
+        errors = []
+        for target, future in zip(targets, futures):
+            try:
+                results.append(future.result())
+            except Exception as err:  # pylint: disable=broad-except
+                logger.error('Operation on %s failed: %r', target, err)
+                results.append(err)
+                errors.append((target, err))
+        if errors and not returnExceptions:
+            raise ExecutorError(errors, results)
+        return results
+
+    def shutdown(self):
+        ''' Waits for everything scheduled, then stops the worker threads '''
+        with self._lanesLock:
+            lanes, self._lanes = list(self._lanes.values()), dict()
+        for lane in lanes:
+            lane.shutdown(wait=True)
@@ -5,6 +5,7 @@ This is useful to keep track of what is connected to what.
 from lightlab import logger
 import lightlab.laboratory.state as labstate
 from lightlab.laboratory.virtualization import Virtualizable
+from lightlab.laboratory.executor import InstrumentExecutor, ExecutorError
 from contextlib import contextmanager
 
 
@@ -40,6 +41,7 @@ class Experiment(Virtualizable):
     connections = None
     _valid = None
     _lab = None
+    _executor = None
     name = None
 
     @property
@@ -68,6 +70,15 @@ class Experiment(Virtualizable):
 
     valid = property(is_valid)
 
+    @property
+    def executor(self):
+        ''' Runs operations on this experiment's instruments in parallel, one bus at a time.
+            See :py:class:`~lightlab.laboratory.executor.InstrumentExecutor`.
+        '''
+        if self._executor is None:
+            self._executor = InstrumentExecutor()
+        return self._executor
+
     def __init__(self, instruments=None, devices=None, **kwargs):
         super().__init__()
         if instruments is not None:
@@ -89,13 +100,30 @@ class Experiment(Virtualizable):
         raise NotImplementedError()
 
     def global_hardware_warmup(self):
+        ''' Starts up all of the instruments at the same time, one bus at a time.
+
+            Raises:
+                Exception: what ``startup`` raised, if one instrument failed
+                ExecutorError: if more than one failed. The others were still started.
+        '''
         try:
             self.instruments
         except AttributeError:
             return
-        else:
-            for instrument in self.instruments:
-                instrument.startup()
+        try:
+            self.executor.map('startup', self.instruments)
+        except ExecutorError as err:
+            if len(err.errors) == 1:
+                raise err.errors[0][1]
+            raise
+
+    def instrumentsLive(self):
+        ''' Checks all of the instruments at the same time.
+
+            Returns:
+                (list(bool)): ``isLive()`` of each instrument, in order
+        '''
+        return self.executor.map('isLive', self.instruments)
 
     def hardware_warmup(self):
         pass
@@ -1,6 +1,7 @@
 ''' This module provides an interface for instruments, hosts and benches in the lab.
 '''
 
+import inspect
 import os
 import platform
 from uuid import getnode as get_mac  # https://stackoverflow.com/questions/159137/getting-mac-address
@@ -383,6 +384,9 @@ class Bench(Node):
         return "Bench {}".format(self.name)
 
 
+_fedThroughNames = dict()  # (Instrument class, driver class) -> names fed through to the driver
+
+
 class Instrument(Node):
     """ Represents an instrument in lab.
 
@@ -449,13 +453,45 @@ class Instrument(Node):
                 implementedOptionals.append(opAttr)
         return implementedOptionals
 
+    def _fedThrough(self):
+        ''' Names of the attributes that go through to the driver, computed once per driver class '''
+        key = (type(self), self._driver_class)
+        try:
+            return _fedThroughNames[key]
+        except KeyError:
+            names = frozenset(self.essentialProperties + self.essentialMethods + self.implementedOptionals)
+            _fedThroughNames[key] = names
+            return names
+
+    def _clearDelegates(self, attrName=None):
+        ''' Forgets driver methods kept by ``__getattr__``, all of them or just ``attrName`` '''
+        delegated = self.__dict__.get('_Instrument__delegated')
+        if not delegated:
+            return
+        names = list(delegated) if attrName is None else [attrName]
+        for name in names:
+            if name in delegated:
+                delegated.discard(name)
+                del self.__dict__[name]
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for name in self.__dict__.get('_Instrument__delegated', ()):
+            state.pop(name, None)
+        return state
+
     # These control feedthroughs to the driver
     def __getattr__(self, attrName):
         errorText = f"'{str(self)}' has no attribute '{attrName}'"
-        if attrName in self.essentialProperties \
-                + self.essentialMethods \
-                + self.implementedOptionals:
-            return getattr(self.driver, attrName)
+        if attrName in self._fedThrough():
+            driver = self.driver
+            attr = getattr(driver, attrName)
+            if inspect.ismethod(attr) and attr.__self__ is driver:
+                # Bound methods of the driver are kept, so they are found without __getattr__.
+                # They are not serialized, and forgotten if the driver changes.
+                self.__dict__[attrName] = attr
+                self.__dict__.setdefault('_Instrument__delegated', set()).add(attrName)
+            return attr
         # Time to fail
         if attrName in self.optionalAttributes:
             errorText += '\nThis is an optional attribute of {} '.format(type(self).__name__)
@@ -472,18 +508,20 @@ class Instrument(Node):
             raise AttributeError(errorText)
 
     def __setattr__(self, attrName, newVal):
-        if attrName in self.essentialProperties \
-                + self.essentialMethods \
-                + self.implementedOptionals:
+        if attrName in self._fedThrough():
+            self._clearDelegates(attrName)
             setattr(self.driver, attrName, newVal)
         else:
             if attrName == 'address':  # Reinitialize the driver
                 if self.__driver_object is not None:
                     self.__driver_object.close()
                     self.__driver_object.address = newVal
+            elif attrName in ('_Instrument__driver_object', '_driver_class'):
+                self._clearDelegates()
             super().__setattr__(mangle(attrName, self.__class__.__name__), newVal)
 
     def __delattr__(self, attrName):
+        self._clearDelegates(attrName)
         if attrName in self.essentialProperties + self.essentialMethods:  # or methods
             self.driver.__delattr__(attrName)
         else:
@@ -2,11 +2,9 @@
     Included is strobeTest which sweeps the delay between actuate and sense, and monitorVariable for drift
 '''
 
-import matplotlib.pyplot as plt
 from cycler import cycler
 import numpy as np
 import time
-from IPython import display
 
 from .data import FunctionBundle
 
@@ -24,6 +22,8 @@ def strobeTest(fActuate, fSense, fReset=None, nPts=10, maxDelay=1, visualize=Tru
         Returns:
             (FunctionBundle): fSense values vs. delay
     '''
+    import matplotlib.pyplot as plt
+    from IPython import display
     fi, ax = plt.subplots(figsize=(12, 7))
     delays = np.linspace(0, maxDelay, nPts)
 
@@ -142,6 +142,8 @@ def monitorVariable(fValue, sleepSec=0, nReps=100, plotEvery=1):
             valueFun (function): called at each timestep with no arguments. Must return a scalar or a 1-D np.array
             sleepSec (scalar): time in seconds to sleep between calls
     '''
+    import matplotlib.pyplot as plt
+    from IPython import display
     curves = None
 
     testV = fValue()
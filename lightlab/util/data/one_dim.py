@@ -1,10 +1,7 @@
 ''' One-dimensional data structures with substantial processing abilities
 '''
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import signal
 from lightlab import logger
-from IPython import display
 import lightlab.util.io as io
 
 from .peaks import findPeaks, ResonanceFeature
@@ -208,11 +205,13 @@ class MeasuredFunction(object):  # pylint: disable=eq-without-hash
         Returns:
             Whatever is returned by ``pyplot.plot``
         '''
+        import matplotlib.pyplot as plt
         curve = plt.plot(*(self.getData() + args), **kwargs)
         plt.autoscale(enable=True, axis='x', tight=True)
         if 'label' in kwargs.keys():
             plt.legend()
         if livePlot:
+            from IPython import display
             display.display(plt.gcf())
             display.clear_output(wait=True)
         return curve
@@ -507,7 +506,7 @@ class MeasuredFunction(object):  # pylint: disable=eq-without-hash
         Returns:
             New object containing the filtered waveform
         '''
-
+        from scipy import signal
         uniformly_sampled = self.uniformlySample()
         x, y = uniformly_sampled.absc, uniformly_sampled.ordi
         dxes = np.diff(x)
@@ -924,6 +923,7 @@ class Spectrum(MeasuredFunction):
     def simplePlot(self, *args, livePlot=False, **kwargs):
         ''' More often then not, this is db vs. wavelength, so label it
         '''
+        import matplotlib.pyplot as plt
         super().simplePlot(*args, livePlot=livePlot, **kwargs)
         plt.xlabel('Wavelength (nm)')
         plt.ylabel('Transmission ({})'.format('dB' if self.inDbm else 'lin'))
@@ -1026,6 +1026,7 @@ class SpectrumGHz(Spectrum):
     def simplePlot(self, *args, livePlot=False, **kwargs):
         ''' More often then not, this is db vs. wavelength, so label it
         '''
+        import matplotlib.pyplot as plt
         super().simplePlot(*args, livePlot=livePlot, **kwargs)
         plt.xlabel('Frequency (GHz)')
         plt.ylabel('Transmission ({})'.format('dB' if self.inDbm else 'lin'))
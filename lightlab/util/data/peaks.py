@@ -4,7 +4,6 @@
     :class:`ResonanceFeature` is a data storage class
     returned by :meth:`~lightlab.util.data.one_dim.MeasuredFunction.findResonanceFeatures`
 """
-import matplotlib.pyplot as plt
 import numpy as np
 from lightlab import logger
 
@@ -77,6 +76,7 @@ class ResonanceFeature(object):
             Returns:
                 whatever ``pyplot.plot`` returns
         """
+        import matplotlib.pyplot as plt
         return plt.plot(*(self.__plottingData() + args), **kwargs)
 
     @staticmethod
@@ -115,6 +115,7 @@ def findPeaks(
         Raises:
             Exception: if not enough peaks found. This plots on fail, so you can see what's going on
     """
+    import matplotlib.pyplot as plt
     xArr = np.arange(len(yArrIn))
     yArr = yArrIn.copy()
     sepInds = int(np.floor(minSep))
@@ -3,10 +3,7 @@
         * discrete (:class:`FunctionBundle`), or
         * continuous (:class:`MeasuredSurface`)
 '''
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import interpolate
-import matplotlib.cm as cm
 from functools import wraps
 from itertools import repeat
 
@@ -244,6 +241,7 @@ class FunctionBundle(Hashable):  # pylint: disable=eq-without-hash
             Returns:
                 (list(axis)): The axes that were plotted upon
         '''
+        import matplotlib.pyplot as plt
         if axList is None:
             _, axList = plt.subplots(nrows=len(self), figsize=(14, 14))
         if len(axList) != len(self):
@@ -496,6 +494,7 @@ class MeasuredSurface(object):
         return cls([addedAbsc, existingAbsc], otherBund.ordiMat)
 
     def __call__(self, testAbscissaVec=None):
+        from scipy import interpolate
         f = interpolate.interp2d(*self.absc, z=self.ordi, kind='cubic')
         return f(*testAbscissaVec)
 
@@ -517,6 +516,8 @@ class MeasuredSurface(object):
         return self.ordi.shape
 
     def simplePlot(self, *args, **kwargs):
+        import matplotlib.pyplot as plt
+        import matplotlib.cm as cm
         if 'cmap' not in kwargs.keys():
             kwargs['cmap'] = cm.inferno  # pylint: disable=no-member
         if 'shading' not in kwargs.keys():
@@ -547,6 +548,7 @@ class MeasuredErrorField(object):
             raise Exception('measuredGrid must be dimension 3 (meaned) or 4 (trials)')
 
     def __call__(self, testVec=None):
+        from scipy import interpolate
         xVec = self.nomiGrid[:, :, 0]
         yVec = self.nomiGrid[:, :, 1]
         uVec = self.measGrid[:, :, 0]
@@ -27,6 +27,8 @@ from .saveload import (pprintFileDir,  # noqa
                        loadPickle,  # noqa
                        loadPickleGzip,  # noqa
                        savePickleGzip,  # noqa
+                       appendPickle,  # noqa
+                       loadPickleChunks,  # noqa
                        saveMat,  # noqa
                        loadMat,  # noqa
                        saveFigure)  # noqa
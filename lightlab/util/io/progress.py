@@ -67,16 +67,19 @@ class ProgressWriter(object):
     '''
     progFileDefault = monitorDir / 'sweep.html'
     tFmt = '%a, %d %b %Y %H:%M:%S'
+    _lastReport = 0
     __tagHead = None
     __tagFoot = None
 
-    def __init__(self, name, swpSize, runServer=True, stdoutPrint=False, **kwargs):  # pylint: disable=unused-argument
+    def __init__(self, name, swpSize, runServer=True, stdoutPrint=False, minInterval=0, **kwargs):  # pylint: disable=unused-argument
         '''
             Args:
                 name (str): name to be displayed
                 swpSize (tuple): size of each dimension of the sweep
+                minInterval (float): seconds between progress reports. 0 reports every update.
         '''
         self.name = name
+        self.minInterval = minInterval
 
         if np.isscalar(swpSize):
             swpSize = [swpSize]
@@ -214,6 +217,10 @@ class ProgressWriter(object):
         for _ in range(steps):
             self.__updateOneInternal()
         if not self.completed:
+            now = time.time()
+            if now - self._lastReport < self.minInterval:
+                return
+            self._lastReport = now
             if self.serving:
                 self.__writeHtml()
             if self.printing:
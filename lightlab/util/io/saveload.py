@@ -1,7 +1,4 @@
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-import scipy.io as sio
 import pickle
 import gzip
 import numpy as np
@@ -132,10 +129,65 @@ def loadPickleGzip(filename):
         return pickle.load(fx)
 
 
+def appendPickle(filename, data, new=False, at=None):
+    ''' Adds one more pickle at the end of the file, without rewriting what is there.
+        It is on disk when this returns, so it survives a crash.
+        Read them back with :py:func:`loadPickleChunks`.
+
+        Args:
+            filename (str, Path): file to append to
+            data (object): almost anything
+            new (bool): if True, the file is emptied first
+            at (int): if not None, the file is cut off at this offset first,
+                like the end of the good chunks from :py:func:`loadPickleChunks`
+    '''
+    rp = _getFileDir(_endingWith(filename, suffix='.pkl'))
+    if new:
+        rp = _makeFileExist(rp)
+    with rp.open('wb' if new else 'r+b' if at is not None else 'ab') as fx:
+        if at is not None and not new:
+            fx.seek(at)
+            fx.truncate()
+        pickle.dump(data, fx)
+        fx.flush()
+        os.fsync(fx.fileno())
+
+
+def loadPickleChunks(filename, withOffset=False):
+    ''' Loads everything appended with :py:func:`appendPickle`, in order.
+        A chunk that was cut off, by a crash while writing it, is left out.
+
+        Args:
+            filename (str, Path): file to read
+            withOffset (bool): if True, also returns where the good chunks end
+
+        Returns:
+            (list): the chunks
+            (int): if ``withOffset``, the file offset after the last good chunk
+    '''
+    rp = _getFileDir(_endingWith(filename, suffix='.pkl'))
+    chunks = []
+    offset = 0
+    with rp.open('rb') as fx:
+        while True:
+            try:
+                chunks.append(pickle.load(fx))
+            except EOFError:
+                break
+            except Exception as err:  # pylint: disable=broad-except
+                print('Stopped reading {} at a damaged chunk: {!r}'.format(rp, err))
+                break
+            offset = fx.tell()
+    if withOffset:
+        return chunks, offset
+    return chunks
+
+
 def saveMat(filename, dataDict):
     ''' dataDict has keys as names you would like to appear in matlab,
         values are numpy arrays, N-D arrays, or matrices.
     '''
+    import scipy.io as sio
     rp = _makeFileExist(_endingWith(filename, suffix='.mat'))
     sio.savemat(str(rp), dataDict)
 
@@ -145,6 +197,7 @@ def loadMat(filename):
         Matlab files only store matrices. This auto-squeezes 1-dimensional matrices to arrays.
         Be careful if you are tyring to load a 1-d numpy matrix as an actual numpy matrix
     '''
+    import scipy.io as sio
     rp = _getFileDir(_endingWith(filename, suffix='.mat'))
     data = sio.loadmat(str(rp))
     for k, v in data.items():
@@ -154,6 +207,8 @@ def loadMat(filename):
 
 def saveFigure(filename, figHandle=None):
     ''' if None, uses the gcf() '''
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
     rp = _makeFileExist(_endingWith(filename, suffix='.pdf'))
     if figHandle is None:
         figHandle = plt.gcf()
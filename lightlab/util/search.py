@@ -1,9 +1,7 @@
 ''' Searching with actuate-measure functions,
     usually around peaks and monotonic functions
 '''
-import matplotlib.pyplot as plt
 import numpy as np
-from IPython import display
 
 from lightlab.util.data import MeasuredFunction
 from lightlab.util.io import RangeError
@@ -23,6 +21,8 @@ def plotAfterPointMeasurement(trackerMF, yTarget=None):
             trackerMF (MeasuredFunction): function that will be plotted
             yTarget (float): plotted as dashed line if not None
     '''
+    import matplotlib.pyplot as plt
+    from IPython import display
     display.clear_output(wait=True)
     plt.cla()
     trackerMF.simplePlot('.-')
@@ -1,15 +1,12 @@
 ''' Generalized sweep classes
 '''
 
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import time
-from IPython import display
-import matplotlib.cm
 from collections import OrderedDict
 
 from lightlab.util.data import argFlatten, rms
-from lightlab.util.plot import plotCovEllipse
 import lightlab.util.io as io
 from lightlab import logger
 
@@ -76,8 +73,8 @@ class Sweeper(object):
                 * xKey
                 * yKey
                 * axArr
-                * cmap-surf
-                * cmap-curves
+                * cmap-surf: colormap or its name
+                * cmap-curves: colormap or its name
 
             Valid options for CommandControlSweeper
                 * plType
@@ -123,11 +120,168 @@ class Actuation(object):
     function = None
     domain = None
     doOnEveryPoint = None
+    instruments = None
 
-    def __init__(self, function=None, domain=None, doOnEveryPoint=False):
+    def __init__(self, function=None, domain=None, doOnEveryPoint=False, instruments=None):
         self.function = function
         self.domain = domain
         self.doOnEveryPoint = doOnEveryPoint
+        self.instruments = instruments
+
+
+class TriggeredMeasurement(object):
+    ''' A measurement in two parts: ``trigger`` starts it at the sweep point
+        and ``fetch`` gets the result, such as a scope acquisition and its waveform transfer.
+
+        It is called like any other measurement function, doing both.
+        In a pipelined :py:meth:`NdSweeper.gather`, ``fetch`` runs in the background
+        while the next point is actuated.
+    '''
+
+    def __init__(self, fetch, trigger=None, instruments=None):
+        '''
+            Args:
+                fetch (func): no arguments, returns the measurement
+                trigger (func, None): no arguments, called at the sweep point. Its return is ignored.
+                instruments (object, list, None): what ``fetch`` talks to. If None, it is the object of
+                    ``fetch``, when that is a bound method, like ``scope.acquire``.
+        '''
+        self.fetch = fetch
+        self.trigger = trigger if trigger is not None else lambda: None
+        self.instruments = instruments
+
+    def __call__(self):
+        self.trigger()
+        return self.fetch()
+
+
+def _instrumentsOf(*functions):
+    ''' Which instruments some functions use.
+
+        Args:
+            functions (tuple): ``(function, instruments)`` pairs. See :py:class:`TriggeredMeasurement`
+
+        Returns:
+            (frozenset, None): instrument addresses, or ids if they have none. None if it cannot be told
+    '''
+    keys = set()
+    for function, instruments in functions:
+        if instruments is None:
+            instruments = getattr(function, '__self__', None)
+            if instruments is None:
+                return None
+        if not isinstance(instruments, (list, tuple, set)):
+            instruments = [instruments]
+        keys.update(getattr(instr, 'address', None) or id(instr) for instr in instruments)
+    return frozenset(keys)
+
+
+def _fetchAll(toFetch):
+    return [(measKey, measFun.fetch()) for measKey, measFun in toFetch]
+
+
+class _SweepCheckpoint(object):
+    ''' Appends the finished points of a sweep to a file, a chunk at a time.
+        The first chunk says what sweep it is, every other one is a list of ``(index, pointData)``.
+    '''
+
+    def __init__(self, filename, swpShape, interval):
+        self.filename = filename
+        self.swpShape = swpShape
+        self.interval = interval
+        self._points = []
+        self._lastWrite = time.time()
+        self._end = None  # where the good chunks of a loaded file end. Anything after is cut off
+
+    def start(self):
+        io.appendPickle(self.filename, dict(swpShape=self.swpShape), new=True)
+
+    def load(self):
+        ''' Returns:
+                (list): ``(index, pointData)`` of the points in the file, or None if there is no file
+        '''
+        try:
+            chunks, self._end = io.loadPickleChunks(self.filename, withOffset=True)
+        except FileNotFoundError:
+            return None
+        if not chunks or tuple(chunks[0].get('swpShape', ())) != self.swpShape:
+            raise ValueError('Checkpoint {} is not of a sweep of shape {}'.format(self.filename, self.swpShape))
+        return [point for chunk in chunks[1:] for point in chunk]
+
+    def add(self, index, pointData):
+        self._points.append((index, pointData))
+        if time.time() - self._lastWrite >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._points:
+            io.appendPickle(self.filename, self._points, at=self._end)
+            self._points = []
+            self._end = None
+        self._lastWrite = time.time()
+
+
+class _SweepGrids(object):
+    ''' Fills the data grids of a sweep, point by point.
+
+        Grids are allocated at the first point, typed after its values:
+        numbers go in float grids, numeric ndarrays in dense float grids
+        with the array dimensions after the sweep dimensions, and anything else
+        in object grids. A value that does not fit its grid, like an array of
+        another length, turns that grid into an object grid.
+        A key that first shows up at a later point gets NaN at the points before.
+    '''
+
+    def __init__(self, data, swpShape, denseVectors=True):
+        self.data = data
+        self.swpShape = swpShape
+        self.denseVectors = denseVectors
+        self.nStored = 0
+        self._shapes = dict()  # key -> shape of the array at every point, None if not dense
+
+    def allocate(self, key, value):
+        shape = None
+        fill = np.nan if self.nStored > 0 else 0  # so that missing points do not look like zeros
+        if (self.denseVectors and isinstance(value, np.ndarray) and value.ndim > 0
+                and value.dtype.kind in 'biufc'):
+            dtype = complex if value.dtype.kind == 'c' else float
+            shape = value.shape
+            self.data[key] = np.full(self.swpShape + shape, fill, dtype=dtype)
+        elif np.isscalar(value) and not isinstance(value, (str, bytes)):
+            self.data[key] = np.full(self.swpShape, fill, dtype=float)
+        else:
+            self.data[key] = np.empty(self.swpShape, dtype=object)
+        self._shapes[key] = shape
+        return shape
+
+    def store(self, index, pointData):
+        data = self.data
+        shapes = self._shapes
+        for k, v in pointData.items():
+            try:
+                shape = shapes[k]
+            except KeyError:
+                shape = self.allocate(k, v)
+            try:
+                if shape is not None and getattr(v, 'shape', None) != shape:
+                    raise ValueError('{} changed shape'.format(k))
+                data[k][index] = v
+            except (ValueError, TypeError):
+                self._toObjects(k, index)[index] = v
+        self.nStored += 1
+
+    def _toObjects(self, key, index):
+        ''' Moves the points stored so far into an object grid '''
+        old = self.data[key]
+        new = np.empty(self.swpShape, dtype=object)
+        nDone = int(np.ravel_multi_index(index, self.swpShape)) if self.swpShape else 0
+        oldFlat = old.reshape((-1,) + old.shape[len(self.swpShape):])
+        newFlat = new.reshape(-1)
+        for iPt in range(nDone):
+            newFlat[iPt] = oldFlat[iPt]
+        self.data[key] = new
+        self._shapes[key] = None
+        return new
 
 
 class NdSweeper(Sweeper):
@@ -147,6 +301,9 @@ class NdSweeper(Sweeper):
     actuate = None
     parse = None
     static = None
+    denseVectors = True  #: store numeric array measurements in dense grids, instead of object grids
+    checkpointInterval = 10  #: seconds between writes to the checkpoint file of :py:meth:`gather`
+    progressInterval = 0.1  #: seconds between progress reports of :py:meth:`gather`. Faster points are only counted.
 
     def __init__(self):
         ''' Specify the hard domain and actuate dimensions
@@ -176,7 +333,7 @@ class NdSweeper(Sweeper):
         self.monitorOptions = {'livePlot': False, 'plotEvery': 1,
                                'stdoutPrint': True, 'runServer': False}
         self.plotOptions = {'plType': 'curves', 'xKey': None, 'yKey': None, 'axArr': None,
-                            'cmap-surf': matplotlib.cm.inferno, 'cmap-curves': matplotlib.cm.viridis}  # pylint: disable=no-member
+                            'cmap-surf': 'inferno', 'cmap-curves': 'viridis'}
 
     @classmethod
     def repeater(cls, nTrials):
@@ -184,17 +341,32 @@ class NdSweeper(Sweeper):
         new.addActuation('trial', lambda a: None, np.arange(nTrials))
         return new
 
-    def gather(self, soakTime=None, autoSave=False, returnToStart=False):  # pylint: disable=arguments-differ
+    def gather(self, soakTime=None, autoSave=False, returnToStart=False, pipelined=False,  # pylint: disable=arguments-differ
+               checkpoint=None, resume=False):
         ''' Perform the sweep
 
             Args:
                 soakTime (None, float): wait this many seconds at the first point to let things settle
                 autoSave (bool): save data on completion, if savefile is specified
                 returnToStart (bool): If True, actuates everything to the first point after the sweep completes
+                pipelined (bool): If True, the ``fetch`` of each :py:class:`TriggeredMeasurement`
+                    runs in the background while the next point is actuated, as long as the
+                    actuation and the fetch are known to use different instruments.
+                    Data and errors come out in the same order as without pipelining.
+                    If a point fails, the points before it are kept, but the next point
+                    may already have been actuated.
+                checkpoint (str/Path, None): file that finished points are appended to as the sweep goes,
+                    every ``checkpointInterval`` seconds and when the sweep stops.
+                    It is never rewritten, so a crash loses at most the last interval.
+                resume (bool): If True, the points in ``checkpoint`` are loaded
+                    and the sweep continues from the first point that is not there.
+                    If it does not exist yet, the sweep starts from the beginning.
 
             Returns:
                 None
         '''
+        if resume and checkpoint is None:
+            raise ValueError('Resuming needs the checkpoint file')
         # Initialize builders that start off with None grids
         if self.data is None:
             # oldData = None
@@ -207,9 +379,66 @@ class NdSweeper(Sweeper):
                         del self.data[dKey]
                     except KeyError:
                         pass
+        fetcher = None
+        saver = None
         try:
             swpName = 'Generic sweep in ' + ', '.join(self.actuate.keys())
-            prog = io.ProgressWriter(swpName, self.swpShape, **self.monitorOptions)
+            prog = io.ProgressWriter(swpName, self.swpShape, minInterval=self.progressInterval,
+                                     **self.monitorOptions)
+            grids = _SweepGrids(self.data, self.swpShape, self.denseVectors)
+            nResumed = 0
+            if checkpoint is not None:
+                saver = _SweepCheckpoint(checkpoint, self.swpShape, self.checkpointInterval)
+                donePoints = saver.load() if resume else None
+                if donePoints is None:
+                    saver.start()
+                else:
+                    for index, pointData in donePoints:
+                        grids.store(index, pointData)
+                    nResumed = grids.nStored
+                    logger.info('Resuming at point %s of %s', nResumed, np.prod(self.swpShape))
+                    if nResumed > 0:
+                        prog.update(nResumed)
+            parsers = list(self.parse.items())
+            livePlot = self.monitorOptions['livePlot']
+            axArr = None
+
+            def finishPoint(index, pointData, fetched=None):
+                ''' Parse, store, plot and report one point '''
+                nonlocal axArr
+                if fetched is not None:
+                    pointData.update(fetched.result())
+
+                # Parse and store
+                for parseKey, parseFun in parsers:
+                    try:
+                        pointData[parseKey] = parseFun(pointData)
+                    except KeyError as err:
+                        print('Parsing out of order.',
+                              'Parser', parseKey, 'depends on parser', err,
+                              'but is being executed first')
+                        raise err
+
+                # Insert point data into the full matrix data builder
+                # On the first go through, the grids are allocated with the right datatype
+                isFirst = grids.nStored == 0
+                grids.store(index, pointData)
+                if saver is not None:
+                    saver.add(index, pointData)
+
+                # Plotting during the sweep
+                if livePlot:
+                    if isFirst:
+                        axArr = None
+                    axArr = self.plot(axArr=axArr, index=index)
+                    flatIndex = np.ravel_multi_index(index, self.swpShape)
+                    if flatIndex % self.monitorOptions['plotEvery'] == 0:
+                        import matplotlib.pyplot as plt
+                        from IPython import display
+                        display.display(plt.gcf())
+                        display.clear_output(wait=True)
+                # Progress report
+                prog.update()
 
             # Soak at the first point
             if soakTime is not None:
@@ -218,67 +447,88 @@ class NdSweeper(Sweeper):
                     actuObj.function(actuObj.domain[0])
                 time.sleep(soakTime)
 
-            for index in np.ndindex(self.swpShape):
+            if pipelined:
+                fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lightlab-sweep')
+            pending = None  # (index, pointData, future, instruments) of the point being fetched
+
+            # The minor actuation, and those done on every point, are called at every point.
+            # The others only at the start of their rows, where the next index is 0.
+            actuations = []
+            for iDim, (actuKey, actuObj) in enumerate(self.actuate.items()):
+                everyPoint = iDim == self.actuDims - 1 or actuObj.doOnEveryPoint
+                actuations.append((iDim, actuKey, actuObj, everyPoint,
+                                   _instrumentsOf((actuObj.function, actuObj.instruments))))
+            statics = list(self.static.items())
+            measurements = list(self.measure.items())
+
+            for iPoint, index in enumerate(np.ndindex(self.swpShape)):
+                if iPoint < nResumed:
+                    continue
+                restart = iPoint == nResumed  # everything is actuated
                 pointData = OrderedDict()  # Everything that will be measured *at this index*
 
-                for statKey, statMat in self.static.items():
+                for statKey, statMat in statics:
                     pointData[statKey] = statMat[index]
 
                 # Do the actuation, storing domain args and return values (if present)
-                for iDim, actu in enumerate(self.actuate.items()):
-                    actuKey, actuObj = actu
+                toActuate = []
+                for iDim, actuKey, actuObj, everyPoint, _ in actuations:
                     if actuObj.domain is None:
                         x = None
                     else:
                         x = actuObj.domain[index[iDim]]
                         pointData[actuKey] = x
-                    if iDim == self.actuDims - 1 or index[iDim + 1] == 0 or actuObj.doOnEveryPoint:
+                    if everyPoint or restart or index[iDim + 1] == 0:
+                        toActuate.append((iDim, actuKey, actuObj, x))
+                if pending is not None:
+                    busy = pending[3]
+                    for iDim, _, _, _ in toActuate:
+                        actuated = actuations[iDim][4]
+                        if busy is None or actuated is None or actuated & busy:
+                            finishPoint(*pending[:3])
+                            pending = None
+                            break
+                try:
+                    for _, actuKey, actuObj, x in toActuate:
                         y = actuObj.function(x)  # The actual function call occurs here
                         if y is not None:
                             pointData[actuKey + '-return'] = y
+                finally:
+                    # The previous point is done before anything else can fail
+                    if pending is not None:
+                        finishPoint(*pending[:3])
+                        pending = None
 
                 # Do the measurement, store return values
-                for measKey, measFun in self.measure.items():
-                    pointData[measKey] = measFun()
+                toFetch = None
+                for measKey, measFun in measurements:
+                    if pipelined and isinstance(measFun, TriggeredMeasurement):
+                        measFun.trigger()
+                        pointData[measKey] = None  # keeps the order of keys
+                        toFetch = (toFetch or []) + [(measKey, measFun)]
+                    else:
+                        pointData[measKey] = measFun()
                     # print('   Meas', measKey, ':', pointData[measKey])
 
-                # Parse and store
-                for parseKey, parseFun in self.parse.items():
-                    try:
-                        pointData[parseKey] = parseFun(pointData)
-                    except KeyError as err:
-                        if parseKey in self.parse.keys():
-                            print('Parsing out of order.',
-                                  'Parser', parseKey, 'depends on parser', err,
-                                  'but is being executed first')
-                        raise err
-
-                # Insert point data into the full matrix data builder
-                # On the first go through, initialize array of correct datatype
-                for k, v in pointData.items():
-                    if all(i == 0 for i in index):
-                        if np.isscalar(v):
-                            self.data[k] = np.zeros(self.swpShape, dtype=float)
-                        else:
-                            self.data[k] = np.empty(self.swpShape, dtype=object)
-                    self.data[k][index] = v
-
-                # Plotting during the sweep
-                if self.monitorOptions['livePlot']:
-                    if all(i == 0 for i in index):
-                        axArr = None
-                    axArr = self.plot(axArr=axArr, index=index)
-                    flatIndex = np.ravel_multi_index(index, self.swpShape)
-                    if flatIndex % self.monitorOptions['plotEvery'] == 0:
-                        display.display(plt.gcf())
-                        display.clear_output(wait=True)
-                # Progress report
-                prog.update()
+                if toFetch:
+                    future = fetcher.submit(_fetchAll, toFetch)
+                    pending = (index, pointData, future,
+                               _instrumentsOf(*[(measFun.fetch, measFun.instruments)
+                                                for _, measFun in toFetch]))
+                else:
+                    finishPoint(index, pointData)
             # End of the main loop
+            if pending is not None:
+                finishPoint(*pending[:3])
 
         except Exception as err:
             logger.error('Error while sweeping. Keeping data. %s', err)
             raise
+        finally:
+            if fetcher is not None:
+                fetcher.shutdown(wait=True)
+            if saver is not None:
+                saver.flush()
 
         if returnToStart:
             for actuObj in self.actuate.values():
@@ -287,7 +537,7 @@ class NdSweeper(Sweeper):
         if autoSave:
             self.save()
 
-    def addActuation(self, name, function, domain, doOnEveryPoint=False):
+    def addActuation(self, name, function, domain, doOnEveryPoint=False, instruments=None):
         ''' Specify an actuation dimension: what is called, the domain values to use as arguments.
 
             Args:
@@ -297,8 +547,10 @@ class NdSweeper(Sweeper):
                     If None, the function is called with a None argument every point (if doOnEveryPoint is True).
                 doOnEveryPoint (bool): call this function in the inner loop (True)
                     or once before the corresponding rows(False)
+                instruments (object, list, None): what the function talks to, for pipelined sweeps.
+                    If None, it is the object of ``function``, when that is a bound method.
         '''
-        newActu = Actuation(function, domain, doOnEveryPoint)
+        newActu = Actuation(function, domain, doOnEveryPoint, instruments)
         self.addActuationObject(name, newActu)
 
     def addActuationObject(self, name, actuationObj):
@@ -324,13 +576,17 @@ class NdSweeper(Sweeper):
                 self.actuDims += 1
                 self.swpShape += (len(actu.domain), )
 
-    def addMeasurement(self, name, function):
+    def addMeasurement(self, name, function, trigger=None):
         ''' Specify a measurement to be taken at every sweep point.
 
             Args:
                 name (str): key for accessing this measurement's value data
                 function (func): measurement function, usually linked to hardware. No arguments.
+                trigger (func, None): if given, ``function`` becomes the fetch of a :py:class:`TriggeredMeasurement`
+                    that calls ``trigger`` first. Only these are overlapped in pipelined sweeps.
         '''
+        if trigger is not None:
+            function = TriggeredMeasurement(function, trigger)
         self.measure.update([(name, function)])
 
     def addParser(self, name, function):
@@ -372,7 +628,7 @@ class NdSweeper(Sweeper):
             for index in np.ndindex(self.swpShape):
                 dataOfPt = OrderedDict()
                 for datKey, datVal in self.data.items():
-                    if np.any(datVal.shape != self.swpShape):
+                    if datVal.shape[:len(self.swpShape)] != self.swpShape:
                         logger.warning(
                             'Data member %s is wrong size for reparsing %s. Skipping.', datKey, pk)
                     else:
@@ -487,6 +743,7 @@ class NdSweeper(Sweeper):
             Todo:
                 * Graphics caching for 2D line plots
         '''
+        import matplotlib.pyplot as plt
         global hCurves  # pylint: disable=global-statement
         if index is None or np.all(np.array(index) == 0):
             hCurves = None
@@ -500,7 +757,7 @@ class NdSweeper(Sweeper):
         else:
             fullData = tempData
         if fullData is not None:
-            plotDims = list(fullData.values())[0].ndim  # Instead of self.actuDims
+            plotDims = min(datVal.ndim for datVal in fullData.values())  # Instead of self.actuDims
         else:
             plotDims = self.actuDims
         assertValidPlotType(self.plotOptions['plType'], plotDims, type(self))
@@ -522,6 +779,7 @@ class NdSweeper(Sweeper):
             for datKey, datVal in fullData.items():
                 if (datKey not in xKeys and
                         datKey not in actuationKeys and
+                        datVal.ndim == plotDims and
                         np.isscalar(datVal.item(0))):
                     yKeys += (datKey, )
         # Check it
@@ -581,7 +839,7 @@ class NdSweeper(Sweeper):
                             index = index[::-1]
                         invertDomainPriority = True
                 nLines = sample_xData.shape[0 if not invertDomainPriority else 1]
-                colors = self.plotOptions['cmap-curves'](np.linspace(0, 1, nLines))
+                colors = plt.get_cmap(self.plotOptions['cmap-curves'])(np.linspace(0, 1, nLines))
 
         # Loop over axes (i.e. axis key variables) and plot
         for iAx, ax in np.ndenumerate(axArr):
@@ -654,7 +912,7 @@ class NdSweeper(Sweeper):
                 for iDim, actuObj in enumerate(self.actuate.values()):
                     doms[iDim] = actuObj.domain[slicer[iDim]]
                 domainGrids = np.meshgrid(*doms[::-1], indexing='xy')
-                pltKwargs['cmap'] = pltKwargs.pop('cmap', self.plotOptions['cmap-surf'])
+                pltKwargs['cmap'] = pltKwargs.pop('cmap', plt.get_cmap(self.plotOptions['cmap-surf']))
                 pltKwargs['shading'] = pltKwargs.pop('shading', 'gouraud')
                 cax = ax.pcolormesh(*domainGrids, yData, **pltKwargs)
                 plt.gcf().colorbar(cax, ax=ax)
@@ -911,6 +1169,8 @@ class CommandControlSweeper(Sweeper):
                 self.plot(index)
                 flatIndex = np.ravel_multi_index(index, (self.nTrials,) + self.swpShape)
                 if flatIndex % self.monitorOptions['plotEvery'] == 0:
+                    import matplotlib.pyplot as plt
+                    from IPython import display
                     display.clear_output(wait=True)
                     display.display(plt.gcf())  # Note this may have to be interAx instead of gcf
             if self.monitorOptions['cmdCtrlPrint']:
@@ -933,6 +1193,7 @@ class CommandControlSweeper(Sweeper):
         return (cmdMat, measMat, monitMat)
 
     def plot(self, index=None, axArr=None):
+        import matplotlib.pyplot as plt
         plType = self.plotOptions['plType']
         assertValidPlotType(plType, self.swpDims, type(self))
 
@@ -1042,6 +1303,8 @@ def plotCmdCtrl(sweepData, index=None, ax=None, interactive=False):
         Todo:
             Fix the global hack for persistent plots -- actually, this is fine
     '''
+    import matplotlib.pyplot as plt
+    from lightlab.util.plot import plotCovEllipse
     global interAx  # pylint: disable=global-statement
     global hArrow  # pylint: disable=global-statement
     global hEllipse  # pylint: disable=global-statement
@@ -51,7 +51,6 @@ def main():
             "Framework :: Jupyter",
         ),
         install_requires=[
-            'dpath',
             'jsonpickle',
             'matplotlib',
             'IPython',
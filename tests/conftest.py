@@ -0,0 +1,33 @@
+''' Fixtures shared by the tests that run against the RVISA stand-in server.
+'''
+import pytest
+
+from lightlab.equipment.visa_bases import rvisa_pool
+from tests.rvisa_standin import StandInServer
+
+
+@pytest.fixture
+def standin():
+    ''' Starts stand-in servers that ``RVISAObject`` sessions with their ``url`` use:
+        ``standin(personality_factory=None, **kwargs)`` takes the arguments of
+        :py:class:`StandInServer`. They are stopped after the test,
+        and resource manager pools are cleared before and after.
+    '''
+    rvisa_pool.clear_pools()
+    servers = []
+
+    def start(personality_factory=None, **kwargs):
+        srv = StandInServer(personality_factory, **kwargs).start()
+        servers.append(srv)
+        srv.attach()
+        return srv
+    yield start
+    for srv in servers:
+        srv.stop()
+    rvisa_pool.clear_pools()
+
+
+@pytest.fixture
+def server(standin):
+    ''' A stand-in server of SCPI instruments. Modules can override it with other arguments to ``standin`` '''
+    return standin()
@@ -0,0 +1,327 @@
+''' A local, in-process stand-in for a remote RVISA instrumentation server. For tests only.
+
+    It serves instruments over HTTP from a background thread, and comes with a
+    client resource manager that talks to it. This lets :py:class:`RVISAObject`
+    and :py:class:`RVISAInstrumentDriver` run against something that goes
+    through real HTTP round trips, without a gateway or any hardware.
+
+    Usage:
+
+    .. code-block:: python
+
+        from tests.rvisa_standin import StandInServer
+
+        with StandInServer() as server:
+            server.attach()  # RVISAObjects with url=server.url now use it
+            instr = RVISAObject('GPIB0::7::INSTR', url=server.url)
+            instr.query('*IDN?')
+            print(server.transfers)  # number of HTTP requests that moved commands
+
+    Every request is a JSON ``POST`` to ``/open``, ``/write``, ``/query``, ``/read_raw``
+    or ``/close``. Query responses come back as ``{'read': <string>}``.
+    Raw reads, after writing a query, come back base64 encoded as ``{'raw': <string>}``.
+
+    Instruments are scriptable "personalities": :py:class:`SCPIPersonality` reads back
+    whatever was set, :py:class:`ScopePersonality` also sends waveforms of any length.
+    ``latency`` and ``jitter`` make every transfer take as long as a real one would,
+    ``open_latency`` does the same for opening and closing resources.
+    The same personalities can be served over raw sockets, see
+    :py:mod:`tests.socket_standin`.
+'''
+import base64
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlparse
+from lightlab import visalogger as logger
+from lightlab.equipment.visa_bases import rvisa_pool
+
+
+class SCPIPersonality(object):
+    ''' Simulated SCPI instrument.
+        Settings that are written can be read back with a query.
+        Compound messages (``;``-separated) are handled like a real instrument would.
+    '''
+
+    def __init__(self, idn='LIGHTLAB,RVISA STAND-IN,0,1.0'):
+        self.idn = idn
+        self.settings = dict()
+        self.log = []  #: every command received, after splitting compound messages
+
+    def handle(self, message):
+        ''' Returns:
+                (str or bytes): the response, or None if there were no queries in the message
+        '''
+        replies = []
+        for cmd in message.split(';'):
+            cmd = cmd.strip()
+            if not cmd:
+                continue
+            self.log.append(cmd)
+            header, _, arg = cmd.partition(' ')
+            header = header.lstrip(':').upper()
+            if header.endswith('?'):
+                replies.append(self.respond(header[:-1], arg.strip()))
+            else:
+                self.settings[header] = arg.strip()
+        if len(replies) == 0:
+            return None
+        if len(replies) == 1:
+            return replies[0]  # which could be a binary block
+        return ';'.join(replies)
+
+    def respond(self, header, arg):
+        if header == '*IDN':
+            return self.idn
+        if header == '*OPC':
+            return '1'
+        return self.settings.get(header, '0')
+
+
+class ScopePersonality(SCPIPersonality):
+    ''' Simulated oscilloscope. ``CURV?`` returns ``npts`` points of a sine wave.
+        They are a big-endian binary block if ``DATA:ENCDG`` was set to a binary encoding,
+        of ``DATA:WIDTH`` bytes per point, and comma-separated numbers otherwise.
+    '''
+
+    def __init__(self, npts=10000, **kwargs):
+        super().__init__(**kwargs)
+        self.npts = npts
+        self._responses = dict()  # (npts, encoding, width) -> response, they take a while to make
+
+    def waveform(self):
+        return [int(100 * math.sin(2 * math.pi * i / 1000)) for i in range(self.npts)]
+
+    def respond(self, header, arg):
+        if header in ('CURV', 'CURVE'):
+            encoding = self.settings.get('DATA:ENCDG', 'ASCII').upper()
+            width = self.settings.get('DATA:WIDTH', '2')
+            key = (self.npts, encoding, width)
+            if key not in self._responses:
+                values = self.waveform()
+                if encoding in ('ASCII', 'ASCI'):
+                    response = ','.join(str(v) for v in values)
+                else:
+                    data = struct.pack('>{}{}'.format(len(values), 'b' if width == '1' else 'h'), *values)
+                    length = str(len(data))
+                    response = '#{}{}'.format(len(length), length).encode('ascii') + data
+                self._responses[key] = response
+            return self._responses[key]
+        return super().respond(header, arg)
+
+
+def simulated_delay(latency, jitter, rng=random):
+    ''' Sleeps for ``latency`` plus a uniformly random extra of up to ``jitter`` seconds '''
+    delay = latency + (rng.uniform(0, jitter) if jitter else 0)
+    if delay > 0:
+        time.sleep(delay)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server.standin
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length).decode('utf-8')) if length else dict()
+        try:
+            reply = server.dispatch(self.path, request)
+            status = 200
+        except KeyError as err:
+            reply = dict(error='unknown {}'.format(err))
+            status = 404
+        body = json.dumps(reply).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logger.debug('rvisa stand-in: ' + format, *args)
+
+
+class StandInServer(object):
+    ''' HTTP server that imitates the RVISA gateway, running in a daemon thread.
+
+        Instruments are created on demand when a resource is opened,
+        using ``personality_factory(address)``.
+    '''
+
+    def __init__(self, personality_factory=None, host='127.0.0.1', port=0,
+                 latency=0, jitter=0, seed=None, open_latency=0):
+        '''
+            Args:
+                personality_factory (callable): ``f(address)`` returns an object with a
+                    ``handle(message)`` method. Defaults to :py:class:`SCPIPersonality`.
+                host (str): interface to listen on
+                port (int): 0 picks a free port
+                latency (float): seconds added to every transfer
+                jitter (float): up to this many more seconds, at random, added to every transfer
+                seed (int): for the jitter, to make it repeatable
+                open_latency (float): seconds added to opening and closing a resource
+        '''
+        if personality_factory is None:
+            personality_factory = lambda address: SCPIPersonality()
+        self.personality_factory = personality_factory
+        self.latency = latency
+        self.jitter = jitter
+        self.open_latency = open_latency
+        self._rng = random.Random(seed)
+        self.instruments = dict()  #: address -> personality
+        self.requests = dict()  #: path -> number of requests
+        self._unread = dict()  # address -> response to a written query
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    @property
+    def transfers(self):
+        ''' Number of requests that carried instrument commands (writes and queries) '''
+        return self.requests.get('/write', 0) + self.requests.get('/query', 0) \
+            + self.requests.get('/read_raw', 0)
+
+    def instrument(self, address):
+        with self._lock:
+            try:
+                return self.instruments[address]
+            except KeyError:
+                personality = self.personality_factory(address)
+                self.instruments[address] = personality
+                return personality
+
+    def dispatch(self, path, request):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        if path in ('/write', '/query', '/read_raw'):
+            simulated_delay(self.latency, self.jitter, self._rng)
+        elif path in ('/open', '/close'):
+            simulated_delay(self.open_latency, 0, self._rng)
+        if path == '/open':
+            self.instrument(request['address'])
+            return dict(status='ok')
+        if path == '/close':
+            return dict(status='ok')
+        if path == '/write':
+            response = self.instrument(request['address']).handle(request['command'])
+            if response is not None:
+                self._unread[request['address']] = response
+            return dict(status='ok')
+        if path == '/query':
+            response = self.instrument(request['address']).handle(request['command'])
+            if isinstance(response, bytes):
+                response = response.decode('latin-1')
+            return dict(read=(response or '') + '\n')
+        if path == '/read_raw':
+            response = self._unread.pop(request['address'], '')
+            if isinstance(response, str):
+                response = response.encode('latin-1')
+            return dict(raw=base64.b64encode(response + b'\n').decode('ascii'))
+        raise KeyError(path)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+        self.detach()
+
+    def attach(self):
+        ''' Makes :py:class:`RVISAObject` sessions with ``url=self.url`` use this server '''
+        rvisa_pool.register_factory(self.url, StandInResourceManager)
+
+    def detach(self):
+        rvisa_pool.unregister_factory(self.url)
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = dict()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _NoDelayHTTPConnection(HTTPConnection):
+    ''' Requests are small, so they are sent right away instead of waiting for ACKs '''
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class StandInResourceManager(object):
+    ''' Client side, with the same interface as ``rvisa.ResourceManager``.
+        It keeps one HTTP connection alive.
+    '''
+
+    def __init__(self, url, timeout=None):
+        parsed = urlparse(url)
+        self.url = url
+        self.timeout = timeout
+        self._connection = _NoDelayHTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+        self._lock = threading.Lock()
+
+    def post(self, path, **request):
+        body = json.dumps(request).encode('utf-8')
+        with self._lock:
+            self._connection.request('POST', path, body=body,
+                                     headers={'Content-Type': 'application/json'})
+            response = self._connection.getresponse()
+            reply = json.loads(response.read().decode('utf-8'))
+        if response.status != 200:
+            raise RuntimeError('RVISA stand-in: {}'.format(reply.get('error')))
+        return reply
+
+    def open_resource(self, address):
+        self.post('/open', address=address)
+        return StandInResource(self, address)
+
+    def close(self):
+        self._connection.close()
+
+
+class StandInResource(object):
+    ''' Message-based session returned by :py:meth:`StandInResourceManager.open_resource` '''
+
+    def __init__(self, manager, address):
+        self.manager = manager
+        self.address = address
+        self.write_termination = '\n'
+
+    def write(self, message):
+        self.manager.post('/write', address=self.address, command=message)
+
+    def query(self, message, timeout=None):
+        return self.manager.post('/query', address=self.address, command=message,
+                                 timeout=timeout)['read']
+
+    def read_raw(self, timeout=None):
+        reply = self.manager.post('/read_raw', address=self.address, timeout=timeout)
+        return base64.b64decode(reply['raw'])
+
+    def close(self):
+        self.manager.post('/close', address=self.address)
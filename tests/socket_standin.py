@@ -0,0 +1,218 @@
+''' Local stand-ins for socket instruments and Prologix GPIB-Ethernet controllers.
+
+    They serve the personalities of :py:mod:`~tests.rvisa_standin`
+    from a background thread, so that :py:class:`TCPSocketConnection`,
+    :py:class:`PrologixGPIBObject` and ``pyvisa`` ``SOCKET`` resources
+    can run against something real, without hardware.
+
+    .. code-block:: python
+
+        with SocketStandInServer(lambda: ScopePersonality(npts=100000)) as server:
+            conn = TCPSocketConnection(server.host, server.port)
+            ...
+
+        with PrologixStandInServer() as server, server.patched():
+            instr = PrologixGPIBObject('prologix://127.0.0.1/7')  # talks to the stand-in
+            ...
+'''
+from contextlib import contextmanager
+import random
+import socket
+import threading
+from lightlab.equipment.visa_bases.prologix_gpib import PrologixResourceManager
+from tests.rvisa_standin import SCPIPersonality, simulated_delay
+
+
+def _as_bytes(response):
+    if isinstance(response, str):
+        return response.encode('latin-1')
+    return response
+
+
+class _ThreadedSocketServer(object):
+    ''' Accepts any number of connections, each handled by ``self.handle(conn)`` in its own thread '''
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, jitter=0, seed=None):
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(16)
+        self.port = self._listener.getsockname()[1]
+        self.connections = 0  #: number of connections accepted so far
+        self.transfers = 0  #: number of messages received
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._serve, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)  # wakes up accept()
+        except OSError:
+            pass
+        self._listener.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._handle_quietly, args=(conn,), daemon=True).start()
+
+    def _handle_quietly(self, conn):
+        try:
+            self.handle(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _lines(self, conn):
+        buffer = b''
+        while True:
+            data = conn.recv(65536)
+            if not data:
+                return
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                self.transfers += 1
+                yield line.rstrip(b'\r').decode('latin-1')
+
+    def _delay(self):
+        simulated_delay(self.latency, self.jitter, self._rng)
+
+    def handle(self, conn):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class SocketStandInServer(_ThreadedSocketServer):
+    ''' A SCPI instrument on a raw socket, like many LAN instruments on port 5025.
+        Every line received is a message. Responses end in ``\\n``.
+        All connections talk to the same personality.
+    '''
+
+    def __init__(self, personality_factory=None, **kwargs):
+        '''
+            Args:
+                personality_factory (callable): ``f()`` returns the personality.
+                    Defaults to :py:class:`SCPIPersonality`.
+                kwargs: ``host``, ``port``, ``latency``, ``jitter`` and ``seed``,
+                    like :py:class:`StandInServer`
+        '''
+        super().__init__(**kwargs)
+        self.personality = (personality_factory or SCPIPersonality)()
+        self._lock = threading.Lock()
+
+    def handle(self, conn):
+        for message in self._lines(conn):
+            self._delay()
+            with self._lock:
+                response = self.personality.handle(message)
+            if response is not None:
+                conn.sendall(_as_bytes(response) + b'\n')
+
+
+class PrologixStandInServer(_ThreadedSocketServer):
+    ''' A Prologix GPIB-Ethernet controller with an instrument at every GPIB address.
+
+        It follows ``++addr``, ``++spoll``, ``++read eoi`` and ``++clr``, and
+        unescapes instrument messages like the real controller does.
+        The status byte has MAV (16) set while a response is waiting to be read.
+    '''
+    escape = chr(17)
+
+    def __init__(self, personality_factory=None, **kwargs):
+        '''
+            Args:
+                personality_factory (callable): ``f(gpib_address)`` returns a personality.
+                    Defaults to :py:class:`SCPIPersonality`.
+        '''
+        super().__init__(**kwargs)
+        if personality_factory is None:
+            personality_factory = lambda gpib_address: SCPIPersonality()
+        self.personality_factory = personality_factory
+        self.instruments = dict()  #: GPIB address (str) -> personality
+        self._outputs = dict()  # GPIB address -> response waiting to be read
+        self._lock = threading.Lock()
+
+    def instrument(self, gpib_address):
+        if gpib_address not in self.instruments:
+            self.instruments[gpib_address] = self.personality_factory(gpib_address)
+        return self.instruments[gpib_address]
+
+    def _unescape(self, line):
+        chars = []
+        escaped = False
+        for char in line:
+            if char == self.escape and not escaped:
+                escaped = True
+                continue
+            chars.append(char)
+            escaped = False
+        return ''.join(chars)
+
+    def handle(self, conn):
+        addr = None
+        for line in self._lines(conn):
+            command, _, arg = line.partition(' ')
+            with self._lock:
+                reply = None
+                if command == '++addr':
+                    addr = arg.strip()
+                elif command == '++spoll':
+                    target = arg.strip() or addr
+                    reply = b'16' if target in self._outputs else b'0'
+                elif command == '++read':
+                    self._delay()
+                    reply = _as_bytes(self._outputs.pop(addr, ''))
+                elif command == '++clr':
+                    self._outputs.pop(addr, None)
+                elif command.startswith('++'):
+                    pass  # configuration
+                else:
+                    self._delay()
+                    response = self.instrument(addr).handle(self._unescape(line))
+                    if response is not None:
+                        self._outputs[addr] = response
+            if reply is not None:
+                conn.sendall(reply + b'\r\n')
+
+    @contextmanager
+    def patched(self):
+        ''' Makes new :py:class:`PrologixGPIBObject` sessions use this server.
+            Controllers already in use are set aside until the block exits.
+        '''
+        with PrologixResourceManager._instances_lock:
+            saved = dict(PrologixResourceManager._instances)
+            PrologixResourceManager._instances.clear()
+        oldPort = PrologixResourceManager.port
+        PrologixResourceManager.port = self.port
+        try:
+            yield self
+        finally:
+            PrologixResourceManager.port = oldPort
+            with PrologixResourceManager._instances_lock:
+                for manager in PrologixResourceManager._instances.values():
+                    manager.disconnect()
+                PrologixResourceManager._instances.clear()
+                PrologixResourceManager._instances.update(saved)
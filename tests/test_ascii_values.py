@@ -0,0 +1,33 @@
+''' Tests for the vectorized ASCII parser behind query_ascii_values.
+'''
+import numpy as np
+from rvisa.util import from_ascii_block
+
+from lightlab.equipment.visa_bases.driver_base import parse_ascii_values
+
+
+def test_same_as_pyvisa():
+    values = np.random.RandomState(0).randn(1000)
+    block = ','.join(repr(float(v)) for v in values) + '\n'
+    expected = from_ascii_block(block)
+    parsed = parse_ascii_values(block)
+    assert type(parsed) is list
+    assert parsed == expected
+    parsed = parse_ascii_values(block, container=np.array, npts=1000)
+    assert isinstance(parsed, np.ndarray)
+    np.testing.assert_array_equal(parsed, expected)
+
+
+def test_separators():
+    np.testing.assert_array_equal(parse_ascii_values('3 1.5e-3  -2\n', separator=' ', container=np.array),
+                                  [3, 1.5e-3, -2])
+    assert parse_ascii_values('1;2;3', separator=';') == [1., 2., 3.]
+
+
+def test_compatibility_path():
+    assert parse_ascii_values('1,2,3', converter='d') == [1, 2, 3]
+    assert parse_ascii_values('1,2,3', container=tuple) == (1., 2., 3.)
+    # a point count that does not match is not trusted
+    np.testing.assert_array_equal(parse_ascii_values('1,2,3', container=np.array, npts=4), [1, 2, 3])
+    # neither is something numpy cannot read
+    assert parse_ascii_values('1,inf,3') == from_ascii_block('1,inf,3')
@@ -0,0 +1,179 @@
+''' Tests for the asyncio front-end, against local stand-in servers.
+'''
+import asyncio
+import time
+from mock import patch
+
+from lightlab.equipment.visa_bases.async_session import (
+    AsyncTCPSocketConnection, AsyncPrologixGPIBObject, AsyncRVISAObject, AsyncSessionAdapter, to_async)
+from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection
+from lightlab.equipment.visa_bases.prologix_gpib import PrologixGPIBObject, PrologixResourceManager
+from lightlab.equipment.visa_bases.rvisa_driver import RVISAInstrumentDriver
+
+DELAY = 0.2
+
+
+async def slow_echo(reader, writer):
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        await asyncio.sleep(DELAY)
+        writer.write(b'echo ' + line)
+        await writer.drain()
+    writer.close()
+
+
+def test_tcp_concurrent():
+    async def main():
+        server = await asyncio.start_server(slow_echo, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        conns = [AsyncTCPSocketConnection('127.0.0.1', port) for _ in range(3)]
+        tic = time.time()
+        replies = await asyncio.gather(*(c.query('hi {}'.format(i)) for i, c in enumerate(conns)))
+        elapsed = time.time() - tic
+        # same connection: queries take turns and get their own responses
+        shared = await asyncio.gather(*(conns[0].query('q{}'.format(i)) for i in range(3)))
+        for c in conns:
+            await c.close()
+        server.close()
+        await server.wait_closed()
+        return replies, elapsed, shared
+
+    replies, elapsed, shared = asyncio.run(main())
+    assert replies == ['echo hi 0', 'echo hi 1', 'echo hi 2']
+    assert elapsed < 2 * DELAY
+    assert shared == ['echo q0', 'echo q1', 'echo q2']
+
+
+class FakePrologix(object):
+    ''' Answers each query DELAY seconds after it was sent '''
+
+    def __init__(self):
+        self.addr = None
+        self.ready = dict()
+
+    async def __call__(self, reader, writer):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            cmd = line.decode().strip()
+            if cmd.startswith('++addr'):
+                self.addr = cmd.split()[1]
+            elif cmd.startswith('++spoll'):
+                addr = cmd.split()[1]
+                ready = addr in self.ready and self.ready[addr][0] < time.time()
+                writer.write(b'16\n' if ready else b'0\n')
+            elif cmd == '++read eoi':
+                writer.write((self.ready.pop(self.addr)[1] + '\r\n').encode())
+            elif not cmd.startswith('++'):
+                self.ready[self.addr] = (time.time() + DELAY, '{} from {}'.format(cmd, self.addr))
+            await writer.drain()
+        writer.close()
+
+
+def test_prologix_concurrent():
+    async def main():
+        server = await asyncio.start_server(FakePrologix(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        with patch.object(PrologixResourceManager, 'port', port), \
+                patch.dict(PrologixResourceManager._instances, clear=True):
+            instrs = [AsyncPrologixGPIBObject('prologix://127.0.0.1/{}'.format(i)) for i in (5, 6, 7)]
+            assert instrs[0]._prologix_rm is instrs[2]._prologix_rm
+            tic = time.time()
+            replies = await asyncio.gather(*(instr.query('MEAS?') for instr in instrs))
+            elapsed = time.time() - tic
+            await instrs[0].close()
+        server.close()
+        await server.wait_closed()
+        return replies, elapsed
+
+    replies, elapsed = asyncio.run(main())
+    assert replies == ['MEAS? from 5', 'MEAS? from 6', 'MEAS? from 7']
+    assert elapsed < 2 * DELAY + 0.3
+
+
+def test_prologix_same_instrument():
+    async def main():
+        server = await asyncio.start_server(FakePrologix(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        with patch.object(PrologixResourceManager, 'port', port), \
+                patch.dict(PrologixResourceManager._instances, clear=True):
+            instr = AsyncPrologixGPIBObject('prologix://127.0.0.1/5')
+            replies = await asyncio.gather(instr.query('A?'), instr.query('B?'))
+            await instr.close()
+        server.close()
+        await server.wait_closed()
+        return replies
+
+    assert asyncio.run(main()) == ['A? from 5', 'B? from 5']
+
+
+def test_prologix_shared_with_blocking():
+    async def main():
+        server = await asyncio.start_server(FakePrologix(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_event_loop()
+        with patch.object(PrologixResourceManager, 'port', port), \
+                patch.dict(PrologixResourceManager._instances, clear=True):
+            blocking = PrologixGPIBObject('prologix://127.0.0.1/5')
+            ainstr = to_async(PrologixGPIBObject('prologix://127.0.0.1/6'))
+            assert ainstr._prologix_rm is blocking._prologix_rm
+            replies = [await loop.run_in_executor(None, blocking.query, 'A?'),
+                       await ainstr.query('B?'),
+                       await loop.run_in_executor(None, blocking.query, 'C?')]
+            rm = blocking._prologix_rm
+            assert rm.stats['connects'] == 1  # one socket for both
+            await ainstr.close()
+        server.close()
+        await server.wait_closed()
+        return replies
+
+    assert asyncio.run(main()) == ['A? from 5', 'B? from 6', 'C? from 5']
+
+
+def test_prologix_blocking_and_async_same_address():
+    async def main():
+        server = await asyncio.start_server(FakePrologix(), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_event_loop()
+        with patch.object(PrologixResourceManager, 'port', port), \
+                patch.dict(PrologixResourceManager._instances, clear=True):
+            blocking = PrologixGPIBObject('prologix://127.0.0.1/5')
+            ainstrs = [AsyncPrologixGPIBObject('prologix://127.0.0.1/5') for _ in range(2)]
+            replies = await asyncio.gather(loop.run_in_executor(None, blocking.query, 'A?'),
+                                           ainstrs[0].query('B?'), ainstrs[1].query('C?'))
+            await ainstrs[0].close()
+        server.close()
+        await server.wait_closed()
+        return replies
+
+    assert asyncio.run(main()) == ['A? from 5', 'B? from 5', 'C? from 5']
+
+
+def test_rvisa_and_driver_adapter(server):
+    async def main():
+        instr = AsyncRVISAObject('GPIB0::1::INSTR', url=server.url)
+        await instr.write(':VOLT 1.5')
+        driver = RVISAInstrumentDriver('async', 'GPIB0::2::INSTR', url=server.url)
+        adriver = to_async(driver)
+        assert isinstance(adriver, AsyncSessionAdapter)
+        await adriver.write(':VOLT 2,3')
+        values = await asyncio.gather(instr.query(':VOLT?'),
+                                      adriver.query_ascii_values(':VOLT?'),
+                                      adriver.instrID())
+        assert adriver.url == server.url  # plain attributes are not awaited
+        await adriver.close()
+        await instr.close()
+        return values
+
+    volt, volts, idn = asyncio.run(main())
+    assert volt == '1.5'
+    assert volts == [2., 3.]
+    assert idn.startswith('LIGHTLAB')
+
+
+def test_to_async():
+    assert isinstance(to_async(TCPSocketConnection('localhost', 1111)), AsyncTCPSocketConnection)
+    assert isinstance(to_async(PrologixGPIBObject('prologix://localhost/3')), AsyncPrologixGPIBObject)
@@ -0,0 +1,139 @@
+''' Tests for IEEE 488.2 binary block transfers on every backend.
+'''
+import socket
+import struct
+import threading
+import numpy as np
+import pytest
+
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.driver_base import parse_binary_block, TCPSocketConnection
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.equipment.visa_bases.visa_object import VISAObject
+from tests.rvisa_standin import StandInResourceManager, SCPIPersonality
+
+
+def make_block(values, fmt):
+    data = struct.pack(fmt, *values)
+    length = str(len(data))
+    return '#{}{}'.format(len(length), length).encode('ascii') + data
+
+
+def test_parse_binary_block():
+    values = [-2, 10, 0x0a0a, -32768]  # 0x0a0a is two line feeds
+    block = b':CURVE ' + make_block(values, '>4h') + b'\n'
+    parsed = parse_binary_block(block, datatype='h', is_big_endian=True)
+    assert parsed.dtype == np.int16
+    assert parsed.dtype.isnative
+    np.testing.assert_array_equal(parsed, values)
+    parsed[0] = 1  # writable
+    floats = parse_binary_block(make_block([1.5, -2.25], '<2f'), 'f', container=list)
+    assert floats == [1.5, -2.25]
+    with pytest.raises(ValueError):
+        parse_binary_block(make_block(values, '>4h')[:-1], 'h')
+    with pytest.raises(ValueError):
+        parse_binary_block(make_block([1, 2, 3], '>3h'), 'f')  # 6 bytes
+
+
+class CurvePersonality(SCPIPersonality):
+    npts = 10000
+
+    def respond(self, header, arg):
+        if header == 'CURV':
+            return make_block(np.arange(self.npts) % 256 - 128, '>{}h'.format(self.npts))
+        return super().respond(header, arg)
+
+
+def test_rvisa_binary(standin):
+    server = standin(lambda address: CurvePersonality())
+    instr = RVISAObject('TCPIP0::scope::INSTR', url=server.url)
+    curve = instr.query_binary_values('CURV?', datatype='h', is_big_endian=True)
+    ascii_len = len(','.join(str(v) for v in curve))
+    assert ascii_len / (2 * len(curve)) > 1.8  # binary is much smaller
+    assert instr.query('*IDN?').startswith('LIGHTLAB')  # nothing left over
+    np.testing.assert_array_equal(curve, np.arange(10000) % 256 - 128)
+
+
+class StringOnlyResource(object):
+    ''' A remote session that has no ``read_raw`` '''
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.write_termination = resource.write_termination
+
+    def write(self, message):
+        self.resource.write(message)
+
+    def query(self, message, timeout=None):
+        return self.resource.query(message, timeout)
+
+    def close(self):
+        self.resource.close()
+
+
+class StringOnlyResourceManager(StandInResourceManager):
+    def open_resource(self, address):
+        return StringOnlyResource(super().open_resource(address))
+
+
+def test_rvisa_binary_without_read_raw(standin):
+    server = standin(lambda address: CurvePersonality())
+    rvisa_pool.register_factory(server.url, StringOnlyResourceManager)
+    instr = RVISAObject('TCPIP0::scope::INSTR', url=server.url)
+    curve = instr.query_binary_values('CURV?', datatype='h', is_big_endian=True)
+    assert server.requests.get('/read_raw', 0) == 0
+    np.testing.assert_array_equal(curve, np.arange(10000) % 256 - 128)
+
+
+class TimingOutSession(object):
+    def __init__(self):
+        self.tmo = 2000
+
+    def get_visa_attribute(self, attribute):
+        return self.tmo
+
+    def set_visa_attribute(self, attribute, value):
+        self.tmo = value
+
+    def write(self, message):
+        pass
+
+    def read_raw(self):
+        raise IOError('timed out')
+
+
+def test_timeout_restored():
+    instr = VISAObject('GPIB0::1::INSTR')
+    instr.mbSession = TimingOutSession()
+    with pytest.raises(IOError):
+        instr.query_raw_binary('CURV?', withTimeout=100)
+    assert instr.mbSession.tmo == 2000
+    assert instr.timeout == 2000
+
+
+def test_tcp_binary():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    port = listener.getsockname()[1]
+    values = np.arange(5000, dtype='<f4')
+    block = make_block(values, '<5000f') + b'\n'
+
+    def serve():
+        conn, _ = listener.accept()
+        conn.recv(100)
+        for i in range(0, len(block), 1000):  # in pieces
+            conn.sendall(block[i:i + 1000])
+        conn.recv(100)
+        conn.sendall(b'plain text\n')
+        conn.close()
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    conn = TCPSocketConnection('127.0.0.1', port)
+    with conn.connected():
+        received = conn.query_binary_values('DATA?', datatype='f')
+        assert conn.query_raw_binary('ASK?') == b'plain text\n'
+    thread.join()
+    listener.close()
+    np.testing.assert_array_equal(received, values)
@@ -9,8 +9,9 @@
     but hey it shows that Configurable does a good job emulating how a real-life
     configurable instrument works.
 '''
+import time
 import pytest
-from lightlab.equipment.abstract_drivers import Configurable, AbstractDriver
+from lightlab.equipment.abstract_drivers import Configurable, AbstractDriver, TekConfig
 
 
 class MessagePasser(Configurable):
@@ -97,3 +98,91 @@ def test_init_config():
     assert bob.config['init'].get('foo', asCmd=False) == 1
     assert bob.config['live'].get('foo', asCmd=False) == 2
 
+
+class Recorder(Configurable):
+    ''' Reads back what was written, and counts the queries '''
+    cacheTTL = {'VOLATILE': 0, 'SLOW:*': 0.05}
+    cacheInvalidation = {'HOR:*': ['PRE:*'], 'SOURCE': ['PRE:YMULT']}
+
+    def __init__(self):
+        self.settings = dict()
+        self.queries = 0
+        super().__init__(headerIsOptional=False)
+
+    def write(self, string):
+        header, _, val = string.partition(' ')
+        self.settings[header.strip(':')] = val
+
+    def query(self, string):
+        self.queries += 1
+        return self.settings.get(string.strip(':?'), '0')
+
+
+def test_cache_policies():
+    scope = Recorder()
+    assert scope.getConfigParams(['PRE:YMULT', 'PRE:YOFF', 'HOR:SCALE']) == [0, 0, 0]
+    assert scope.queries == 3
+    scope.getConfigParams(['PRE:YMULT', 'PRE:YOFF'])
+    assert scope.queries == 3
+    scope.setConfigParam('SOURCE', 'CH2')
+    scope.getConfigParams(['PRE:YMULT', 'PRE:YOFF'])
+    assert scope.queries == 4
+    scope.setConfigParam('HOR:SCALE', 1e-9)
+    scope.getConfigParam('HOR:SCALE')
+    scope.getConfigParams(['PRE:YMULT', 'PRE:YOFF'])
+    assert scope.queries == 6
+
+    scope.getConfigParam('VOLATILE')
+    scope.getConfigParam('VOLATILE')
+    scope.getConfigParam('SLOW:A')
+    scope.getConfigParam('SLOW:A')
+    assert scope.queries == 9
+    time.sleep(0.06)
+    scope.getConfigParam('SLOW:A')
+    assert scope.queries == 10
+
+    scope.settings['PRE:YOFF'] = '5'  # changed in lab
+    scope.invalidateConfig('PRE:*')
+    assert scope.getConfigParam('PRE:YOFF') == 5
+    scope.invalidateConfig('HOR:SCALE')
+    scope.settings['HOR:SCALE'] = '2'
+    assert scope.setConfigParam('HOR:SCALE', 1e-9)  # stale, so written even though it looks the same
+    assert scope.settings['HOR:SCALE'] == '1e-09'
+
+
+
+def test_tekconfig_token(tmp_path):
+    ''' A command that is also a group keeps its value under "&" '''
+    cfg = TekConfig()
+    cfg.set(':TRIGGER', 'AUTO')
+    cfg.set(':TRIGGER:LEVEL', 0.5)
+    cfg.set('CH1:SCALE', 0.1)
+    assert cfg.dico == {'TRIGGER': {'&': 'AUTO', 'LEVEL': 0.5}, 'CH1': {'SCALE': 0.1}}
+    assert cfg.get('TRIGGER') == ('TRIGGER', 'AUTO')
+    assert cfg.get('CH1', asCmd=False) == {'SCALE': 0.1}
+    assert cfg.getList() == [(':TRIGGER:&', 'AUTO'), (':TRIGGER:LEVEL', 0.5), (':CH1:SCALE', 0.1)]
+    assert cfg.getList('TRIGGER', asCmd=False) == [':TRIGGER AUTO', ':TRIGGER:LEVEL 0.5']
+    assert cfg.getList('TRIGGER:&') == [(':TRIGGER:&', 'AUTO')]
+    assert cfg.getList('CH1:SCALE') == [(':CH1:SCALE', 0.1)]
+    assert cfg.getList('CH') == []
+
+    cfg.set('CH1', 1)  # the token goes at the end of the group
+    assert cfg.getList('CH1') == [(':CH1:SCALE', 0.1), (':CH1:&', 1)]
+    with pytest.raises(KeyError):
+        cfg.get('CH2')
+
+    fname = str(tmp_path / 'config.json')
+    cfg.save(fname)
+    loaded = TekConfig.fromFile(fname)
+    assert loaded.dico == cfg.dico
+    assert sorted(loaded.getList()) == sorted(cfg.getList())
+    assert TekConfig.fromFile(fname, subgroup='TRIGGER').dico == {'TRIGGER': {'&': 'AUTO', 'LEVEL': 0.5}}
+
+
+def test_tekconfig_transfer():
+    src = TekConfig({'A': {'X': 1, 'Y': {'&': 2, 'Z': 3}}, 'B': 4})
+    dest = TekConfig({'A': {'X': 0}, 'C': 5})
+    dest.transfer(src, subgroup='A')
+    assert dest.dico == {'A': {'X': 1, 'Y': {'&': 2, 'Z': 3}}, 'C': 5}
+    assert TekConfig.fromSETresponse(':A:X 1;Y 2;:B:Z 3').getList() \
+        == [(':A:X', '1'), (':A:Y', '2'), (':B:Z', '3')]
@@ -106,3 +106,15 @@ def test_optionals():
     d1.driver.notInInterface()
     assert 'histogramStats' not in dir(d1)
     assert 'histogramStats' in dir(d2)
+
+
+def test_kwarg_routing_cached():
+    ''' The split of init arguments between Instrument and driver is worked out
+        once per driver class, and still rejects essential attributes
+    '''
+    inst_klass, driverArgs, forbidden = HP_8152A_PM.__dict__['_kwargRouting']
+    assert inst_klass is PowerMeter
+    assert 'tempSess' in driverArgs
+    assert 'powerDbm' in forbidden
+    with pytest.raises(ValueError):
+        HP_8152A_PM(name='a PM', address='NULL', powerDbm=0)
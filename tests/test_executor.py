@@ -0,0 +1,104 @@
+''' Tests running instrument operations in parallel across buses,
+    with a stand-in RVISA server that adds latency to every call.
+'''
+import threading
+import time
+import pytest
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.laboratory.executor import InstrumentExecutor, ExecutorError, busOf
+from lightlab.laboratory.experiments import Experiment
+
+LATENCY = 0.05
+
+
+@pytest.fixture
+def server(standin):
+    return standin(latency=LATENCY)
+
+
+def test_bus_of(server):
+    lan1 = RVISAObject('TCPIP0::a::INSTR', url=server.url)
+    gpib1 = RVISAObject('GPIB0::1::INSTR', url=server.url)
+    gpib2 = RVISAObject('GPIB0::2::INSTR', url=server.url)
+    assert busOf(gpib1) == busOf(gpib2)
+    assert busOf(lan1) != busOf(gpib1)
+    assert busOf(object()) != busOf(object())
+
+
+def test_parallel_across_buses(server):
+    ''' Instruments with links of their own are queried at the same time '''
+    instrs = [RVISAObject('TCPIP0::{}::INSTR'.format(name), url=server.url) for name in 'abcd']
+    executor = InstrumentExecutor()
+    executor.map('instrID', instrs)  # connect
+    tick = time.time()
+    idns = executor.map('instrID', instrs)
+    elapsed = time.time() - tick
+    executor.shutdown()
+    assert idns == ['LIGHTLAB,RVISA STAND-IN,0,1.0'] * 4
+    assert elapsed < 3 * LATENCY
+
+
+def test_serial_on_one_bus(server):
+    ''' Instruments on the same GPIB board take turns, in the order given '''
+    instrs = [RVISAObject('GPIB0::{}::INSTR'.format(addr), url=server.url) for addr in (1, 2, 3)]
+    executor = InstrumentExecutor()
+    tick = time.time()
+    executor.gather(*[(instr, instr.write, ':X {}'.format(i)) for i, instr in enumerate(instrs)])
+    elapsed = time.time() - tick
+    executor.shutdown()
+    assert elapsed >= 3 * LATENCY
+    assert [server.instrument(instr.address).settings['X'] for instr in instrs] == ['0', '1', '2']
+
+
+class Flaky(object):
+    address = None
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.thread = None
+
+    def startup(self):
+        self.thread = threading.current_thread()
+        time.sleep(LATENCY)
+        if self.fail:
+            raise ValueError('broken')
+        return True
+
+
+def test_errors_collected():
+    good, bad = Flaky(False), Flaky(True)
+    executor = InstrumentExecutor()
+    with pytest.raises(ExecutorError) as excinfo:
+        executor.gather(good.startup, bad.startup)
+    assert excinfo.value.errors[0][0] is bad
+    assert excinfo.value.results[0] is True
+    results = executor.map('startup', [good, bad], returnExceptions=True)
+    assert results[0] is True and isinstance(results[1], ValueError)
+    with pytest.raises(TypeError):
+        executor.gather(len)
+    executor.shutdown()
+
+
+class ParallelExperiment(Experiment):
+    def startup(self):  # pylint: disable=arguments-differ
+        pass
+
+
+def test_experiment_warmup():
+    instrs = [Flaky(False) for _ in range(4)]
+    exp = ParallelExperiment(instruments=instrs)
+    tick = time.time()
+    exp.global_hardware_warmup()
+    assert time.time() - tick < 3 * LATENCY
+    assert len(set(instr.thread for instr in instrs)) == 4
+    assert threading.current_thread() not in [instr.thread for instr in instrs]
+
+
+def test_experiment_warmup_errors():
+    exp = ParallelExperiment(instruments=[Flaky(False), Flaky(True)])
+    with pytest.raises(ValueError):
+        exp.global_hardware_warmup()
+    exp = ParallelExperiment(instruments=[Flaky(True), Flaky(True)])
+    with pytest.raises(ExecutorError) as excinfo:
+        exp.global_hardware_warmup()
+    assert len(excinfo.value.errors) == 2
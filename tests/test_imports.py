@@ -23,3 +23,69 @@ def test_some_visa_driver_imports():
     '''
     from lightlab.equipment.lab_instruments import Tektronix_DSA8300_Oscope
     from lightlab.equipment.lab_instruments import Keithley_2400_SM
+
+
+def test_driver_manifest_complete():
+    ''' Every driver class in lab_instruments is in the lazy registry, under the right module
+    '''
+    from lightlab.equipment import lab_instruments
+    from lightlab.equipment.visa_bases import VISAInstrumentDriver, RVISAInstrumentDriver
+    found = dict()
+    for _, modname, _ in pkgutil.walk_packages(path=lab_instruments.__path__,
+                                               prefix=lab_instruments.__name__ + '.'):
+        module = importlib.import_module(modname)
+        for k, v in module.__dict__.items():
+            if isinstance(v, type) and v.__module__ == modname \
+                    and issubclass(v, (VISAInstrumentDriver, RVISAInstrumentDriver)):
+                found[k] = modname.rsplit('.', 1)[1]
+    assert found == lab_instruments._driverManifest
+    for name in found:
+        assert getattr(lab_instruments, name).__name__ == name
+
+
+def test_driver_import_is_lazy():
+    ''' Importing one driver does not import the others
+    '''
+    import subprocess
+    import sys
+    code = ('import sys\n'
+            'from lightlab.equipment.lab_instruments import Keithley_2400_SM\n'
+            'assert isinstance(Keithley_2400_SM, type)\n'
+            'print(sorted(m for m in sys.modules if ".lab_instruments." in m))\n')
+    out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+    assert out.strip() == "['lightlab.equipment.lab_instruments.Keithley_2400_SM']"
+
+
+# Import budgets in milliseconds, measured with ``python -X importtime``.
+# Acquisition modules must not need plotting or notebook packages to import.
+importBudgets = {
+    'lightlab': 500,
+    'lightlab.util.sweep': 2000,
+    'lightlab.util.data': 2000,
+    'lightlab.laboratory.instruments': 2000,
+    'lightlab.laboratory.experiments': 2000,
+    'lightlab.equipment.lab_instruments.Keithley_2400_SM': 2000,
+    'lightlab.equipment.lab_instruments.Tektronix_DPO4034_Oscope': 2000,
+}
+plottingPackages = ('matplotlib', 'IPython')
+
+
+@pytest.mark.parametrize("modname", sorted(importBudgets.keys()))
+def test_import_budget(modname):
+    ''' Headless acquisition modules import quickly, without a display backend
+    '''
+    import subprocess
+    import sys
+    code = ('import sys, {}\n'
+            'print(" ".join(m for m in {!r} if m in sys.modules))').format(modname, plottingPackages)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    assert proc.stdout.strip() == '', 'imported ' + proc.stdout.strip()
+    cumulative = dict()
+    for line in proc.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumul, name = line[len('import time:'):].split('|')
+            if cumul.strip().isdigit():
+                cumulative[name.strip()] = int(cumul) / 1000
+    assert cumulative[modname] < importBudgets[modname]
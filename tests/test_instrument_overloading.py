@@ -1,6 +1,7 @@
 ''' Testing instrument getattr, setattr, delattr overloading. '''
 
 import pytest
+from mock import patch
 from lightlab.laboratory.instruments import Instrument
 from lightlab.equipment.lab_instruments import VISAInstrumentDriver
 
@@ -172,3 +173,25 @@ def test_property_superprivate_variable(Klass):
     assert d.superprivate_variable == 123
     del d.superprivate_variable
     assert d.superprivate_variable == 'default_superprivate'
+
+
+def test_delegation_cache():
+    d = BogusDriver(address='123')
+    driver = d.driver
+    session = driver._session_object
+    assert driver.query.__self__ is session
+    assert 'query' in driver.__dict__  # found without __getattr__ from now on
+    assert d.startup.__self__ is driver
+    assert 'startup' in d.__dict__
+    assert 'startup' not in d.__getstate__()  # not serialized
+    d.address = '1234'  # new session
+    assert 'query' not in driver.__dict__
+    assert driver.query.__self__ is driver._session_object is not session
+
+
+def test_delegation_warning_kept():
+    driver = BogusDriver(address='123').driver
+    with patch('lightlab.visalogger.warning') as warning:
+        for _ in range(2):
+            driver.mbSession  # pylint: disable=pointless-statement
+    assert warning.call_count == 2
@@ -0,0 +1,62 @@
+''' Tests the opt-in session instrumentation, using the RVISA stand-in server.
+'''
+import json
+import pytest
+import lightlab
+from lightlab.equipment.visa_bases import instrumentation
+from lightlab.equipment.visa_bases.instrumentation import LatencyHistogram
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+
+
+@pytest.fixture
+def instr(server):
+    instrumentation.reset()
+    yield RVISAObject('GPIB0::7::INSTR', url=server.url)
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_histogram():
+    hist = LatencyHistogram()
+    assert hist.percentile(50) is None
+    for ms in range(1, 101):
+        hist.add(ms * 1e-3)
+    assert hist.percentile(50) == pytest.approx(50e-3, rel=0.07)
+    assert hist.percentile(99) == pytest.approx(99e-3, rel=0.07)
+    assert hist.percentile(100) == pytest.approx(100e-3)
+
+
+def test_disabled_costs_nothing(instr):
+    original = RVISAObject.__dict__['query']
+    instrumentation.enable()
+    assert RVISAObject.__dict__['query'] is not original
+    instrumentation.disable()
+    assert RVISAObject.__dict__['query'] is original
+    instr.query('*IDN?')
+    assert lightlab.stats() == dict()
+
+
+def test_counts_and_bytes(instr, tmpdir):
+    instrumentation.enable()
+    instr.write(':CH1:SCALE 0.1')
+    for _ in range(3):
+        instr.query('CH1:SCALE?')
+    with instr.batch():
+        instr.write('A 1')  # queued, so counted by the execute
+        instr.write('B 2')
+    byVerb = lightlab.stats('GPIB0::7::INSTR')
+    assert byVerb[':CH1:SCALE']['count'] == 1
+    assert byVerb[':CH1:SCALE']['bytes_out'] == len(':CH1:SCALE 0.1')
+    assert byVerb['CH1:SCALE?']['count'] == 3
+    assert byVerb['CH1:SCALE?']['bytes_in'] == 3 * len('0.1')
+    assert byVerb['CH1:SCALE?']['p99_s'] > 0
+    assert byVerb['<execute>']['count'] == 1
+    assert 'A' not in byVerb
+
+    filename = str(tmpdir.join('stats.json'))
+    instrumentation.export(filename)
+    with open(filename) as fx:
+        assert json.load(fx)['GPIB0::7::INSTR']['CH1:SCALE?']['count'] == 3
+    assert 'CH1:SCALE?' in instrumentation.report()
+    instrumentation.reset()
+    assert lightlab.stats() == dict()
@@ -0,0 +1,134 @@
+''' Tests session and bus locks, with several threads sharing instruments
+    on a stand-in Prologix controller.
+'''
+import threading
+import time
+import pytest
+from lightlab.equipment.visa_bases import locking
+from lightlab.equipment.visa_bases.prologix_gpib import PrologixGPIBObject
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.equipment.visa_bases.visa_object import VISAObject
+from tests.socket_standin import PrologixStandInServer
+
+
+@pytest.fixture
+def prologix():
+    server = PrologixStandInServer()
+    with server, server.patched():
+        yield server
+
+
+def run_threads(target, nThreads):
+    errors = []
+
+    def wrapped(i):
+        try:
+            target(i)
+        except Exception as err:  # pylint: disable=broad-except
+            errors.append(err)
+    threads = [threading.Thread(target=wrapped, args=(i,)) for i in range(nThreads)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join(timeout=30)
+    assert errors == []
+
+
+def test_bus_keys():
+    assert locking.bus_key('GPIB0::23::INSTR') == 'GPIB0'
+    assert locking.bus_key('GPIB::5') == 'GPIB0'
+    assert locking.bus_key('GPIB1::5::INSTR') == 'GPIB1'
+    assert locking.bus_key('prologix://10.0.0.5/23:96') == 'prologix://10.0.0.5'
+    assert locking.bus_key('TCPIP0::scope::INSTR') == 'TCPIP0::scope::INSTR'
+    assert locking.bus_key('GPIB0::23::INSTR', url='http://server/') == 'http://server/GPIB0'
+
+
+def test_shared_locks():
+    a = VISAObject('GPIB0::23::INSTR')
+    b = VISAObject('GPIB0::23::INSTR')
+    c = VISAObject('GPIB0::24::INSTR')
+    assert a.session_lock is b.session_lock
+    assert a.session_lock is not c.session_lock
+    assert a.bus_lock is c.bus_lock
+    remote = RVISAObject('GPIB0::24::INSTR', url='http://server')
+    assert remote.bus_lock is not c.bus_lock
+    a.address = 'GPIB1::23::INSTR'
+    assert a.session_lock is not b.session_lock
+    assert a.bus_lock is not b.bus_lock
+
+
+def test_prologix_bus_lock(prologix):
+    instr = PrologixGPIBObject('prologix://127.0.0.1/7')
+    assert instr.bus_lock is instr._prologix_rm.lock
+
+
+def test_concurrent_queries(prologix):
+    ''' Query/response pairs from threads sharing one instrument are not mixed up '''
+    instr = PrologixGPIBObject('prologix://127.0.0.1/7')
+    instr.timeout = 5
+
+    def worker(i):
+        for k in range(20):
+            instr.write(':T{}:X {}'.format(i, k))
+            assert instr.query(':T{}:X?'.format(i)) == str(k)
+    run_threads(worker, 4)
+
+
+def test_concurrent_instruments(prologix):
+    ''' Instruments on the same controller, used from different threads '''
+    instrs = [PrologixGPIBObject('prologix://127.0.0.1/{}'.format(addr)) for addr in (3, 4, 5)]
+
+    def worker(i):
+        instr = instrs[i]
+        instr.timeout = 5
+        for k in range(20):
+            instr.write(':X {}'.format(100 * i + k))
+            assert instr.query(':X?') == str(100 * i + k)
+    run_threads(worker, len(instrs))
+
+
+def test_locked_transaction(prologix):
+    ''' Nothing from other threads gets between the commands of a locked() block '''
+    instr = PrologixGPIBObject('prologix://127.0.0.1/7')
+    instr.timeout = 5
+
+    def worker(i):
+        for _ in range(5):
+            with instr.locked():
+                instr.write(':X {}'.format(i))
+                time.sleep(0.002)
+                assert instr.query(':X?') == str(i)
+    run_threads(worker, 3)
+
+
+def test_batch_excludes_other_threads(prologix):
+    instr = PrologixGPIBObject('prologix://127.0.0.1/7')
+    instr.timeout = 5
+    inBatch = threading.Event()
+    done = threading.Event()
+
+    def other():
+        inBatch.wait()
+        instr.write(':OTHER 1')
+        done.set()
+
+    th = threading.Thread(target=other)
+    th.start()
+    with instr.batch():
+        instr.write(':MINE 1')
+        inBatch.set()
+        time.sleep(0.05)
+        assert not done.is_set()
+    th.join(timeout=10)
+    assert done.is_set()
+    assert prologix.instruments['7'].log == [':MINE 1', ':OTHER 1']
+
+
+def test_locked_several(prologix):
+    a = PrologixGPIBObject('prologix://127.0.0.1/3')
+    b = VISAObject('GPIB0::4::INSTR')
+    with locking.locked(b, a):
+        assert a.session_lock._is_owned()
+        assert b.session_lock._is_owned()
+        assert a.bus_lock._is_owned()
+    assert not a.session_lock._is_owned()
@@ -1,10 +1,16 @@
 """ Testing some functionality for the Prologix Resource manager. """
 
+import socket
+import threading
+import time
 import pytest
+from mock import patch
 from lightlab.equipment.visa_bases.prologix_gpib import \
     _validate_hostname, \
     _sanitize_address, \
-    PrologixGPIBObject
+    PrologixGPIBObject, \
+    PrologixResourceManager, \
+    prologix_stats
 
 
 def test_valid_hostnames():
@@ -54,3 +60,124 @@ def test_sanitize_bad_address(address):
 def test_gpid_addr_format():
     test_object = PrologixGPIBObject("prologix://valid.name.edu/12")
     assert test_object._prologix_escape_characters('+11/.\x11\nlala\n\r') == '\x11+11/.\x11\x11\x11\nlala\x11\n\x11\r'
+
+
+class FakePrologixServer(object):
+    ''' Threaded TCP server imitating a Prologix controller with instruments that echo '''
+
+    def __init__(self):
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.port = self.listener.getsockname()[1]
+        self.received = []
+        self.connections = 0
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        addr = None
+        outputs = dict()
+        buffer = b''
+        while True:
+            data = conn.recv(1024)
+            if not data:
+                break
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                cmd = line.decode()
+                self.received.append(cmd)
+                if cmd.startswith('++addr'):
+                    addr = cmd.split()[1]
+                elif cmd.startswith('++spoll'):
+                    conn.sendall(b'16\n' if cmd.split()[1] in outputs else b'0\n')
+                elif cmd == '++read eoi':
+                    conn.sendall(outputs.pop(addr).encode() + b'\r\n')
+                elif not cmd.startswith('++') and cmd.endswith('?'):
+                    outputs[addr] = '{} says {}'.format(addr, cmd)
+        conn.close()
+
+    def close(self):
+        self.listener.close()
+
+
+@pytest.fixture()
+def fake_prologix():
+    server = FakePrologixServer()
+    with patch.object(PrologixResourceManager, 'port', server.port), \
+            patch.dict(PrologixResourceManager._instances, clear=True):
+        yield server
+    server.close()
+
+
+def test_shared_manager_and_address_cache(fake_prologix):
+    instrA = PrologixGPIBObject('prologix://127.0.0.1/5')
+    instrB = PrologixGPIBObject('prologix://127.0.0.1/6')
+    rm = instrA._prologix_rm
+    assert rm is instrB._prologix_rm
+    assert rm is PrologixResourceManager('127.0.0.1')
+    for _ in range(10):
+        instrA.write('A')
+    instrB.write('B')
+    assert instrA.query('IDN?') == '5 says IDN?'
+    assert [c for c in fake_prologix.received if c.startswith('++addr')] == \
+        ['++addr 5', '++addr 6', '++addr 5']
+    assert rm.stats['addr_sent'] == 3
+    assert rm.stats['addr_skipped'] == 10
+    assert fake_prologix.connections == 1  # kept open between commands
+    assert prologix_stats()['127.0.0.1'] == rm.stats
+
+
+def test_thread_safety(fake_prologix):
+    instrs = [PrologixGPIBObject('prologix://127.0.0.1/{}'.format(i)) for i in range(1, 5)]
+    results = dict()
+
+    def work(instr):
+        results[instr.gpib_pad] = [instr.query('Q{}?'.format(j)) for j in range(5)]
+
+    threads = [threading.Thread(target=work, args=(instr,)) for instr in instrs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for pad, replies in results.items():
+        assert replies == ['{} says Q{}?'.format(pad, j) for j in range(5)]
+
+
+def test_idle_close(fake_prologix):
+    instr = PrologixGPIBObject('prologix://127.0.0.1/5')
+    rm = instr._prologix_rm
+    with patch.object(PrologixResourceManager, 'idle_timeout', 0.1):
+        instr.write('A')
+        assert rm._socket is not None
+        time.sleep(0.5)
+        assert rm._socket is None
+        assert rm.stats['idle_disconnects'] == 1
+        instr.write('A')  # reconnects, and addresses again
+    assert rm.stats['connects'] == 2
+    assert rm.stats['addr_sent'] == 2
+
+
+def test_disconnect_on_error(fake_prologix):
+    instr = PrologixGPIBObject('prologix://127.0.0.1/5')
+    rm = instr._prologix_rm
+    instr.write('A')
+    assert rm.current_address == '5'
+    rm._socket.settimeout(0.2)
+    with pytest.raises(OSError):
+        rm.query('++ver')  # never answered
+    assert rm._socket is None
+    assert rm.current_address is None
+    assert instr.query('IDN?') == '5 says IDN?'  # addresses again, on a new socket
+    assert [c for c in fake_prologix.received if c.startswith('++addr')] == ['++addr 5', '++addr 5']
+    assert fake_prologix.connections == 2
@@ -0,0 +1,78 @@
+''' Tests recording of session traffic and its replay without instruments,
+    using the RVISA stand-in server.
+'''
+import time
+import numpy as np
+import pytest
+from lightlab.equipment.visa_bases import replay, rvisa_pool
+from lightlab.equipment.visa_bases.replay import ReplayMismatch, SessionTrace
+from lightlab.equipment.visa_bases.rvisa_driver import RVISAInstrumentDriver
+from tests.rvisa_standin import StandInServer
+from lightlab.util.sweep import NdSweeper
+
+ADDRESS = 'GPIB0::7::INSTR'
+
+
+def make_sweep(driver):
+    sweep = NdSweeper()
+    sweep.monitorOptions['stdoutPrint'] = False
+    sweep.addActuation('volt', lambda v: driver.write('SOUR:VOLT {}'.format(v)), np.linspace(0, 1, 5))
+    sweep.addMeasurement('volt_back', lambda: float(driver.query('SOUR:VOLT?')))
+    return sweep
+
+
+@pytest.fixture
+def trace_file(tmpdir):
+    ''' Records a sweep against the stand-in server '''
+    rvisa_pool.clear_pools()
+    filename = str(tmpdir.join('sweep.trace.gz'))
+    with StandInServer() as server:
+        server.attach()
+        driver = RVISAInstrumentDriver(address=ADDRESS, url=server.url)
+        sweep = make_sweep(driver)
+        with replay.recording(driver, filename=filename) as trace:
+            sweep.gather()
+            driver.query_raw_binary('*IDN?')
+        assert type(driver._session_object).__name__ == 'RVISAObject'  # put back
+    rvisa_pool.clear_pools()
+    assert len(trace) == 11
+    np.testing.assert_array_equal(sweep.data['volt_back'], np.linspace(0, 1, 5))
+    return filename
+
+
+def test_replay_gather(trace_file):
+    trace = SessionTrace.load(trace_file)
+    assert trace.addresses == [ADDRESS]
+    assert trace.total_latency > 0
+    assert isinstance(trace.events[-1]['r'], bytes)
+
+    driver = RVISAInstrumentDriver(address=ADDRESS, url='http://nowhere.invalid/')
+    sweep = make_sweep(driver)
+    with replay.replaying(driver, trace=trace) as trace:
+        sweep.gather()
+        assert driver.query_raw_binary('*IDN?').startswith(b'LIGHTLAB')
+    np.testing.assert_array_equal(sweep.data['volt_back'], np.linspace(0, 1, 5))
+
+
+def test_replay_mismatch(trace_file):
+    driver = RVISAInstrumentDriver(address=ADDRESS, url='http://nowhere.invalid/')
+    with replay.replaying(driver, filename=trace_file):
+        with pytest.raises(ReplayMismatch):
+            driver.write('SOUR:VOLT 0.5')  # recorded first was 0.0
+    with replay.replaying(driver, filename=trace_file, strict=False):
+        driver.write('SOUR:CURR 1')  # not recorded, but only a write
+        assert driver.query('SOUR:VOLT?') == '0.0'
+        with pytest.raises(ReplayMismatch):
+            driver.query('MEAS:CURR?')
+
+
+def test_replay_realtime(trace_file):
+    trace = SessionTrace.load(trace_file)
+    for event in trace.events:
+        event['dt'] = 0.02
+    driver = RVISAInstrumentDriver(address=ADDRESS, url='http://nowhere.invalid/')
+    with replay.replaying(driver, trace=trace, realtime=True):
+        tick = time.time()
+        driver.write('SOUR:VOLT 0.0')
+        driver.query('SOUR:VOLT?')
+        assert time.time() - tick >= 0.04
@@ -0,0 +1,201 @@
+''' Tests for batched commands, against the local RVISA stand-in server.
+'''
+import pytest
+
+from lightlab.equipment.abstract_drivers import Configurable, TekConfig
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.equipment.visa_bases.rvisa_driver import RVISAInstrumentDriver
+from tests.rvisa_standin import SCPIPersonality
+from lightlab.equipment.visa_bases.command_batch import compound_messages, split_responses, is_query
+
+ADDRESS = 'GPIB0::7::INSTR'
+
+
+def test_compound_messages():
+    assert is_query('*IDN?')
+    assert is_query('MEAS:VOLT? (@1)')
+    assert not is_query('CH1:SCALE 0.1')
+    msgs = compound_messages(['HEADER OFF', 'CH1:SCALE 0.1', '*CLS', ':CH1:SCALE?'])
+    assert msgs == [('HEADER OFF;:CH1:SCALE 0.1;*CLS;:CH1:SCALE?', 1)]
+    msgs = compound_messages([':A 1', ':B 2', ':C?'], maxLength=7)
+    assert msgs == [(':A 1', 0), (':B 2', 0), (':C?', 1)]
+    assert split_responses('1;"a;b";3', 3) == ['1', '"a;b"', '3']
+    assert split_responses('1;2', 3) is None
+
+
+def test_execute(server):
+    instr = RVISAObject(ADDRESS, url=server.url)
+    cmds = [':PARAM{} {}'.format(i, i) for i in range(40)]
+    cmds += [':PARAM3?', '*IDN?', ':PARAM39?']
+    results = instr.execute(cmds)
+    assert results[0] == '3'
+    assert results[1].startswith('LIGHTLAB')
+    assert results[2] == '39'
+    assert server.transfers == 1
+
+
+def test_batch_context(server):
+    instr = RVISAObject(ADDRESS, url=server.url)
+    with instr.batch() as b:
+        for i in range(40):
+            instr.write(':PARAM{} {}'.format(i, i))
+        deferred = b.query(':PARAM5?')
+        assert server.transfers == 0
+        assert instr.query(':PARAM7?') == '7'  # goes out with the queued writes
+        assert server.transfers == 1
+        assert deferred.value == '5'
+        instr.write(':PARAM7 70')
+    assert server.transfers == 2
+    assert instr.query(':PARAM7?') == '70'
+    with pytest.raises(ValueError):
+        with instr.batch() as b:
+            instr.write(':PARAM8 80')
+            b.query(':PARAM8')  # not a query
+    assert instr.query(':PARAM8?') == '8'
+
+
+class ListPersonality(SCPIPersonality):
+    ''' Answers LIST? with something that contains the separator '''
+
+    def respond(self, header, arg):
+        if header == 'LIST':
+            return '1;2;3'
+        return super().respond(header, arg)
+
+
+def test_mismatched_responses(standin):
+    srv = standin(lambda address: ListPersonality())
+    instr = RVISAObject(ADDRESS, url=srv.url)
+    assert instr.execute([':LIST?', ':OTHER?']) == ['1;2;3', '0']
+    assert srv.transfers == 3
+
+
+class RecordingListPersonality(ListPersonality):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def handle(self, message):
+        self.messages.append(message)
+        return super().handle(message)
+
+
+def test_mismatched_responses_repeat_originals(standin):
+    personality = RecordingListPersonality()
+    srv = standin(lambda address: personality)
+    instr = RVISAObject(ADDRESS, url=srv.url)
+    assert instr.execute(['LIST?', 'NAME "a;b"', 'FIND? "c;d"']) == ['1;2;3', '0']
+    assert personality.messages[-2:] == ['LIST?', 'FIND? "c;d"']
+
+
+def test_driver_unchanged(server):
+    driver = RVISAInstrumentDriver('stand-in', ADDRESS, url=server.url)
+    with driver.batch():
+        for i in range(10):
+            driver.write(':PARAM{} {}'.format(i, i))
+        assert driver.query_ascii_values(':PARAM9?') == [9.]
+    assert server.transfers == 1
+    server.reset_counts()
+    driver.maxMessageLength = 0  # one message per command
+    assert driver.execute([':PARAM1?', ':PARAM2?']) == ['1', '2']
+    assert server.transfers == 2
+
+
+class StandInConfigurable(RVISAInstrumentDriver, Configurable):
+    coalesceWrites = True
+
+    def __init__(self, name='stand-in', address=None, **kwargs):
+        RVISAInstrumentDriver.__init__(self, name=name, address=address, **kwargs)
+        Configurable.__init__(self, headerIsOptional=False)
+
+
+def test_configurable_coalescing(server):
+    config = TekConfig({'CH{}'.format(ch): {'PARAM{}'.format(i): i for i in range(10)}
+                        for ch in range(1, 5)})
+    driver = StandInConfigurable(address=ADDRESS, url=server.url)
+    driver.loadConfig(config)
+    assert server.transfers == 2  # and *ESR?
+    assert driver.query(':CH3:PARAM7?') == '7'
+    server.reset_counts()
+    driver.maxMessageLength = 100
+    driver.loadConfig(config, subgroup='CH2')
+    assert server.transfers == 3
+    server.reset_counts()
+    driver.coalesceWrites = False
+    driver.loadConfig(config)
+    assert server.transfers == 40
+    server.reset_counts()
+    driver.coalesceWrites = True
+    driver.setConfigParam('CH1:PARAM1', 10)
+    assert server.transfers == 1
+    assert driver.getConfigParam('CH1:PARAM1', forceHardware=True) == 10
+
+
+class SerialPersonality(SCPIPersonality):
+    ''' Old firmware that fails on more than one query in a message '''
+
+    def handle(self, message):
+        if message.count('?') > 1:
+            raise ValueError('compound query')
+        return super().handle(message)
+
+
+def test_configurable_compound_queries(server):
+    driver = StandInConfigurable(address=ADDRESS, url=server.url)
+    for i in range(4):
+        driver.write(':PARAM{} {}'.format(i, 0.5 * i))
+    driver.write(':NAME HELLO')
+    server.reset_counts()
+    params = ['PARAM{}'.format(i) for i in range(4)] + ['NAME']
+    assert driver.getConfigParams(params) == [0, 0.5, 1, 1.5, 'HELLO']
+    assert server.transfers == 1
+    assert driver.config['init'].get('PARAM3', asCmd=False) == 1.5
+    assert driver.getConfigParams(params[:2]) == [0, 0.5]
+    assert server.transfers == 1
+    driver.write(':PARAM1 7')
+    assert driver.getConfigParams(params[:2], forceHardware=True) == [0, 7]
+    assert server.transfers == 3
+    assert driver.config['init'].get('PARAM1', asCmd=False) == 0.5
+
+
+class NoCompoundWritesPersonality(SCPIPersonality):
+    ''' Rejects compound messages with a command error, after applying the first command '''
+
+    def handle(self, message):
+        if ';' in message:
+            super().handle(message.split(';')[0])
+            self.settings['*ESR'] = '32'
+            return None
+        return super().handle(message)
+
+    def respond(self, header, arg):
+        if header == '*ESR':
+            return self.settings.pop('*ESR', '0')  # reading it clears it
+        return super().respond(header, arg)
+
+
+def test_configurable_write_fallback(standin):
+    srv = standin(lambda address: NoCompoundWritesPersonality())
+    driver = StandInConfigurable(address=ADDRESS, url=srv.url)
+    config = TekConfig({'PARAM{}'.format(i): i for i in range(5)})
+    driver.loadConfig(config)
+    assert not driver.coalesceWrites
+    assert [driver.query(':PARAM{}?'.format(i)) for i in range(5)] == ['0', '1', '2', '3', '4']
+    srv.reset_counts()
+    driver.loadConfig(config)
+    assert srv.transfers == 5
+    assert StandInConfigurable.coalesceWrites  # only this instrument gave up
+    assert not Configurable.coalesceWrites
+
+
+def test_configurable_serial_fallback(standin):
+    srv = standin(lambda address: SerialPersonality())
+    driver = StandInConfigurable(address=ADDRESS, url=srv.url)
+    driver.write(':PARAM1 1')
+    srv.reset_counts()
+    assert driver.getConfigParams(['PARAM1', 'PARAM2']) == [1, 0]
+    assert srv.transfers == 3
+    assert not driver.compoundQueries
+    srv.reset_counts()
+    assert driver.getConfigParams(['PARAM3', 'PARAM4']) == [0, 0]
+    assert srv.transfers == 2
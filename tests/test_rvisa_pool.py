@@ -0,0 +1,102 @@
+''' Tests for the shared pool of RVISA resource managers.
+    No server is needed: the pool is given a fake resource manager factory.
+'''
+import pytest
+from mock import patch
+
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+
+
+class FakeResource(object):
+    def __init__(self, address):
+        self.address = address
+        self.written = []
+
+    def write(self, msg):
+        self.written.append(msg)
+
+    def query(self, msg, timeout=None):
+        return 'reply to ' + msg + '\n'
+
+    def close(self):
+        pass
+
+
+class FakeResourceManager(object):
+    instances = 0
+
+    def __init__(self, url, timeout):
+        FakeResourceManager.instances += 1
+        self.url = url
+        self.closed = False
+
+    def open_resource(self, address):
+        return FakeResource(address)
+
+    def close(self):
+        self.closed = True
+
+
+URL = 'https://fake-gateway.test/'
+
+
+@pytest.fixture()
+def fake_pool():
+    rvisa_pool.clear_pools()
+    FakeResourceManager.instances = 0
+    rvisa_pool.register_factory(URL, FakeResourceManager)
+    yield rvisa_pool.get_pool(URL)
+    rvisa_pool.unregister_factory(URL)
+    rvisa_pool.clear_pools()
+    rvisa_pool.configure(max_sessions=rvisa_pool.DEFAULT_MAX_SESSIONS,
+                         idle_timeout=rvisa_pool.DEFAULT_IDLE_TIMEOUT)
+
+
+def test_tempSess_reuses_manager(fake_pool):
+    ''' A temporary session opens and closes on every command,
+        but the resource manager should only be built once
+    '''
+    instr = RVISAObject('GPIB0::7::INSTR', tempSess=True, url=URL)
+    for _ in range(10):
+        instr.write('*CLS')
+        assert instr.query('*IDN?') == 'reply to *IDN?'
+    assert FakeResourceManager.instances == 1
+    assert fake_pool.stats.opens == 1
+    assert fake_pool.stats.misses == 1
+    assert fake_pool.stats.hits == 19
+    assert instr.resMan is None
+
+
+def test_shared_between_objects(fake_pool):
+    instrs = [RVISAObject('GPIB0::{}::INSTR'.format(i), tempSess=False, url=URL)
+              for i in range(20)]
+    rvisa_pool.configure(max_sessions=3)
+    for instr in instrs:
+        instr.open()
+    assert FakeResourceManager.instances == 3
+    assert len(fake_pool) == 3
+    for instr in instrs:
+        instr.close()
+    assert rvisa_pool.pool_stats()[URL]['open'] == 3
+
+
+def test_idle_eviction(fake_pool):
+    rvisa_pool.configure(idle_timeout=0.5)
+    resMan = fake_pool.acquire()
+    fake_pool.release(resMan)
+    assert fake_pool.evict_idle() == 0
+    with patch.object(rvisa_pool.time, 'monotonic', lambda: 1e12):
+        assert fake_pool.evict_idle() == 1
+    assert resMan.closed
+    assert fake_pool.stats.evictions == 1
+    with fake_pool.session() as newMan:
+        assert newMan is not resMan
+    assert fake_pool.stats.opens == 2
+
+
+def test_bad_configuration():
+    with pytest.raises(ValueError):
+        rvisa_pool.configure(max_sessions=0)
+    with pytest.raises(ValueError):
+        rvisa_pool.configure(idle_timeout=-1)
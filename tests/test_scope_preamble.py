@@ -0,0 +1,116 @@
+''' Tests that scopes reuse the waveform preamble of each channel,
+    against the local RVISA stand-in server.
+'''
+import math
+import struct
+import numpy as np
+import pytest
+
+from tests.rvisa_standin import ScopePersonality
+from lightlab.equipment.lab_instruments.Tektronix_DPO4034_Oscope import Remote_Tektronix_DPO4034_Oscope
+from lightlab.equipment.lab_instruments.Agilent_Oscope import Remote_Agilent_Oscope
+
+ADDRESS = 'GPIB0::1::INSTR'
+
+
+class AgilentPersonality(ScopePersonality):
+    def respond(self, header, arg):
+        if header == 'WAVEFORM:PREAMBLE':
+            return '1,2,{},1,+2.0E-9,-1.0E-6,0,+2.0E-2,+1.0E-1,+32768'.format(self.npts)
+        if header.endswith(':UNITS'):
+            return 'VOLT'
+        if header == 'WAVEFORM:DATA':
+            data = struct.pack('>{}H'.format(self.npts), *[32768 + v for v in self.waveform()])
+            length = str(len(data))
+            return '#{}{}'.format(len(length), length).encode('ascii') + data
+        return super().respond(header, arg)
+
+
+def tek_personality(address):
+    scope = ScopePersonality(npts=100)
+    scope.settings.update({'WFMOUTPRE:YUNIT': '"V"', 'WFMOUTPRE:YMULT': '0.5',
+                           'WFMOUTPRE:YZERO': '1', 'HORIZONTAL:MAIN:SCALE': '1e-6'})
+    return scope
+
+
+class RoundingPersonality(ScopePersonality):
+    ''' Rounds the timebase to 1-2-5 steps and the averages to powers of two, like a real scope '''
+
+    def handle(self, message):
+        response = super().handle(message)
+        if 'HORIZONTAL:MAIN:SCALE' in self.settings:
+            scale = float(self.settings['HORIZONTAL:MAIN:SCALE'])
+            decade = 10 ** math.floor(math.log10(scale))
+            step = min((1, 2, 5, 10), key=lambda s: abs(s * decade - scale))
+            self.settings['HORIZONTAL:MAIN:SCALE'] = '{:.1E}'.format(step * decade)
+        if 'ACQUIRE:NUMAVG' in self.settings:
+            numAvg = int(self.settings['ACQUIRE:NUMAVG'])
+            self.settings['ACQUIRE:NUMAVG'] = str(2 ** math.ceil(math.log2(numAvg)))
+        return response
+
+
+@pytest.fixture()
+def server(standin):
+    return standin(tek_personality)
+
+
+def preamble_queries(server, since):
+    return [cmd for cmd in server.instruments[ADDRESS].log[since:] if 'WFMOUTPRE' in cmd]
+
+
+def test_tek_preamble(server):
+    scope = Remote_Tektronix_DPO4034_Oscope(address=ADDRESS, url=server.url, directInit=True)
+    wfms = scope.acquire([1, 2], timeout=1)
+    log = server.instruments[ADDRESS].log
+    assert np.allclose(wfms[0].ordi, 0.5 * np.array(ScopePersonality(npts=100).waveform()) + 1)
+    assert wfms[1].unit == 'V'
+    assert wfms[0].absc[-1] == pytest.approx(5e-6)
+
+    since = len(log)
+    server.reset_counts()
+    scope.acquire([1, 2], timeout=1)
+    assert preamble_queries(server, since) == []
+    assert server.requests['/query'] == 1 and server.requests['/read_raw'] == 2  # *OPC? and curves
+
+    scope.setConfigParam('CH2:SCALE', 0.1)
+    since = len(log)
+    server.reset_counts()
+    scope.acquire([1, 2], timeout=1)
+    assert len(preamble_queries(server, since)) == 4  # only CH2, in one message
+    assert server.requests['/query'] == 2
+
+    scope.setConfigParam('DATA:WIDTH', 1)
+    assert not scope._preambles
+    scope.acquire([1, 2], timeout=1)
+    assert sorted(scope._preambles) == [1, 2]
+    scope.run(True)
+    assert not scope._preambles
+
+
+def test_tek_readback(standin):
+    srv = standin(lambda address: RoundingPersonality(npts=100))
+    scope = Remote_Tektronix_DPO4034_Oscope(address=ADDRESS, url=srv.url, directInit=True)
+    settings = scope.timebaseConfig(avgCnt=5, duration=15e-6, position=0)
+    assert settings['duration'] == pytest.approx(2e-6)
+    assert settings['avgCnt'] == 8
+    wfm, = scope.acquire([1], timeout=1)
+    assert wfm.absc[-1] == pytest.approx(10e-6)
+
+    srv.reset_counts()
+    scope.acquire([1], timeout=1)
+    assert srv.requests['/query'] == 1  # *OPC?
+    assert scope.timebaseConfig()['duration'] == pytest.approx(2e-6)
+    assert srv.requests['/query'] == 1
+
+
+def test_agilent_preamble(standin):
+    srv = standin(lambda address: AgilentPersonality(npts=100))
+    scope = Remote_Agilent_Oscope(address=ADDRESS, url=srv.url, directInit=True)
+    wfm, = scope.acquire([1])
+    assert wfm.unit == 'V'
+    assert np.allclose(wfm.ordi, 2e-2 * np.array(AgilentPersonality(npts=100).waveform()) + 0.1)
+    assert wfm.absc[1] - wfm.absc[0] == pytest.approx(2e-9)
+    log = srv.instruments[ADDRESS].log
+    since = len(log)
+    scope.acquire([1])
+    assert [cmd for cmd in log[since:] if 'PREAMBLE' in cmd or 'UNITS' in cmd] == []
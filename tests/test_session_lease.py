@@ -0,0 +1,68 @@
+''' Tests leased sessions: temporary sessions that stay open
+    until they have been idle for ``leaseTime``.
+'''
+import time
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from lightlab.equipment.visa_bases.rvisa_driver import RVISAInstrumentDriver
+from lightlab.equipment.visa_bases.visa_object import VISAObject, lease_stats
+
+LEASE = 0.2
+
+
+def test_per_command(server):
+    ''' Without a lease, tempSess opens and closes for every command, like before '''
+    instr = RVISAObject('GPIB0::7::INSTR', tempSess=True, url=server.url)
+    for k in range(5):
+        instr.write(':X {}'.format(k))
+    assert instr.mbSession is None
+    assert server.requests['/open'] == 5
+    assert server.requests['/close'] == 5
+    assert instr.leaseStats['opens'] == 5
+
+
+def test_lease_reuses(server):
+    instr = RVISAObject('GPIB0::7::INSTR', tempSess=True, url=server.url, leaseTime=10)
+    for k in range(5):
+        instr.write(':X {}'.format(k))
+        assert instr.query(':X?') == str(k)
+    assert instr.mbSession is not None
+    assert server.requests['/open'] == 1
+    assert '/close' not in server.requests
+    assert instr.leaseStats == dict(opens=1, reuses=9, idle_closes=0)
+    assert lease_stats()['GPIB0::7::INSTR']['reuses'] == 9
+    instr.close()
+
+
+def test_idle_close(server):
+    instr = RVISAObject('GPIB0::7::INSTR', tempSess=True, url=server.url, leaseTime=LEASE)
+    instr.write(':X 1')
+    time.sleep(LEASE / 2)
+    instr.write(':X 2')  # renews the lease
+    time.sleep(LEASE * 3 / 4)
+    assert instr.mbSession is not None
+    time.sleep(LEASE * 2)
+    assert instr.mbSession is None
+    assert server.requests['/close'] == 1
+    assert instr.leaseStats['idle_closes'] == 1
+    assert instr.query(':X?') == '2'  # opens again
+    assert instr.leaseStats['opens'] == 2
+    instr.close()
+
+
+def test_default_lease():
+    try:
+        VISAObject.leaseTime = 5
+        assert VISAObject('GPIB0::7::INSTR', tempSess=True).leaseTime == 5
+        assert VISAObject('GPIB0::7::INSTR', leaseTime=1).leaseTime == 1
+    finally:
+        VISAObject.leaseTime = None
+
+
+def test_driver_lease(server):
+    driver = RVISAInstrumentDriver(address='GPIB0::8::INSTR', url=server.url,
+                                   tempSess=True, leaseTime=10)
+    assert driver._session_object.leaseTime == 10
+    driver.write(':X 1')
+    driver.write(':X 2')
+    assert server.requests['/open'] == 1
+    driver.close()
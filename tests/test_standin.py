@@ -0,0 +1,61 @@
+''' Tests the stand-in instruments used for benchmarks: personalities, latency,
+    and the raw socket and Prologix servers.
+'''
+import time
+import numpy as np
+from lightlab.equipment.visa_bases import rvisa_pool
+from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection
+from lightlab.equipment.visa_bases.prologix_gpib import PrologixGPIBObject
+from lightlab.equipment.visa_bases.rvisa_object import RVISAObject
+from tests.rvisa_standin import StandInServer, ScopePersonality
+from tests.socket_standin import SocketStandInServer, PrologixStandInServer
+
+
+def test_scope_personality():
+    scope = ScopePersonality(npts=2000)
+    ascii_curve = np.array(scope.handle('CURV?').split(','), dtype=int)
+    assert len(ascii_curve) == 2000
+    scope.handle('DATA:ENCDG RIBINARY;DATA:WIDTH 2')
+    block = scope.handle('CURV?')
+    assert block.startswith(b'#44000')
+    np.testing.assert_array_equal(np.frombuffer(block[6:], dtype='>i2'), ascii_curve)
+
+
+def test_latency():
+    rvisa_pool.clear_pools()
+    with StandInServer(latency=0.02, jitter=0.01, seed=1) as server:
+        server.attach()
+        instr = RVISAObject('GPIB0::7::INSTR', url=server.url)
+        instr.open()
+        tick = time.time()
+        for _ in range(3):
+            instr.query('*IDN?')
+        elapsed = time.time() - tick
+        instr.close()
+    rvisa_pool.clear_pools()
+    assert 0.06 <= elapsed < 0.5
+
+
+def test_socket_standin():
+    with SocketStandInServer(lambda: ScopePersonality(npts=3000)) as server:
+        conn = TCPSocketConnection(server.host, server.port)
+        with conn.connected():
+            conn.send('DATA:ENCDG RIBINARY')
+            curve = conn.query_binary_values('CURV?', datatype='h', is_big_endian=True)
+            conn.send('*IDN?')
+            assert conn.readline().startswith('LIGHTLAB')
+    assert len(curve) == 3000
+
+
+def test_prologix_standin():
+    server = PrologixStandInServer(lambda gpib_address: ScopePersonality(npts=500))
+    with server, server.patched():
+        instrA = PrologixGPIBObject('prologix://127.0.0.1/7')
+        instrB = PrologixGPIBObject('prologix://127.0.0.1/8')
+        instrA.write('SOUR:VOLT +1.5')  # '+' is escaped on the way
+        instrB.write('SOUR:VOLT -2')
+        assert instrA.query('SOUR:VOLT?') == '+1.5'
+        assert instrB.query('SOUR:VOLT?') == '-2'
+        instrA.write('DATA:ENCDG RIBINARY')
+        assert len(instrA.query_binary_values('CURV?', 'h', True)) == 500
+    assert set(server.instruments.keys()) == {'7', '8'}
@@ -0,0 +1,151 @@
+''' Tests how NdSweeper stores the data of each point '''
+import numpy as np
+import pytest
+from lightlab.util import io
+from lightlab.util.sweep import NdSweeper
+
+
+def make_sweep(measure):
+    swp = NdSweeper()
+    swp.setMonitorOptions(stdoutPrint=False)
+    swp.addActuation('a', lambda a: None, np.arange(3))
+    swp.addActuation('b', lambda b: None, np.arange(4))
+    swp.addMeasurement('meas', measure)
+    return swp
+
+
+def test_dense_vectors():
+    swp = make_sweep(lambda: np.arange(5))
+    swp.addMeasurement('scalar', lambda: 1)
+    swp.gather()
+    assert swp.data['meas'].dtype == float
+    assert swp.data['meas'].shape == (3, 4, 5)
+    assert np.all(swp.data['meas'][2, 1] == np.arange(5))
+    assert swp.data['scalar'].shape == (3, 4)
+    swp.addParser('peak', lambda d: max(d['meas']))
+    assert np.all(swp.data['peak'] == 4)
+
+
+def test_object_grids():
+    swp = make_sweep(lambda: 'text')
+    swp.addMeasurement('list', lambda: [1, 2])
+    swp.gather()
+    assert swp.data['meas'].dtype == object
+    assert swp.data['meas'][1, 1] == 'text'
+    assert swp.data['list'][0, 0] == [1, 2]
+    swp.denseVectors = False
+    swp.measure['meas'] = lambda: np.arange(5)
+    swp.gather()
+    assert swp.data['meas'].shape == (3, 4)
+
+
+def test_changing_shape():
+    lengths = iter(range(1, 13))
+    swp = make_sweep(lambda: np.ones(min(next(lengths), 6)))
+    swp.gather()
+    grid = swp.data['meas']
+    assert grid.dtype == object and grid.shape == (3, 4)
+    assert [len(grid[0, i]) for i in range(4)] == [1, 2, 3, 4]
+    assert len(grid[2, 3]) == 6
+
+
+def test_late_return():
+    ''' An actuation that only returns after the first point '''
+    calls = iter(range(12))
+    swp = NdSweeper()
+    swp.setMonitorOptions(stdoutPrint=False)
+    swp.addActuation('a', lambda a: next(calls) or None, np.arange(12))
+    swp.gather()
+    assert np.isnan(swp.data['a-return'][0])  # no value, rather than a zero that looks real
+    assert list(swp.data['a-return'][1:]) == list(range(1, 12))
+
+
+class Crash(Exception):
+    pass
+
+
+def crashing_sweep(log, crashAt=None):
+    swp = NdSweeper()
+    swp.setMonitorOptions(stdoutPrint=False)
+    swp.checkpointInterval = 0
+    swp.addActuation('a', lambda a: log.append(('a', a)), np.arange(3))
+    swp.addActuation('b', lambda b: log.append(('b', b)), np.arange(4))
+
+    def measure():
+        if len(log) == crashAt:
+            raise Crash()
+        log.append('meas')
+        return np.full(2, len(log))
+    swp.addMeasurement('meas', measure)
+    swp.addParser('first', lambda d: d['meas'][0])
+    return swp
+
+
+def test_checkpoint_resume(tmp_path):
+    ckpt = tmp_path / 'sweep-ckpt'
+    log = []
+    swp = crashing_sweep(log, crashAt=13)
+    with pytest.raises(Crash):
+        swp.gather(checkpoint=ckpt)
+    assert log.count('meas') == 5
+    assert len(io.loadPickleChunks(ckpt)) == 1 + 5
+
+    log.append('restarted')
+    resumed = crashing_sweep(log)
+    resumed.gather(checkpoint=ckpt, resume=True)
+    restart = log.index('restarted')
+    assert log[restart + 1:restart + 3] == [('a', 1), ('b', 1)]  # both actuated again
+    assert log.count('meas') == 12
+    assert resumed.data['meas'].shape == (3, 4, 2)
+    assert list(resumed.data['first'][0]) == [3, 5, 7, 9]
+    assert resumed.data['first'][2, 3] > 0
+
+
+def test_checkpoint_damaged(tmp_path):
+    ckpt = tmp_path / 'sweep-ckpt'
+    log = []
+    crashing_sweep(log).gather(checkpoint=ckpt)
+    with open(str(ckpt) + '.pkl', 'ab') as fx:
+        fx.write(b'\x80\x04\x95half a chunk')
+    resumed = crashing_sweep(log)
+    nMeas = log.count('meas')
+    resumed.gather(checkpoint=ckpt, resume=True)
+    assert log.count('meas') == nMeas
+    assert resumed.data['meas'].shape == (3, 4, 2)
+
+    other = make_sweep(lambda: 1)
+    other.addActuation('c', lambda c: None, [0, 1])
+    with pytest.raises(ValueError):
+        other.gather(checkpoint=ckpt, resume=True)
+
+
+def test_checkpoint_damaged_twice(tmp_path):
+    ckpt = tmp_path / 'sweep-ckpt'
+    log = []
+    with pytest.raises(Crash):
+        crashing_sweep(log, crashAt=13).gather(checkpoint=ckpt)
+    with open(str(ckpt) + '.pkl', 'ab') as fx:
+        fx.write(b'\x80\x04\x95half a chunk')
+    with pytest.raises(Crash):  # the first resume gets a few more points done
+        crashing_sweep(log, crashAt=len(log) + 6).gather(checkpoint=ckpt, resume=True)
+    nMeas = log.count('meas')
+    assert nMeas > 5
+    assert len(io.loadPickleChunks(ckpt)) == 1 + nMeas
+
+    resumed = crashing_sweep(log)
+    resumed.gather(checkpoint=ckpt, resume=True)
+    assert log.count('meas') == 12  # the second resume continues where the first stopped
+    assert resumed.data['meas'].shape == (3, 4, 2)
+
+
+def test_progress_interval():
+    prog = io.ProgressWriter('unthrottled', 5, runServer=False)
+    for _ in range(4):
+        prog.update()
+    prog.tempfile.seek(0)
+    assert len(prog.tempfile.readlines()) == 3 + 4  # every update is reported
+    prog = io.ProgressWriter('throttled', 5, runServer=False, minInterval=60)
+    for _ in range(4):
+        prog.update()
+    prog.tempfile.seek(0)
+    assert len(prog.tempfile.readlines()) == 3 + 1
@@ -0,0 +1,108 @@
+''' Tests pipelined NdSweeper gathering, where fetching a measurement
+    overlaps with actuating the next point.
+'''
+import threading
+import time
+import numpy as np
+import pytest
+from lightlab.util.sweep import NdSweeper, TriggeredMeasurement
+
+DELAY = 0.05
+
+
+class Source(object):
+    def __init__(self, address, log):
+        self.address = address
+        self.log = log
+        self.value = None
+
+    def setValue(self, value):
+        self.log.append(('set', value))
+        time.sleep(DELAY)
+        self.value = value
+
+
+class Scope(object):
+    def __init__(self, address, log, source, failAt=None):
+        self.address = address
+        self.log = log
+        self.source = source
+        self.failAt = failAt
+        self.armed = None
+        self.busy = threading.Lock()
+
+    def trigger(self):
+        self.armed = self.source.value
+
+    def fetch(self):
+        assert self.busy.acquire(blocking=False)
+        try:
+            time.sleep(DELAY)
+            if self.armed == self.failAt:
+                raise ValueError('lost the waveform')
+            self.log.append(('fetch', self.armed))
+            return np.full(3, self.armed)
+        finally:
+            self.busy.release()
+
+
+def make_sweep(failAt=None, scopeAddress='scope'):
+    log = []
+    source = Source('source', log)
+    scope = Scope(scopeAddress, log, source, failAt)
+    swp = NdSweeper()
+    swp.setMonitorOptions(stdoutPrint=False)
+    swp.addActuation('volts', source.setValue, np.arange(6))
+    swp.addMeasurement('waveform', scope.fetch, trigger=scope.trigger)
+    swp.addMeasurement('setting', lambda: source.value)
+    swp.addParser('peak', lambda d: max(d['waveform']))
+    return swp, log
+
+
+def test_same_data():
+    serial, _ = make_sweep()
+    serial.gather()
+    pipelined, _ = make_sweep()
+    pipelined.gather(pipelined=True)
+    assert list(pipelined.data.keys()) == list(serial.data.keys())
+    for k, v in serial.data.items():
+        np.testing.assert_equal(list(pipelined.data[k]), list(v))
+    assert np.all(pipelined.data['peak'] == np.arange(6))
+
+
+def test_overlap():
+    swp, log = make_sweep()
+    tick = time.time()
+    swp.gather()
+    serialTime = time.time() - tick
+    swp, log = make_sweep()
+    tick = time.time()
+    swp.gather(pipelined=True)
+    assert time.time() - tick < 0.8 * serialTime
+    assert log.index(('set', 1)) < log.index(('fetch', 0))
+
+
+def test_shared_instrument_not_overlapped():
+    ''' Actuation and fetch on the same address take turns '''
+    swp, log = make_sweep(scopeAddress='source')
+    swp.gather(pipelined=True)
+    assert log == [entry for k in range(6) for entry in (('set', k), ('fetch', k))]
+
+
+def test_errors_in_order():
+    serial, _ = make_sweep(failAt=3)
+    with pytest.raises(ValueError):
+        serial.gather()
+    pipelined, log = make_sweep(failAt=3)
+    with pytest.raises(ValueError):
+        pipelined.gather(pipelined=True)
+    assert np.all(pipelined.data['peak'] == serial.data['peak'])
+    assert list(pipelined.data['peak'][:3]) == [0, 1, 2]
+    assert ('set', 5) not in log
+
+
+def test_triggered_measurement_callable():
+    calls = []
+    meas = TriggeredMeasurement(lambda: calls.append('fetch') or 1, lambda: calls.append('trigger'))
+    assert meas() == 1
+    assert calls == ['trigger', 'fetch']
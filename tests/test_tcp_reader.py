@@ -0,0 +1,85 @@
+''' Tests the buffered reading of TCPSocketConnection against a local socket server
+'''
+import socket
+import threading
+import numpy as np
+import pytest
+from lightlab.equipment.visa_bases.driver_base import TCPSocketConnection
+
+
+def serve(script, linger=True):
+    ''' Accepts one connection. For every item of script, waits for a message
+        and then sends the pieces of the item one by one.
+        If linger, the connection is closed by the client, otherwise by the server.
+    '''
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+
+    def run():
+        conn, _ = listener.accept()
+        for pieces in script:
+            conn.recv(100)
+            for piece in pieces:
+                conn.sendall(piece)
+        if linger:
+            conn.recv(100)
+        conn.close()
+        listener.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return TCPSocketConnection('127.0.0.1', listener.getsockname()[1]), thread
+
+
+def test_readline_keeps_what_follows():
+    conn, thread = serve([[b'fir', b'st\nsec', b'ond\n']])
+    with conn.connected():
+        conn.send('BOTH?')
+        assert conn.readline() == 'first\n'
+        assert conn.readline() == 'second\n'
+    thread.join()
+
+
+def test_read_until_and_exact():
+    conn, thread = serve([[b'12', b'34', b'5;abc\r', b'\ntail']])
+    with conn.connected():
+        conn.send('GO')
+        assert conn.read_exact(3) == b'123'
+        assert conn.read_until(';') == b'45;'
+        assert conn.read_until(b'\r\n') == b'abc\r\n'
+        assert conn.recv(10) == 'tail'
+    thread.join()
+
+
+def test_read_binary_block_into():
+    values = np.arange(3000, dtype='>i2')
+    raw = values.tobytes()
+    block = b'#46000' + raw + b'\n'
+    pieces = [block[i:i + 777] for i in range(0, len(block), 777)]
+    conn, thread = serve([pieces, [b'after\n']])
+    into = np.empty(3000, dtype='>i2')
+    with conn.connected():
+        conn.send('CURV?')
+        assert conn.read_binary_block(into=into) is into
+        assert conn.query_raw_binary('NEXT?') == b'after\n'  # termination of the block is gone
+    thread.join()
+    np.testing.assert_array_equal(into, values)
+
+
+def test_read_binary_block_wrong_size():
+    conn, thread = serve([[b'#13abc\n']])
+    with conn.connected():
+        conn.send('CURV?')
+        with pytest.raises(ValueError):
+            conn.read_binary_block(into=bytearray(4))
+    thread.join()
+
+
+def test_closed_by_server():
+    conn, thread = serve([[b'partial']], linger=False)
+    with conn.connected():
+        conn.send('ASK?')
+        thread.join()
+        with pytest.raises(ConnectionError):
+            conn.readline()